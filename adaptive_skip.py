@@ -0,0 +1,217 @@
+import math
+from collections import deque
+
+# Ultralytics giriş boyutları 32'nin katı olmalı
+SIZE_STRIDE = 32
+
+# Çözünürlük uyarlaması açıkken denenen boyutlar
+DEFAULT_SIZES = (640, 480, 320)
+
+# Hedef FPS verilmezse kaynak FPS'nin bu oranı tutulur (çıkarım frameleri arada kaynak hızına ulaşılamaz)
+DEFAULT_TARGET_RATIO = 0.75
+
+
+class AdaptiveSkipController:
+    def __init__(self, target_fps=None, max_staleness=None, fps=30, min_interval=1, max_interval=30,
+                 sizes=None, smoothing=0.3, patience=3, headroom=0.8, decision_log=100):
+        """
+        Chooses how often YOLO runs on a live stream from measured frame costs
+
+        The caller asks should_infer() once per frame and reports the processing time
+        of the frame with record(). Inference and in-between frame costs are tracked
+        as moving averages, and after every inference frame the detection interval is
+        set to the smallest one that keeps the display at target_fps. When even that
+        interval would leave boxes older than max_staleness, the inference size is
+        stepped down (if sizes are given); frame rate wins over staleness when no
+        smaller size is left.
+        Args:
+            target_fps: Display frame rate to hold (None = DEFAULT_TARGET_RATIO of the source fps)
+            max_staleness: Maximum age in seconds of the last real detection (None = no limit)
+            fps: Frame rate of the source
+            min_interval: Smallest detection interval (1 = every frame)
+            max_interval: Largest detection interval
+            sizes: Optional inference sizes (e.g. (640, 480, 320)) to step through, largest first
+            smoothing: Weight of the newest measurement in the moving averages
+            patience: Inference frames a size change must be called for before it happens
+            headroom: Fraction of the budget a larger size must fit in before stepping back up
+            decision_log: Number of recent decisions kept for stats()
+        """
+        self.fps = fps or 30
+        self.target_fps = target_fps
+        self.max_staleness = max_staleness
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.sizes = sorted({int(size) // SIZE_STRIDE * SIZE_STRIDE for size in sizes}, reverse=True) if sizes else []
+        self.smoothing = smoothing
+        self.patience = patience
+        self.headroom = headroom
+        self.decisions = deque(maxlen=decision_log)
+        self.reset()
+
+    def reset(self):
+        """Forget the measurements; the next frame is an inference frame"""
+        self.interval = self.min_interval
+        self.size_index = 0
+        self.infer_time = {}        # Boyut başına ortalama çıkarım framesi süresi
+        self.frame_time = None      # Çıkarım olmayan framelerin ortalama süresi
+        self.since_inference = None
+        self.pending_size = None
+        self.pending_count = 0
+        self.frames = 0
+        self.inferences = 0
+        self.interval_changes = 0
+        self.size_changes = 0
+        self.interval_total = 0
+        self.over_staleness = 0
+        self.decisions.clear()
+
+    @property
+    def budget_fps(self):
+        """Frame rate the interval is chosen for: target_fps, or a share of the source fps when none was given"""
+        return self.target_fps or self.fps * DEFAULT_TARGET_RATIO
+
+    @property
+    def imgsz(self):
+        """Inference size to pass to YOLO, or None when the size is not adapted"""
+        return self.sizes[self.size_index] if self.sizes else None
+
+    def should_infer(self):
+        """Call once per frame: True when this frame should run inference"""
+        return self.since_inference is None or self.since_inference + 1 >= self.interval
+
+    def record(self, elapsed, inferred):
+        """
+        Report the processing time of the frame that should_infer() was asked about
+        Args:
+            elapsed: Seconds spent on the frame (inference, drawing, tracking)
+            inferred: Whether inference ran on it (a motion gate may have skipped it)
+        """
+        self.frames += 1
+        self.interval_total += self.interval
+        if not inferred:
+            self.frame_time = self.average(self.frame_time, elapsed)
+            self.since_inference = (self.since_inference or 0) + 1
+            return
+        self.inferences += 1
+        self.since_inference = 0
+        self.infer_time[self.imgsz] = self.average(self.infer_time.get(self.imgsz), elapsed)
+        self.update()
+
+    def average(self, current, value):
+        if current is None:
+            return value
+        return current + self.smoothing * (value - current)
+
+    def frame_period(self):
+        """Display time of a frame without inference: its cost, but never faster than the source delivers"""
+        return max(1.0 / self.fps, self.frame_time or 0.0)
+
+    def estimated_infer_time(self, size_index):
+        """Measured inference frame cost at a size, or an estimate scaled by input area"""
+        size = self.sizes[size_index] if self.sizes else None
+        if size in self.infer_time:
+            return self.infer_time[size]
+        measured_size, measured = next(iter(self.infer_time.items()))
+        return measured * (size / measured_size) ** 2
+
+    def required_interval(self, infer_time):
+        """Smallest interval whose average frame cost fits the target_fps budget (may exceed max_interval)"""
+        budget = 1.0 / self.budget_fps
+        frame_period = self.frame_period()
+        if infer_time <= budget:
+            return self.min_interval
+        if frame_period >= budget:
+            # Araya giren frameler bile bütçeyi aşıyor, çıkarım en seyrek hale getirilir
+            return math.inf
+        # (t_çıkarım + (N - 1) * t_frame) / N <= bütçe
+        return max(self.min_interval, math.ceil((infer_time - frame_period) / (budget - frame_period)))
+
+    def staleness_limit(self, infer_time):
+        """Largest interval whose detections stay younger than max_staleness"""
+        if self.max_staleness is None:
+            return self.max_interval
+        frame_period = self.frame_period()
+        return max(self.min_interval, 1 + int((self.max_staleness - infer_time) / frame_period))
+
+    def update(self):
+        """Pick the interval and size after an inference frame"""
+        infer_time = self.estimated_infer_time(self.size_index)
+        limit = min(self.max_interval, self.staleness_limit(infer_time))
+        required = self.required_interval(infer_time)
+
+        # Boyut: gerekli aralık sınırı aşıyorsa küçült, bir üst boyut rahatça sığıyorsa büyüt
+        target_size = self.size_index
+        if required > limit and self.size_index + 1 < len(self.sizes):
+            target_size = self.size_index + 1
+        elif self.size_index > 0:
+            larger = self.estimated_infer_time(self.size_index - 1)
+            larger_limit = min(self.max_interval, self.staleness_limit(larger))
+            if self.required_interval(larger / self.headroom) <= larger_limit:
+                target_size = self.size_index - 1
+        if target_size != self.size_index:
+            if target_size == self.pending_size:
+                self.pending_count += 1
+            else:
+                self.pending_size, self.pending_count = target_size, 1
+            if self.pending_count >= self.patience:
+                reason = 'over budget' if target_size > self.size_index else 'headroom'
+                self.size_index = target_size
+                self.size_changes += 1
+                self.pending_size, self.pending_count = None, 0
+                self.log(reason, infer_time)
+                infer_time = self.estimated_infer_time(self.size_index)
+                limit = min(self.max_interval, self.staleness_limit(infer_time))
+                required = self.required_interval(infer_time)
+        else:
+            self.pending_size, self.pending_count = None, 0
+
+        # Aralık: FPS hedefi tazelikten önce gelir (görüntü takılmaz, kutular biraz daha eski olur)
+        interval = min(self.max_interval, required)
+        if interval > limit:
+            self.over_staleness += 1
+        interval = int(max(self.min_interval, interval))
+        if interval != self.interval:
+            self.interval = interval
+            self.interval_changes += 1
+            self.log('interval', infer_time)
+
+    def log(self, reason, infer_time):
+        self.decisions.append({
+            'frame': self.frames,
+            'reason': reason,
+            'interval': self.interval,
+            'imgsz': self.imgsz,
+            'infer_ms': round(infer_time * 1000, 1)
+        })
+
+    def expected_fps(self):
+        """Display frame rate the current interval should give"""
+        infer_time = self.infer_time.get(self.imgsz)
+        if infer_time is None:
+            return None
+        cycle = infer_time + (self.interval - 1) * self.frame_period()
+        return min(self.fps, self.interval / cycle)
+
+    def stats(self):
+        """Current decision, measured costs and the recent decision log"""
+        infer_time = self.infer_time.get(self.imgsz)
+        expected_fps = self.expected_fps()
+        return {
+            'target_fps': round(self.budget_fps, 2),
+            'max_staleness_ms': None if self.max_staleness is None else round(self.max_staleness * 1000, 1),
+            'interval': self.interval,
+            'interval_mean': round(self.interval_total / self.frames, 2) if self.frames else float(self.interval),
+            'imgsz': self.imgsz,
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'infer_ms': None if infer_time is None else round(infer_time * 1000, 1),
+            'frame_ms': None if self.frame_time is None else round(self.frame_time * 1000, 1),
+            'expected_fps': None if expected_fps is None else round(expected_fps, 1),
+            # Son gerçek tespitin en yaşlı hali: çıkarım süresi + aradaki framelerin gösterim süresi
+            'staleness_ms': None if infer_time is None else
+                round((infer_time + (self.interval - 1) * self.frame_period()) * 1000, 1),
+            'over_staleness': self.over_staleness,
+            'interval_changes': self.interval_changes,
+            'size_changes': self.size_changes,
+            'decisions': list(self.decisions)
+        }
@@ -0,0 +1,1243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for English-Turkish VLM Detector
+
+Usage:
+    python benchmark.py llm [--delay 0.5] [--callers 16]
+    python benchmark.py prompt [--token-cost 0.002]
+    python benchmark.py batch [--rules 200] [--delay 0.3]
+    python benchmark.py inference [--runs 10]
+    python benchmark.py video VIDEO [--batch-sizes 1 2 4 8 16] [--frames 64]
+    python benchmark.py shard VIDEO [--workers 1 2 4] [--frames 128]
+    python benchmark.py pipeline VIDEO [--frames 128] [--batch 1] [--queue-size 8]
+    python benchmark.py skip VIDEO [--skips 1 5 30 100] [--runs 3]
+    python benchmark.py track VIDEO [--frames 120] [--intervals 2 3 5 10]
+    python benchmark.py gate VIDEO [--frames 200] [--methods diff mog2] [--min-changed 0.005]
+    python benchmark.py capture VIDEO [--frames 60] [--buffer 4]
+    python benchmark.py adaptive VIDEO [--seconds 10] [--intervals 1 3 5] [--load 1.0]
+    python benchmark.py color [--sizes 640x480 1920x1080 3840x2160] [--boxes 20]
+    python benchmark.py lut [--objects 60] [--coverage 0.5] [--min-fraction 0.2]
+    python benchmark.py mask [--sizes 640x480 1920x1080 3840x2160] [--masks 20] [--budget 512]
+    python benchmark.py startup [--runs 5]
+    python benchmark.py onnx [--runs 10] [--batch 8]
+    python benchmark.py int8 [--runs 10] [--batch 8]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lexicon import SYNONYM_TABLE
+from llm_client import OllamaClient
+
+# Sözlükte bulunmayan, LLM'e düşen örnek sorgular
+SAMPLE_QUERIES = [
+    "çiçekleri göster", "vazoları bul", "şemsiyeleri tespit et", "makasları göster",
+    "diş fırçası", "buzdolabını bul", "kayak takımlarını göster", "uçurtmaları bul",
+    "tenis raketlerini göster", "saç kurutma makinesi", "şişeleri göster", "bardakları tespit et"
+]
+
+
+class StubOllamaServer:
+    def __init__(self, delay=0.2, responder=None, fail_first=0):
+        """
+        Local HTTP server that mimics Ollama's /api/chat endpoint
+        Args:
+            delay: Seconds to wait before answering (simulated generation time)
+            responder: Callable(payload) -> assistant content (default: "car")
+            fail_first: Number of initial requests answered with HTTP 503
+        """
+        self.delay = delay
+        self.responder = responder or (lambda payload: "car")
+        self.fail_first = fail_first
+        self.payloads = []
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                payload = json.loads(body)
+
+                with stub.lock:
+                    stub.payloads.append(payload)
+                    failing = len(stub.payloads) <= stub.fail_first
+
+                time.sleep(stub.delay)
+
+                if self.path != '/api/chat' or failing:
+                    self.send_json(503 if failing else 404, {'error': 'unavailable'})
+                    return
+
+                content = stub.responder(payload)
+                prompt_tokens = sum(len(m['content'].split()) for m in payload['messages'])
+                self.send_json(200, {
+                    'model': payload['model'],
+                    'message': {'role': 'assistant', 'content': content},
+                    'done': True,
+                    'prompt_eval_count': prompt_tokens,
+                    'eval_count': len(content.split())
+                })
+
+            def send_json(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def request_count(self):
+        with self.lock:
+            return len(self.payloads)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def count_tokens(text):
+    """Rough token estimate (about 4 characters per token for Latin script)"""
+    return max(1, len(text) // 4)
+
+
+def prefill_responder(token_cost):
+    """
+    Stub behaviour for prompt benchmarks
+    
+    Simulates prefill time proportional to prompt tokens, where a system message
+    identical to the previous request is served from Ollama's cached context.
+    """
+    state = {'system': None}
+
+    def respond(payload):
+        messages = payload['messages']
+        tokens = sum(count_tokens(m['content']) for m in messages)
+        system = messages[0]['content'] if messages[0]['role'] == 'system' else None
+        if system is not None and system == state['system']:
+            tokens -= count_tokens(system)
+        state['system'] = system
+        time.sleep(tokens * token_cost)
+
+        if 'format' in payload:
+            return json.dumps({'classes': ['vase']})
+        # Serbest metin cevapları sık sık fazladan kelime içerir
+        return "Cevap: vase, potted plant."
+    return respond
+
+
+def legacy_class_prompt(target_class, clean_target, available_classes):
+    """The pre-structured-output prompt (query first, full synonym table every call)"""
+    table = []
+    for category, entries in SYNONYM_TABLE:
+        lines = [f"        {category}:"]
+        for phrases, targets in entries:
+            quoted = ', '.join(f'"{phrase}"' for phrase in phrases)
+            lines.append(f'        - {quoted} → "{targets}"')
+        table.append('\n'.join(lines))
+    synonyms = '\n        \n'.join(table)
+    return f"""
+        Kullanıcı "{target_class}" nesnesini arıyor.
+        
+        Mevcut COCO sınıfları: {', '.join(available_classes)}
+        
+        Bu sınıflardan hangileri "{clean_target}" ile eşleşiyor? 
+        
+        Önemli: Türkçe kelimeleri İngilizce COCO sınıflarıyla eşleştir. Aynı anlama gelen farklı kelimeleri de düşün:
+        
+{synonyms}
+        
+        SADECE eşleşen COCO sınıf isimlerini virgülle ayırarak ver. Başka açıklama yapma.
+        Örnek: person, car, truck
+        """
+
+
+def legacy_parse(llm_response, available_classes):
+    """The pre-structured-output line parser"""
+    matching_classes = []
+    for line in llm_response.strip().split('\n'):
+        line = line.strip()
+        if line and not line.startswith('"') and not line.startswith('Ayrıca'):
+            if ',' in line:
+                matching_classes.extend(cls.strip().lower() for cls in line.split(','))
+            elif line.lower() in [name.lower() for name in available_classes]:
+                matching_classes.append(line.lower())
+    if not matching_classes:
+        matching_classes = [cls.strip().lower() for cls in llm_response.split(',')]
+    return matching_classes
+
+
+def bench_prompt(args):
+    """Prompt tokens, latency and parse quality: legacy prompt vs compact structured prompt"""
+    from main import VLMDetector
+    from mapping_cache import QueryMappingCache
+
+    with StubOllamaServer(delay=0.0) as stub:
+        stub.responder = prefill_responder(args.token_cost)
+        client = OllamaClient(host=stub.url, retries=0)
+        detector = VLMDetector(mapping_cache=QueryMappingCache(path=None), llm_client=client)
+        available_classes = list(detector.class_names.values())
+        valid = {name.lower() for name in available_classes}
+
+        rows = []
+        for label in ('legacy', 'structured'):
+            tokens, elapsed, invalid = 0, 0.0, 0
+            for query in SAMPLE_QUERIES:
+                clean_target = detector.strip_color_words(query)
+                start = time.perf_counter()
+                if label == 'legacy':
+                    prompt = legacy_class_prompt(query, clean_target, available_classes)
+                    tokens += count_tokens(prompt)
+                    classes = legacy_parse(detector.ask_llm(prompt), available_classes)
+                else:
+                    system = detector.get_class_mapping_system_prompt()
+                    tokens += count_tokens(system) + count_tokens(clean_target)
+                    classes = detector.parse_class_mapping(detector.ask_llm(
+                        clean_target, system=system, format=detector.get_class_mapping_schema()))
+                elapsed += time.perf_counter() - start
+                invalid += sum(1 for cls in classes if cls not in valid)
+            rows.append((label, tokens / len(SAMPLE_QUERIES), elapsed / len(SAMPLE_QUERIES), invalid))
+
+        client.close()
+
+    print(f"{'prompt':<12}{'tokens/query':>14}{'latency/query':>16}{'invalid classes':>18}")
+    for label, tokens, latency, invalid in rows:
+        print(f"{label:<12}{tokens:>14.0f}{latency * 1000:>14.1f}ms{invalid:>18}")
+
+
+def batch_responder(payload):
+    """Stub answers for single and batched class mapping requests"""
+    if 'results' in payload.get('format', {}).get('properties', {}):
+        queries = json.loads(payload['messages'][-1]['content'])
+        return json.dumps({'results': [{'id': i, 'classes': ['vase']} for i in range(len(queries))]})
+    return json.dumps({'classes': ['vase']})
+
+
+def bench_batch(args):
+    """Startup resolution of a rule set: one LLM call per rule vs resolve_queries()"""
+    from main import VLMDetector
+    from mapping_cache import QueryMappingCache
+
+    rules = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} kamera {i}" for i in range(args.rules)]
+
+    with StubOllamaServer(delay=args.delay, responder=batch_responder) as stub:
+        client = OllamaClient(host=stub.url, retries=0)
+
+        detector = VLMDetector(mapping_cache=QueryMappingCache(path=None), llm_client=client)
+        start = time.perf_counter()
+        for rule in rules:
+            detector.map_query_to_classes(rule)
+        one_by_one = time.perf_counter() - start
+        one_by_one_requests = stub.request_count
+
+        detector = VLMDetector(mapping_cache=QueryMappingCache(path=None), llm_client=client)
+        start = time.perf_counter()
+        mappings = detector.resolve_queries(rules)
+        batched = time.perf_counter() - start
+        batched_requests = stub.request_count - one_by_one_requests
+
+        start = time.perf_counter()
+        detector.resolve_queries(rules)
+        warm = time.perf_counter() - start
+        warm_requests = stub.request_count - one_by_one_requests - batched_requests
+
+        client.close()
+
+    resolved = sum(1 for classes in mappings.values() if classes)
+    print(f"{args.rules} rules, one by one:     {one_by_one:.2f}s, {one_by_one_requests} LLM requests")
+    print(f"{args.rules} rules, resolve_queries: {batched:.2f}s, {batched_requests} LLM requests "
+          f"({resolved} resolved)")
+    print(f"{args.rules} rules, warm cache:      {warm:.3f}s, {warm_requests} LLM requests")
+
+
+def bench_inference(args):
+    """Post-filtering in Python vs class ids and conf floor passed into the YOLO call"""
+    import cv2
+    from main import VLMDetector
+
+    cases = [('traffic.webp', "arabaları göster"), ('chairs.jpg', "sandalyeleri göster")]
+
+    print(f"{'mode':<14}{'image':<14}{'filter':<10}{'total':>10}{'postprocess':>14}{'boxes':>8}{'kept':>6}")
+    for mode in ('detection', 'segmentation'):
+        detector = VLMDetector(mode=mode)
+        for image_path, query in cases:
+            image = cv2.imread(image_path)
+            if image is None:
+                print(f"{image_path} okunamadı, atlanıyor")
+                continue
+
+            plan = detector.compile_query(query)
+            for label, filter_in_model in (('python', False), ('model', True)):
+                plan.filter_in_model = filter_in_model
+                totals, postprocess = [], []
+                for run in range(args.runs + 1):
+                    start = time.perf_counter()
+                    results = detector.detect_objects_direct(image, plan)
+                    if mode == 'segmentation':
+                        detections = detector.filter_objects_by_class_segmentation(results, plan)
+                    else:
+                        detections = detector.filter_objects_by_class(results, plan)
+                    elapsed = time.perf_counter() - start
+                    # İlk çalıştırma ısınma turu
+                    if run:
+                        totals.append(elapsed)
+                        postprocess.append(results.speed['postprocess'])
+                print(f"{mode:<14}{image_path:<14}{label:<10}{statistics.median(totals) * 1000:>8.1f}ms"
+                      f"{statistics.median(postprocess):>12.1f}ms{len(results.boxes):>8}{len(detections):>6}")
+
+
+def bench_video(args):
+    """process_video_frames throughput (frames/sec) for each batch size"""
+    from main import VLMDetector, VideoProcessor
+
+    detector = VLMDetector()
+    processor = VideoProcessor(detector)
+    plan = detector.compile_query(args.query)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Isınma turu: model yükleme ve ilk çağrı maliyeti ölçüme girmez
+        processor.process_video_frames(args.video, plan, output_dir, max_frames=2)
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            result = processor.process_video_frames(args.video, plan, output_dir,
+                                                    max_frames=args.frames, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            rows.append((batch_size, result['processed_frames'], elapsed))
+
+    print(f"Auto batch size: {processor.resolve_batch_size('auto')} (device: {detector.model.device})")
+    print(f"{'batch':>6}{'frames':>8}{'time':>10}{'fps':>8}{'speedup':>9}")
+    for batch_size, frames, elapsed in rows:
+        fps = frames / elapsed
+        base_fps = rows[0][1] / rows[0][2]
+        print(f"{batch_size:>6}{frames:>8}{elapsed:>9.2f}s{fps:>8.2f}{fps / base_fps:>8.2f}x")
+
+
+# Her ölçüm ayrı bir Python sürecinde yapılır (soğuk import), sonuç JSON olarak yazdırılır
+STARTUP_SCRIPTS = {
+    # gui.py'nin önceki davranışı: pencere açılmadan önce tüm import'lar ve model yüklemesi
+    'eager': """
+import time, json
+start = time.perf_counter()
+import cv2, numpy
+from PIL import Image, ImageTk
+from main import VLMDetector, VideoProcessor
+detector = VLMDetector(mode='detection')
+detector.model
+elapsed = time.perf_counter() - start
+print(json.dumps({'window': elapsed, 'backend': elapsed, 'models': elapsed}))
+""",
+    'gui': """
+import time, json
+start = time.perf_counter()
+import tkinter as tk
+import gui
+root = tk.Tk()
+app = gui.VLMDetectorGUI(root)
+root.update()
+window = time.perf_counter() - start
+while not app.models_ready.wait(0.01):
+    root.update()
+offset = app.startup_start - start
+print(json.dumps({'window': window, 'backend': offset + app.startup_times['backend'],
+                  'models': offset + app.startup_times['models']}))
+root.destroy()
+""",
+    # Ekran yoksa (CI, SSH) Tk penceresi olmadan aynı başlatma adımları
+    'headless': """
+import time, json
+start = time.perf_counter()
+import gui
+window = time.perf_counter() - start
+gui.import_heavy_modules()
+detector = gui.VLMDetector(mode='detection')
+backend = time.perf_counter() - start
+for future in [detector.registry.preload(weights) for weights in gui.MODEL_WEIGHTS.values()]:
+    future.result()
+print(json.dumps({'window': window, 'backend': backend, 'models': time.perf_counter() - start}))
+"""
+}
+
+
+def run_startup_script(name):
+    """Run one startup measurement in a fresh interpreter"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get('PYTHONPATH')]))
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPTS[name]], env=env,
+                            capture_output=True, text=True, timeout=600)
+    for line in reversed(output.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "no output")
+
+
+def bench_shard(args):
+    """Multi-process sharded video processing: throughput per worker count, summary identical to 1 worker"""
+    from main import VLMDetector, VideoProcessor
+
+    detector = VLMDetector(concurrent=False)
+    processor = VideoProcessor(detector)
+    plan = detector.compile_query(args.query)
+
+    rows = []
+    reference = None
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Isınma turu: ana süreçteki model yüklemesi 1 işçili ölçüme girmez
+        processor.process_video_frames(args.video, plan, output_dir, max_frames=2)
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = processor.process_video_frames(args.video, plan, output_dir, max_frames=args.frames,
+                                                    workers=workers)
+            elapsed = time.perf_counter() - start
+            with open(result['summary'], 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            if reference is None:
+                reference = summary['detection_results']
+            rows.append((summary.get('workers', 1), result['processed_frames'], elapsed,
+                         summary['detection_results'] == reference))
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>8}{'frames':>8}{'time':>10}{'fps':>8}{'speedup':>9}{'same summary':>14}")
+    for workers, frames, elapsed, same in rows:
+        fps = frames / elapsed
+        print(f"{workers:>8}{frames:>8}{elapsed:>9.2f}s{fps:>8.2f}{fps / (rows[0][1] / rows[0][2]):>8.2f}x{str(same):>14}")
+
+
+def bench_pipeline(args):
+    """Serial loop vs threaded pipeline: throughput, identical summary and per-stage utilization"""
+    from main import VLMDetector, VideoProcessor
+
+    detector = VLMDetector(concurrent=False)
+    processor = VideoProcessor(detector)
+    plan = detector.compile_query(args.query)
+
+    rows = []
+    reference = None
+    with tempfile.TemporaryDirectory() as output_dir:
+        processor.process_video_frames(args.video, plan, output_dir, max_frames=2)
+        for label, pipeline in (('serial', False), ('pipeline', True)):
+            start = time.perf_counter()
+            result = processor.process_video_frames(args.video, plan, output_dir, max_frames=args.frames,
+                                                    batch_size=args.batch, pipeline=pipeline,
+                                                    queue_size=args.queue_size)
+            elapsed = time.perf_counter() - start
+            with open(result['summary'], 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            if reference is None:
+                reference = summary['detection_results']
+            rows.append((label, result['processed_frames'], elapsed, summary['detection_results'] == reference,
+                         summary.get('pipeline_stats')))
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'mode':<10}{'frames':>8}{'time':>10}{'fps':>8}{'speedup':>9}{'same summary':>14}")
+    for label, frames, elapsed, same, _ in rows:
+        fps = frames / elapsed
+        print(f"{label:<10}{frames:>8}{elapsed:>9.2f}s{fps:>8.2f}{fps / (rows[0][1] / rows[0][2]):>8.2f}x{str(same):>14}")
+
+    stages = rows[-1][4]['stages']
+    print(f"\n{'stage':<10}{'busy':>9}{'util':>8}{'starved':>10}{'blocked':>10}{'queue avg':>11}{'queue max':>11}")
+    for name, stats in stages.items():
+        print(f"{name:<10}{stats['busy_s']:>8.2f}s{stats['utilization'] * 100:>7.1f}%{stats['starved_s']:>9.2f}s"
+              f"{stats['blocked_s']:>9.2f}s{stats['input_queue_mean']:>11.1f}{stats['input_queue_max']:>11}")
+
+
+def bench_skip(args):
+    """Frame selection cost: decode-and-drop vs grab()/keyframe seeking, per frame_skip"""
+    import cv2
+    from video_pipeline import FrameSkipper
+
+    def select_frames(frame_skip, strategy):
+        cap = cv2.VideoCapture(args.video)
+        start = time.perf_counter()
+        selected = 0
+        if strategy == 'read':
+            # Eski yol: her frame çözülür, atlananlar atılır
+            frame_count = 0
+            while True:
+                ret, _ = cap.read()
+                if not ret:
+                    break
+                selected += frame_count % frame_skip == 0
+                frame_count += 1
+        else:
+            skipper = FrameSkipper(cap, strategy)
+            while skipper.read()[0]:
+                selected += 1
+                if not skipper.skip(frame_skip - 1):
+                    break
+        elapsed = time.perf_counter() - start
+        cap.release()
+        return selected, elapsed
+
+    strategies = ['read', 'grab', 'seek', 'auto']
+    print(f"{'skip':>6}{'frames':>8}" + ''.join(f"{name:>10}" for name in strategies) + f"{'speedup':>9}")
+    for frame_skip in args.skips:
+        times = {}
+        for strategy in strategies:
+            runs = [select_frames(frame_skip, strategy) for _ in range(args.runs)]
+            selected = runs[0][0]
+            times[strategy] = statistics.median(elapsed for _, elapsed in runs)
+        print(f"{frame_skip:>6}{selected:>8}" + ''.join(f"{times[name]:>9.3f}s" for name in strategies)
+              + f"{times['read'] / times['auto']:>8.2f}x")
+
+
+def bench_track(args):
+    """Boxes on frames without inference: none vs last detections carried over vs tracker prediction"""
+    import cv2
+    import numpy as np
+    from main import VLMDetector
+    from tracker import ObjectTracker, box_iou
+
+    detector = VLMDetector(concurrent=False)
+    plan = detector.compile_query(args.query)
+
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+
+    # Referans: her framede çıkarım
+    reference = []
+    for start in range(0, len(frames), 8):
+        results = detector.detect_objects_batch(frames[start:start + 8], plan)
+        reference.extend(detector.filter_objects_by_class(result, plan) for result in results)
+
+    def recall(shown, expected):
+        if len(expected) == 0:
+            return None
+        if shown is None or len(shown) == 0:
+            return 0.0
+        iou = box_iou(expected.xyxy, shown.xyxy)
+        iou[expected.class_id[:, None] != shown.class_id[None, :]] = 0
+        return float((iou >= args.iou).any(axis=1).mean())
+
+    print(f"{len(frames)} frames, {sum(len(d) for d in reference) / len(frames):.1f} objects/frame, "
+          f"recall on frames without inference (IoU >= {args.iou})")
+    print(f"{'interval':>9}{'none':>8}{'carry':>8}{'track':>8}{'tracks':>8}{'track ms/frame':>16}")
+    for interval in args.intervals:
+        scores = {'none': [], 'carry': [], 'track': []}
+        tracker = ObjectTracker()
+        last = None
+        elapsed = 0.0
+        for frame_index, expected in enumerate(reference):
+            infer = frame_index % interval == 0
+            start = time.perf_counter()
+            tracked = tracker.step(expected if infer else None, frame_index)
+            elapsed += time.perf_counter() - start
+            if infer:
+                last = expected
+                continue
+            for name, shown in (('none', None), ('carry', last), ('track', tracked)):
+                score = recall(shown, expected)
+                if score is not None:
+                    scores[name].append(score)
+        means = {name: np.mean(values) if values else float('nan') for name, values in scores.items()}
+        print(f"{interval:>9}{means['none']:>8.3f}{means['carry']:>8.3f}{means['track']:>8.3f}"
+              f"{tracker.next_id - 1:>8}{elapsed / len(reference) * 1000:>15.2f}")
+
+
+def bench_gate(args):
+    """Fixed-schedule inference vs motion-gated inference on a video"""
+    from main import VLMDetector, VideoProcessor
+    from motion_gate import MotionGate
+
+    detector = VLMDetector(concurrent=False)
+    processor = VideoProcessor(detector)
+    plan = detector.compile_query(args.query)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        processor.process_video_frames(args.video, plan, output_dir, max_frames=2, write_video=False)
+        for method in [None] + args.methods:
+            gate = MotionGate(method=method, min_changed=args.min_changed) if method else None
+            start = time.perf_counter()
+            result = processor.process_video_frames(args.video, plan, output_dir, max_frames=args.frames,
+                                                    frame_skip=args.frame_skip, write_video=False,
+                                                    motion_gate=gate)
+            elapsed = time.perf_counter() - start
+            with open(result['summary'], 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            gate_stats = summary.get('motion_gate', {})
+            rows.append((method or 'none', summary['processed_frames'], elapsed, gate_stats.get('skip_ratio', 0.0),
+                         gate_stats.get('gate_ms', 0.0)))
+
+    print(f"{'gate':<8}{'inferred':>10}{'time':>10}{'skip ratio':>12}{'gate ms':>10}{'speedup':>9}")
+    for method, inferred, elapsed, skip_ratio, gate_ms in rows:
+        print(f"{method:<8}{inferred:>10}{elapsed:>9.2f}s{skip_ratio:>12.3f}{gate_ms:>10.2f}{rows[0][2] / elapsed:>8.2f}x")
+
+
+def bench_capture(args):
+    """Camera-style FIFO frame buffer vs latest-frame capture thread, video file standing in for the camera"""
+    import queue
+    import cv2
+    import numpy as np
+    from capture import LatestFrameCapture
+    from main import VLMDetector
+
+    detector = VLMDetector(concurrent=False)
+    plan = detector.compile_query(args.query)
+
+    class BufferedCapture:
+        """Driver-like FIFO: frames queue up behind a slow consumer, new ones are lost when it is full"""
+        def __init__(self, source, buffer_size):
+            self.cap = cv2.VideoCapture(source)
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+            self.buffer = queue.Queue(maxsize=buffer_size)
+            self.captured = 0
+            self.dropped = 0
+            self.last_capture_time = None
+            self.thread = threading.Thread(target=self.reader, daemon=True)
+            self.thread.start()
+
+        def reader(self):
+            start = time.perf_counter()
+            frame_id = 0
+            while True:
+                delay = start + frame_id / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.captured += 1
+                try:
+                    self.buffer.put_nowait((frame, time.perf_counter()))
+                except queue.Full:
+                    self.dropped += 1
+                frame_id += 1
+            self.buffer.put(None)
+
+        def read(self):
+            item = self.buffer.get()
+            if item is None:
+                return False, None
+            frame, self.last_capture_time = item
+            return True, frame
+
+        def release(self):
+            self.cap.release()
+
+    def consume(cap):
+        latencies = []
+        frames = 0
+        while frames < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            capture_time = cap.last_capture_time
+            detector.process_frame(frame, plan)
+            latencies.append(time.perf_counter() - capture_time)
+            frames += 1
+        return frames, np.array(latencies) * 1000
+
+    # Isınma
+    ret, frame = cv2.VideoCapture(args.video).read()
+    detector.process_frame(frame, plan)
+
+    print(f"{'capture':<10}{'shown':>7}{'dropped':>9}{'mean ms':>10}{'p95 ms':>9}{'max ms':>9}")
+    for name in ('fifo', 'latest'):
+        if name == 'fifo':
+            cap = BufferedCapture(args.video, args.buffer)
+        else:
+            cap = LatestFrameCapture(args.video)
+        frames, latencies = consume(cap)
+        cap.release()
+        dropped = cap.dropped
+        print(f"{name:<10}{frames:>7}{dropped:>9}{latencies.mean():>10.1f}"
+              f"{np.percentile(latencies, 95):>9.1f}{latencies.max():>9.1f}")
+
+
+def bench_adaptive(args):
+    """Fixed detection intervals vs the adaptive skip controller on a simulated live stream"""
+    import numpy as np
+    from adaptive_skip import DEFAULT_SIZES, AdaptiveSkipController
+    from capture import LatestFrameCapture
+    from main import VLMDetector
+    from tracker import ObjectTracker
+
+    detector = VLMDetector(concurrent=False)
+    plan = detector.compile_query(args.query)
+    detector.model
+
+    def run(interval=None, controller=None):
+        cap = LatestFrameCapture(args.video)
+        if controller is not None:
+            controller.fps = cap.fps
+            controller.reset()
+            detector.imgsz = controller.imgsz
+        tracker = ObjectTracker()
+        shown = inferences = 0
+        staleness = []
+        last_capture = None
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.seconds:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_start = time.perf_counter()
+            infer = controller.should_infer() if controller is not None else shown % interval == 0
+            if infer:
+                detector.process_frame(frame, plan, tracker, cap.last_frame_id)
+                if args.load > 1:
+                    # Yavaş makine benzetimi: çıkarım süresi load katına çıkarılır
+                    time.sleep((time.perf_counter() - frame_start) * (args.load - 1))
+                last_capture = cap.last_capture_time
+                inferences += 1
+            else:
+                detector.draw_plan(frame, tracker.step(frame_index=cap.last_frame_id), plan)
+            if controller is not None:
+                controller.record(time.perf_counter() - frame_start, infer)
+                detector.imgsz = controller.imgsz
+            staleness.append(time.perf_counter() - last_capture)
+            shown += 1
+        elapsed = time.perf_counter() - start
+        cap.release()
+        detector.imgsz = None
+        staleness = np.array(staleness) * 1000
+        return (shown / elapsed, cap.dropped, inferences, shown / max(inferences, 1), staleness.mean(),
+                np.percentile(staleness, 95), controller.imgsz if controller is not None else None)
+
+    variants = [(f"every {interval}", interval, None) for interval in args.intervals]
+    variants.append(('adaptive', None, AdaptiveSkipController(target_fps=args.target_fps,
+                                                              max_staleness=args.max_staleness)))
+    if detector.backend == 'torch':
+        variants.append(('adaptive+size', None, AdaptiveSkipController(target_fps=args.target_fps,
+                                                                       max_staleness=args.max_staleness,
+                                                                       sizes=DEFAULT_SIZES)))
+
+    print(f"load x{args.load}, {args.seconds:.0f}s per variant")
+    print(f"{'variant':<15}{'fps':>7}{'dropped':>9}{'infers':>8}{'interval':>10}{'imgsz':>7}"
+          f"{'stale ms':>10}{'p95 ms':>9}")
+    for name, interval, controller in variants:
+        fps, dropped, inferences, mean_interval, stale, stale_p95, imgsz = run(interval, controller)
+        print(f"{name:<15}{fps:>7.1f}{dropped:>9}{inferences:>8}{mean_interval:>10.2f}{str(imgsz or '-'):>7}"
+              f"{stale:>10.0f}{stale_p95:>9.0f}")
+        if controller is not None and args.verbose:
+            for decision in controller.stats()['decisions']:
+                print(f"    {decision}")
+
+
+def legacy_color_match(roi, target_color, color_threshold):
+    """Per-ROI matcher the detector used before the color engine: mean per-pixel RGB distance < threshold"""
+    import cv2
+    import numpy as np
+
+    try:
+        rgb_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+        color_diff = np.sqrt(np.sum((rgb_roi - target_color[::-1]) ** 2, axis=2))
+        return np.mean(color_diff) < color_threshold
+    except Exception:
+        return True  # Eski davranış: hata durumunda nesne kabul edilirdi
+
+
+def bench_color(args):
+    """Per-box legacy color matching loop vs the vectorized color engine (sampled and exact)"""
+    import contextlib
+    import io
+    import cv2
+    import numpy as np
+    from color_engine import match_box_colors
+    from main import VLMDetector
+
+    detector = VLMDetector(concurrent=False, preload=False)
+    target = detector.color_mapping['mavi']
+    rng = np.random.default_rng(0)
+
+    def loop_match(image, boxes, threshold):
+        keep = np.zeros(len(boxes), bool)
+        for i, (x1, y1, x2, y2) in enumerate(boxes.astype(np.int32)):
+            roi = image[y1:y2, x1:x2]
+            if roi.size == 0:
+                continue
+            keep[i] = legacy_color_match(roi, target, threshold)
+        return keep
+
+    print(f"{'image':<11}{'boxes':>6}{'loop':>10}{'sampled':>10}{'exact':>10}{'speedup':>9}"
+          f"{'agree':>8}{'dist err':>10}")
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split('x'))
+        # Düzgün renk bölgeleri + gürültü: gerçek görüntülere benzer bir doku
+        base = rng.integers(0, 256, (max(height // 48, 2), max(width // 48, 2), 3), dtype=np.uint8)
+        image = cv2.resize(base, (width, height), interpolation=cv2.INTER_CUBIC)
+        image = cv2.add(image, rng.integers(0, 30, image.shape, dtype=np.uint8))
+
+        sides = rng.uniform(0.05, 0.5, (args.boxes, 2)) * (width, height)
+        corners = rng.uniform(0, 1, (args.boxes, 2)) * ((width, height) - sides)
+        boxes = np.concatenate([corners, corners + sides], axis=1).astype(np.float32)
+
+        timings = {}
+        for name, function in (('loop', lambda: loop_match(image, boxes, args.threshold)),
+                               ('sampled', lambda: match_box_colors(image, boxes, target, args.threshold)),
+                               ('exact', lambda: match_box_colors(image, boxes, target, args.threshold, None))):
+            runs = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = function()
+                runs.append(time.perf_counter() - start)
+            timings[name] = (statistics.median(runs), result)
+
+        loop_keep = timings['loop'][1]
+        sampled_keep, sampled_distance = timings['sampled'][1]
+        exact_keep, exact_distance = timings['exact'][1]
+        print(f"{size:<11}{args.boxes:>6}{timings['loop'][0] * 1000:>8.1f}ms{timings['sampled'][0] * 1000:>8.2f}ms"
+              f"{timings['exact'][0] * 1000:>8.1f}ms{timings['loop'][0] / timings['sampled'][0]:>8.0f}x"
+              f"{(sampled_keep == loop_keep).mean():>8.2f}"
+              f"{np.abs(sampled_distance - exact_distance).max():>10.2f}")
+        if (exact_keep != loop_keep).any():
+            print(f"  Uyarı: tam örnekleme {int((exact_keep != loop_keep).sum())} kutuda döngüden farklı karar verdi")
+
+
+# Gerçekçi nesne tonları (BGR), sınıflandırıcının örnek tonlarından bağımsız seçildi
+OBJECT_SHADES = {
+    'kırmızı': [(30, 20, 180), (40, 50, 220), (20, 10, 150), (70, 60, 200)],
+    'mavi': [(160, 80, 40), (200, 140, 90), (140, 60, 20), (190, 110, 60)],
+    'yeşil': [(40, 120, 30), (60, 160, 90), (50, 100, 60), (80, 180, 120)],
+    'sarı': [(40, 200, 230), (80, 220, 250), (20, 180, 220)],
+    'beyaz': [(235, 240, 240), (232, 228, 225), (245, 245, 250)],
+    'siyah': [(25, 20, 20), (30, 30, 35), (15, 15, 15)],
+    'gri': [(115, 110, 110), (150, 150, 150), (95, 100, 100)],
+    'turuncu': [(20, 110, 240), (40, 140, 250)],
+    'kahverengi': [(30, 60, 110), (50, 80, 130)]
+}
+
+
+def bench_lut(args):
+    """Mean color distance vs color lookup table: speed and selectivity on synthetic colored objects"""
+    import contextlib
+    import io
+    import cv2
+    import numpy as np
+    from color_engine import match_box_colors
+    from color_lut import ColorLUT
+    from main import VLMDetector
+
+    detector = VLMDetector(concurrent=False, preload=False)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        ColorLUT(detector.color_mapping, cache_dir=cache_dir)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        lut = ColorLUT(detector.color_mapping, cache_dir=cache_dir)
+        load_time = time.perf_counter() - start
+    print(f"Tablo: {len(lut.names)} renk, {lut.table.size} bölme, oluşturma {build_time * 1000:.0f} ms, "
+          f"diskten yükleme {load_time * 1000:.1f} ms")
+
+    # Soluk bir doku üzerinde, kutunun ortasını kaplayan gürültülü ve gölgeli tek renkli nesneler;
+    # her nesne ayrı bir ızgara hücresinde (üst üste binmez)
+    columns = 10
+    rows = -(-args.objects // columns)
+    width, height = columns * 192, rows * 180
+    base = rng.integers(0, 256, (height // 40 + 1, width // 40 + 1, 3), dtype=np.uint8)
+    image = cv2.resize(base, (width, height), interpolation=cv2.INTER_CUBIC) // 2 + 64
+    names = list(OBJECT_SHADES)
+    truth = []
+    boxes = []
+    for index in range(args.objects):
+        w, h = rng.integers(80, 192), rng.integers(80, 180)
+        x = index % columns * 192 + rng.integers(0, 192 - w + 1)
+        y = index // columns * 180 + rng.integers(0, 180 - h + 1)
+        name = names[rng.integers(len(names))]
+        shades = OBJECT_SHADES[name]
+        shade = np.array(shades[rng.integers(len(shades))], np.float32)
+        ox, oy = int(w * args.coverage ** 0.5), int(h * args.coverage ** 0.5)
+        x1, y1 = x + (w - ox) // 2, y + (h - oy) // 2
+        shading = np.linspace(0.85, 1.1, oy, dtype=np.float32)[:, None, None]
+        patch = shade * shading + rng.normal(0, 10, (oy, ox, 3))
+        image[y1:y1 + oy, x1:x1 + ox] = np.clip(patch, 0, 255).astype(np.uint8)
+        boxes.append((x, y, x + w, y + h))
+        truth.append(name)
+    boxes = np.array(boxes, np.float32)
+    truth = np.array(truth)
+
+    methods = {
+        'loop': lambda color: np.array([legacy_color_match(image[y1:y2, x1:x2], color, detector.color_threshold)
+                                        for x1, y1, x2, y2 in boxes.astype(np.int32)]),
+        'distance': lambda color: match_box_colors(image, boxes, color, detector.color_threshold)[0],
+        'lut': lambda color: lut.match(image, boxes, color, args.min_fraction)[0]
+    }
+    print(f"{len(boxes)} nesne, nesne kutu alanının %{args.coverage * 100:.0f}'ini kaplıyor")
+    print(f"{'method':<10}{'ms/query':>10}{'precision':>11}{'recall':>8}{'accepted':>10}")
+    for method, function in methods.items():
+        elapsed = 0.0
+        true_positive = accepted = 0
+        for name in names:
+            color = detector.color_mapping[name]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                keep = function(color)
+            elapsed += time.perf_counter() - start
+            true_positive += int((keep & (truth == name)).sum())
+            accepted += int(keep.sum())
+        print(f"{method:<10}{elapsed / len(names) * 1000:>10.2f}{true_positive / max(accepted, 1):>11.2f}"
+              f"{true_positive / len(boxes):>8.2f}{accepted / (len(boxes) * len(names)):>10.2f}")
+
+
+def legacy_mask_colors(image, masks):
+    """Per-mask loop that resizes every mask to the image and gathers all of its pixels (pre-sampling)"""
+    import cv2
+    import numpy as np
+
+    colors = np.full((len(masks), image.shape[2]), np.nan)
+    for i, mask in enumerate(masks):
+        mask_resized = cv2.resize((mask * 255).astype(np.uint8), (image.shape[1], image.shape[0]))
+        mask_bool = mask_resized > 0
+        if np.any(mask_bool):
+            colors[i] = np.mean(image[mask_bool], axis=0)
+    return colors
+
+
+def bench_mask(args):
+    """Full-resolution per-mask color analysis vs batched sampling inside each box at mask resolution"""
+    import tracemalloc
+    import cv2
+    import numpy as np
+    from color_engine import masked_mean_colors, sample_mask_pixels
+    from color_lut import ColorLUT
+    from main import VLMDetector
+
+    detector = VLMDetector(concurrent=False, preload=False)
+    lut = ColorLUT(detector.color_mapping, cache_dir=None)
+    names = list(OBJECT_SHADES)
+    targets = np.array([detector.color_mapping[name] for name in names], np.float64)
+    rng = np.random.default_rng(0)
+
+    def measure(function):
+        runs = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = function()
+            runs.append(time.perf_counter() - start)
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return statistics.median(runs), peak, result
+
+    print(f"{'image':<11}{'masks':>6}{'legacy':>10}{'MB':>7}{'sampled':>10}{'MB':>7}{'lut':>9}{'speedup':>9}"
+          f"{'agree':>7}{'color err':>11}")
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split('x'))
+        # YOLO maskeleri model çözünürlüğündedir (uzun kenar 640, 32'nin katı)
+        mask_width = 640
+        mask_height = max(32, round(640 * height / width / 32) * 32)
+        base = rng.integers(0, 256, (height // 40 + 1, width // 40 + 1, 3), dtype=np.uint8)
+        image = cv2.resize(base, (width, height), interpolation=cv2.INTER_CUBIC) // 2 + 64
+        masks = np.zeros((args.masks, mask_height, mask_width), np.float32)
+        boxes = []
+        for i in range(args.masks):
+            # Kutunun içine oturan, gürültülü tek renkli elips nesneler
+            w, h = rng.uniform(0.08, 0.4) * width, rng.uniform(0.08, 0.4) * height
+            x1, y1 = rng.uniform(0, width - w), rng.uniform(0, height - h)
+            shades = OBJECT_SHADES[names[rng.integers(len(names))]]
+            shade = np.array(shades[rng.integers(len(shades))], np.float32)
+            sx, sy = mask_width / width, mask_height / height
+            cv2.ellipse(masks[i], (int((x1 + w / 2) * sx), int((y1 + h / 2) * sy)),
+                        (max(int(w / 2 * sx), 1), max(int(h / 2 * sy), 1)), 0, 0, 360, 1.0, -1)
+            region = cv2.resize(masks[i], (width, height), interpolation=cv2.INTER_NEAREST) > 0
+            noise = rng.normal(0, 10, (int(region.sum()), 3))
+            image[region] = np.clip(shade + noise, 0, 255).astype(np.uint8)
+            boxes.append((x1, y1, x1 + w, y1 + h))
+        boxes = np.array(boxes, np.float32)
+
+        legacy_time, legacy_peak, legacy = measure(lambda: legacy_mask_colors(image, masks))
+        sampled_time, sampled_peak, sampled = measure(
+            lambda: masked_mean_colors(*sample_mask_pixels(image, boxes, masks, args.budget)))
+        lut_time = measure(lambda: lut.box_histograms(image, boxes, args.budget, masks))[0]
+
+        # Her hedef renk için ortalama renk mesafesi kararları karşılaştırılır
+        legacy_keep = np.linalg.norm(legacy[:, None] - targets[None], axis=2) < detector.color_threshold
+        sampled_keep = np.linalg.norm(sampled[:, None] - targets[None], axis=2) < detector.color_threshold
+        print(f"{size:<11}{args.masks:>6}{legacy_time * 1000:>8.1f}ms{legacy_peak / 1e6:>7.1f}"
+              f"{sampled_time * 1000:>8.2f}ms{sampled_peak / 1e6:>7.2f}{lut_time * 1000:>7.2f}ms"
+              f"{legacy_time / sampled_time:>8.0f}x{(legacy_keep == sampled_keep).mean():>7.2f}"
+              f"{np.nanmax(np.abs(legacy - sampled)):>11.2f}")
+
+
+def bench_startup(args):
+    """Cold start: time until the window shows, the detector exists and both models are warm"""
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        gui_script = 'gui'
+    except Exception:
+        print("Ekran bulunamadı, GUI başlatması pencere olmadan ölçülüyor")
+        gui_script = 'headless'
+
+    rows = []
+    for label, name in (('eager (old)', 'eager'), ('background', gui_script)):
+        runs = [run_startup_script(name) for _ in range(args.runs)]
+        rows.append((label, {key: statistics.median(run[key] for run in runs) for key in runs[0]}))
+
+    print(f"{'startup':<14}{'window':>10}{'detector':>10}{'models':>10}   (median of {args.runs} cold starts)")
+    for label, times in rows:
+        print(f"{label:<14}{times['window']:>9.2f}s{times['backend']:>9.2f}s{times['models']:>9.2f}s")
+
+
+def detection_parity(reference, candidate, iou_threshold=0.9, conf_tolerance=0.02):
+    """
+    Share of reference detections that the candidate reproduces
+    (same class, IoU >= iou_threshold and confidence within conf_tolerance)
+    """
+    import numpy as np
+    from tracker import box_iou
+
+    if len(reference) == 0:
+        return 1.0 if len(candidate) == 0 else 0.0
+    if len(candidate) == 0:
+        return 0.0
+    iou = box_iou(reference.xyxy, candidate.xyxy)
+    same_class = reference.class_id[:, None] == candidate.class_id[None, :]
+    close_conf = np.abs(reference.conf[:, None] - candidate.conf[None, :]) <= conf_tolerance
+    matched = ((iou >= iou_threshold) & same_class & close_conf).any(axis=1)
+    return float(matched.mean())
+
+
+def bench_backends(args):
+    """Inference backends on the sample media: parity with the first backend, latency and batched throughput"""
+    import cv2
+    from detections import Detections
+    from main import VLMDetector
+    from model_registry import ModelRegistry
+
+    images = [(path, cv2.imread(path)) for path in ('traffic.webp', 'chairs.jpg', 'car1.webp')]
+    images = [(path, image) for path, image in images if image is not None]
+
+    print(f"Parity: same class, IoU >= {args.iou}, |conf diff| <= {args.conf_tolerance} vs {args.backends[0]}")
+    print(f"{'mode':<14}{'backend':<11}{'image':<14}{'latency':>10}{'boxes':>7}{'parity':>8}")
+    for mode in ('detection', 'segmentation'):
+        registry = ModelRegistry(max_models=len(args.backends))
+        detectors = {backend: VLMDetector(mode=mode, registry=registry, backend=backend, preload=False)
+                     for backend in args.backends}
+        throughput = {}
+
+        for path, image in images:
+            reference = None
+            for backend, detector in detectors.items():
+                latencies = []
+                for run in range(args.runs + 1):
+                    start = time.perf_counter()
+                    results = detector.detect_objects_direct(image)
+                    if run:
+                        latencies.append(time.perf_counter() - start)
+                detections = Detections.from_results(results, detector.class_names)
+                if reference is None:
+                    reference, parity = detections, 1.0
+                else:
+                    parity = detection_parity(reference, detections, args.iou, args.conf_tolerance)
+                print(f"{mode:<14}{backend:<11}{path:<14}{statistics.median(latencies) * 1000:>8.1f}ms"
+                      f"{len(detections):>7}{parity:>8.1%}")
+
+        frames = [images[0][1]] * args.batch
+        for backend, detector in detectors.items():
+            detector.detect_objects_batch(frames)
+            start = time.perf_counter()
+            for _ in range(max(1, args.runs // 2)):
+                detector.detect_objects_batch(frames)
+            throughput[backend] = args.batch * max(1, args.runs // 2) / (time.perf_counter() - start)
+        print(f"{mode:<14}throughput (batch {args.batch}): "
+              + ", ".join(f"{backend} {fps:.2f} img/s" for backend, fps in throughput.items()))
+
+
+def bench_llm(args):
+    """Identical prompts from many callers: one upstream request thanks to single-flight"""
+    messages = [{'role': 'user', 'content': 'arabaları göster'}]
+
+    with StubOllamaServer(delay=args.delay) as stub:
+        client = OllamaClient(host=stub.url, retries=0)
+
+        start = time.perf_counter()
+        for _ in range(args.callers):
+            client.chat('llama3.1:latest', [{'role': 'user', 'content': f'sorgu {_}'}])
+        sequential = time.perf_counter() - start
+        sequential_requests = stub.request_count
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.callers) as pool:
+            list(pool.map(lambda _: client.chat('llama3.1:latest', messages), range(args.callers)))
+        coalesced = time.perf_counter() - start
+        coalesced_requests = stub.request_count - sequential_requests
+
+        stats = client.stats()
+        client.close()
+
+    print(f"{args.callers} distinct prompts, sequential: {sequential:.2f}s, {sequential_requests} upstream requests")
+    print(f"{args.callers} identical prompts, concurrent: {coalesced:.2f}s, {coalesced_requests} upstream requests")
+    print(f"Client stats: {stats}")
+
+    with StubOllamaServer(delay=0.0, fail_first=2) as stub:
+        client = OllamaClient(host=stub.url, retries=2, backoff=0.05)
+        content = client.chat('llama3.1:latest', messages)
+        print(f"Retry check: answer={content!r}, upstream requests={stub.request_count}, "
+              f"retries={client.stats()['retries']}")
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VLM Detector benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    llm_parser = subparsers.add_parser('llm', help="LLM client pooling, retries and single-flight")
+    llm_parser.add_argument('--delay', type=float, default=0.5, help="Simulated LLM latency (s)")
+    llm_parser.add_argument('--callers', type=int, default=16, help="Number of concurrent callers")
+    llm_parser.set_defaults(func=bench_llm)
+
+    prompt_parser = subparsers.add_parser('prompt', help="Legacy vs compact structured class mapping prompt")
+    prompt_parser.add_argument('--token-cost', type=float, default=0.002,
+                               help="Simulated prefill time per uncached prompt token (s)")
+    prompt_parser.set_defaults(func=bench_prompt)
+
+    batch_parser = subparsers.add_parser('batch', help="Per-query vs batched rule set resolution")
+    batch_parser.add_argument('--rules', type=int, default=200, help="Number of distinct queries")
+    batch_parser.add_argument('--delay', type=float, default=0.3, help="Simulated LLM latency (s)")
+    batch_parser.set_defaults(func=bench_batch)
+
+    inference_parser = subparsers.add_parser('inference', help="Python post-filtering vs in-model class filtering")
+    inference_parser.add_argument('--runs', type=int, default=10, help="Timed runs per image")
+    inference_parser.set_defaults(func=bench_inference)
+
+    video_parser = subparsers.add_parser('video', help="Batched multi-frame inference throughput")
+    video_parser.add_argument('video', help="Video file to process")
+    video_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                              help="Batch sizes to compare (the first one is the baseline)")
+    video_parser.add_argument('--frames', type=int, default=64, help="Frames processed per run")
+    video_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    video_parser.set_defaults(func=bench_video)
+
+    shard_parser = subparsers.add_parser('shard', help="Multi-process sharded video processing throughput")
+    shard_parser.add_argument('video', help="Video file to process")
+    shard_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                              help="Worker counts to compare (capped at the CPU count, first one is the baseline)")
+    shard_parser.add_argument('--frames', type=int, default=128, help="Frames processed per run")
+    shard_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    shard_parser.set_defaults(func=bench_shard)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="Serial loop vs threaded decode/infer/annotate/encode pipeline")
+    pipeline_parser.add_argument('video', help="Video file to process")
+    pipeline_parser.add_argument('--frames', type=int, default=128, help="Frames processed per run")
+    pipeline_parser.add_argument('--batch', type=int, default=1, help="Frames per YOLO forward pass")
+    pipeline_parser.add_argument('--queue-size', type=int, default=8, help="Capacity of each inter-stage queue")
+    pipeline_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    skip_parser = subparsers.add_parser('skip', help="Frame skipping: decode-and-drop vs grab()/keyframe seeking")
+    skip_parser.add_argument('video', help="Video file to read")
+    skip_parser.add_argument('--skips', type=int, nargs='+', default=[1, 5, 30, 100], help="frame_skip values to test")
+    skip_parser.add_argument('--runs', type=int, default=3, help="Timed runs per strategy")
+    skip_parser.set_defaults(func=bench_skip)
+
+    track_parser = subparsers.add_parser('track', help="Tracker continuity between inference frames")
+    track_parser.add_argument('video', help="Video file to read")
+    track_parser.add_argument('--frames', type=int, default=120, help="Frames read from the video")
+    track_parser.add_argument('--intervals', type=int, nargs='+', default=[2, 3, 5, 10],
+                              help="Inference every Nth frame")
+    track_parser.add_argument('--iou', type=float, default=0.5, help="Minimum IoU for a covered object")
+    track_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    track_parser.set_defaults(func=bench_track)
+
+    gate_parser = subparsers.add_parser('gate', help="Fixed-schedule vs motion-gated inference")
+    gate_parser.add_argument('video', help="Video file to process")
+    gate_parser.add_argument('--frames', type=int, default=200, help="Frames considered for inference")
+    gate_parser.add_argument('--frame-skip', type=int, default=1, help="Inference schedule (every Nth frame)")
+    gate_parser.add_argument('--methods', nargs='+', default=['diff', 'mog2'], help="Gate methods to test")
+    gate_parser.add_argument('--min-changed', type=float, default=0.005, help="Changed pixel fraction that triggers inference")
+    gate_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    gate_parser.set_defaults(func=bench_gate)
+
+    capture_parser = subparsers.add_parser('capture', help="FIFO frame buffer vs latest-frame capture latency")
+    capture_parser.add_argument('video', help="Video file standing in for a camera")
+    capture_parser.add_argument('--frames', type=int, default=60, help="Frames shown before stopping")
+    capture_parser.add_argument('--buffer', type=int, default=4, help="FIFO buffer size of the simulated driver")
+    capture_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    capture_parser.set_defaults(func=bench_capture)
+
+    adaptive_parser = subparsers.add_parser('adaptive', help="Fixed vs adaptive detection interval on a live stream")
+    adaptive_parser.add_argument('video', help="Video file standing in for a camera")
+    adaptive_parser.add_argument('--seconds', type=float, default=10, help="Stream time per variant")
+    adaptive_parser.add_argument('--intervals', type=int, nargs='+', default=[1, 3, 5], help="Fixed intervals to compare")
+    adaptive_parser.add_argument('--target-fps', type=float, default=None, help="Display FPS to hold (default: source fps)")
+    adaptive_parser.add_argument('--max-staleness', type=float, default=None, help="Maximum detection age in seconds")
+    adaptive_parser.add_argument('--load', type=float, default=1.0, help="Slow down inference by this factor")
+    adaptive_parser.add_argument('--verbose', action='store_true', help="Print the controller decisions")
+    adaptive_parser.add_argument('--query', default="insanları bul", help="Turkish query")
+    adaptive_parser.set_defaults(func=bench_adaptive)
+
+    color_parser = subparsers.add_parser('color', help="Per-box color matching loop vs vectorized color engine")
+    color_parser.add_argument('--sizes', nargs='+', default=['640x480', '1920x1080', '3840x2160'],
+                              help="Synthetic image sizes (WIDTHxHEIGHT)")
+    color_parser.add_argument('--boxes', type=int, default=20, help="Boxes per image")
+    color_parser.add_argument('--threshold', type=float, default=120, help="Color distance threshold")
+    color_parser.add_argument('--runs', type=int, default=5, help="Timed runs per variant")
+    color_parser.set_defaults(func=bench_color)
+
+    lut_parser = subparsers.add_parser('lut', help="Color distance vs color name lookup table")
+    lut_parser.add_argument('--objects', type=int, default=60, help="Synthetic colored objects")
+    lut_parser.add_argument('--coverage', type=float, default=0.5, help="Share of the box covered by the object")
+    lut_parser.add_argument('--min-fraction', type=float, default=0.2, help="Color share needed for a LUT match")
+    lut_parser.set_defaults(func=bench_lut)
+
+    mask_parser = subparsers.add_parser('mask', help="Full-resolution per-mask vs batched sampled mask color analysis")
+    mask_parser.add_argument('--sizes', nargs='+', default=['640x480', '1920x1080', '3840x2160'],
+                             help="Synthetic image sizes (WIDTHxHEIGHT)")
+    mask_parser.add_argument('--masks', type=int, default=20, help="Segmentation masks per image")
+    mask_parser.add_argument('--budget', type=int, default=512, help="Samples per box")
+    mask_parser.add_argument('--runs', type=int, default=5, help="Timed runs per variant")
+    mask_parser.set_defaults(func=bench_mask)
+
+    startup_parser = subparsers.add_parser('startup', help="GUI cold start: eager vs background initialization")
+    startup_parser.add_argument('--runs', type=int, default=5, help="Cold starts per variant")
+    startup_parser.set_defaults(func=bench_startup)
+
+    onnx_parser = subparsers.add_parser('onnx', help="PyTorch vs ONNX Runtime backend parity and speed")
+    onnx_parser.add_argument('--runs', type=int, default=10, help="Timed runs per image")
+    onnx_parser.add_argument('--batch', type=int, default=8, help="Batch size for the throughput run")
+    onnx_parser.add_argument('--iou', type=float, default=0.9, help="Minimum IoU for a matching detection")
+    onnx_parser.add_argument('--conf-tolerance', type=float, default=0.02, help="Maximum confidence difference")
+    onnx_parser.set_defaults(func=bench_backends, backends=['torch', 'onnx'])
+
+    int8_parser = subparsers.add_parser('int8', help="fp32 vs INT8 accuracy/latency report")
+    int8_parser.add_argument('--runs', type=int, default=10, help="Timed runs per image")
+    int8_parser.add_argument('--batch', type=int, default=8, help="Batch size for the throughput run")
+    int8_parser.add_argument('--iou', type=float, default=0.5, help="Minimum IoU for a matching detection")
+    int8_parser.add_argument('--conf-tolerance', type=float, default=0.1, help="Maximum confidence difference")
+    int8_parser.set_defaults(func=bench_backends, backends=['torch', 'onnx', 'onnx-int8'])
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class LatestFrameCapture:
+    def __init__(self, source=0, realtime=None, latency_window=1000):
+        """
+        Camera reader thread that keeps only the newest frame
+
+        A dedicated thread drains the device as fast as it delivers frames. read()
+        returns the most recent one, and frames nobody asked for in time are
+        dropped instead of queueing up behind a slow consumer.
+        Args:
+            source: Camera index or video file / stream URL (a file can stand in for a camera)
+            realtime: Pace file sources at their FPS like a live camera (None = only for files)
+            latency_window: Number of recent capture-to-display latencies kept for the stats
+        """
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if realtime is None:
+            realtime = isinstance(source, str) and '://' not in source
+        self.realtime = realtime
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_id = -1          # Kaynaktaki frame numarası (atlananlar dahil)
+        self.capture_time = None
+        self.delivered_id = -1
+        self.finished = False
+        self.stopped = False
+
+        self.captured = 0
+        self.delivered = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.last_frame_id = -1
+        self.last_capture_time = None
+
+        self.thread = None
+        if self.cap.isOpened():
+            self.thread = threading.Thread(target=self.reader, name='latest-frame-capture', daemon=True)
+            self.thread.start()
+
+    def reader(self):
+        """Read frames until the source ends or release() is called"""
+        start = time.perf_counter()
+        frame_id = 0
+        while not self.stopped:
+            if self.realtime:
+                # Dosya kaynağı kamera hızında okunur
+                delay = start + frame_id / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            with self.condition:
+                # Okunmamış eski frame varsa üzerine yazılır (düşürülür)
+                self.frame = frame
+                self.frame_id = frame_id
+                self.capture_time = time.perf_counter()
+                self.captured += 1
+                self.condition.notify_all()
+            frame_id += 1
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def isOpened(self):
+        return self.cap.isOpened() and not self.stopped
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.last_frame_id + 1
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        # Canlı kaynakta konum atlanamaz
+        return False
+
+    def read(self, timeout=None):
+        """
+        Wait for a frame newer than the last one returned and return it
+        Returns:
+            (ret, frame) like cv2.VideoCapture.read(); last_frame_id and last_capture_time
+            describe the returned frame
+        """
+        with self.condition:
+            ready = self.condition.wait_for(
+                lambda: self.frame_id > self.delivered_id or self.finished or self.stopped, timeout)
+            if not ready or self.frame_id <= self.delivered_id:
+                return False, None
+            self.delivered_id = self.frame_id
+            self.delivered += 1
+            self.last_frame_id = self.frame_id
+            self.last_capture_time = self.capture_time
+            return True, self.frame
+
+    def record_display(self, capture_time=None):
+        """Record capture-to-display latency of a frame when it is shown or written"""
+        capture_time = self.last_capture_time if capture_time is None else capture_time
+        if capture_time is not None:
+            self.latencies.append(time.perf_counter() - capture_time)
+
+    @property
+    def dropped(self):
+        """Frames read from the device but replaced before anyone consumed them"""
+        return self.captured - self.delivered
+
+    def stats(self):
+        """Capture counters and capture-to-display latency in milliseconds"""
+        stats = {
+            'captured': self.captured,
+            'delivered': self.delivered,
+            'dropped': self.dropped
+        }
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            stats.update({
+                'latency_ms_mean': round(float(latencies.mean()), 1),
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 1),
+                'latency_ms_p95': round(float(np.percentile(latencies, 95)), 1),
+                'latency_ms_max': round(float(latencies.max()), 1)
+            })
+        return stats
+
+    def release(self):
+        """Stop the reader thread and close the device"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.cap.release()
@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+
+# Kutu başına örneklenen piksel sayısı (kutu ne kadar büyük olursa olsun sabit)
+COLOR_SAMPLE_BUDGET = 512
+
+
+def clip_boxes(boxes, image_shape):
+    """(N, 4) xyxy boxes as int32 pixel bounds inside the image, truncated like ROI slicing"""
+    height, width = image_shape[:2]
+    boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int32)
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes
+
+
+def sample_grid(boxes, budget=COLOR_SAMPLE_BUDGET):
+    """
+    Pixel coordinates of an evenly spaced grid of at most budget points inside every box
+    Args:
+        boxes: (N, 4) int32 clipped boxes
+        budget: Samples per box
+    Returns:
+        (ys, xs, valid): (N, S) int32 coordinates and the (N, S) mask of the real samples;
+        boxes smaller than the budget are sampled at every pixel
+    """
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    areas = widths.astype(np.int64) * heights
+
+    # Izgara kutunun en-boy oranını izler: nx * ny <= budget
+    nx = np.clip(np.round(np.sqrt(budget * widths / np.maximum(heights, 1))), 1, None).astype(np.int64)
+    nx = np.minimum(nx, np.maximum(widths, 1))
+    ny = np.minimum(np.maximum(budget // nx, 1), np.maximum(heights, 1))
+    nx = np.minimum(nx, np.maximum(budget // ny, 1))
+    counts = np.where(areas > 0, nx * ny, 0)
+
+    index = np.arange(max(budget, 1))[None, :]
+    valid = index < counts[:, None]
+    rows = index // nx[:, None]
+    cols = index % nx[:, None]
+    # Hücre merkezleri; valid olmayan noktalar kutunun içinde bir yere düşer, sonuçta maskelenir
+    ys = boxes[:, 1:2] + ((2 * rows + 1) * heights[:, None]) // (2 * ny[:, None])
+    xs = boxes[:, 0:1] + ((2 * cols + 1) * widths[:, None]) // (2 * nx[:, None])
+    ys = np.minimum(ys, np.maximum(boxes[:, 3:4] - 1, 0)).astype(np.int32)
+    xs = np.minimum(xs, np.maximum(boxes[:, 2:3] - 1, 0)).astype(np.int32)
+    return ys, xs, valid
+
+
+def sample_box_pixels(image, boxes, budget=COLOR_SAMPLE_BUDGET):
+    """
+    Gather the sampled pixels of all boxes in one fancy-indexing pass
+    Returns:
+        (pixels, valid): (N, S, C) uint8 pixels and the (N, S) mask of the real samples
+    """
+    boxes = clip_boxes(boxes, image.shape)
+    if not len(boxes):
+        return np.zeros((0, 0, image.shape[2]), image.dtype), np.zeros((0, 0), bool)
+    ys, xs, valid = sample_grid(boxes, budget)
+    return image[ys, xs], valid
+
+
+def sample_mask_pixels(image, boxes, masks, budget=COLOR_SAMPLE_BUDGET):
+    """
+    Sampled pixels of every box that fall inside the object's mask, for all objects at once
+
+    Only the grid points inside each box are looked up, in the mask at its own
+    resolution (the same coordinate mapping as resizing the mask to the image), so
+    memory grows with objects x budget instead of objects x image pixels.
+    Args:
+        image: BGR uint8 image
+        boxes: (N, 4) xyxy boxes in image pixels
+        masks: (N, h, w) masks at model resolution (> 0.5 = object)
+        budget: Samples per box
+    Returns:
+        (pixels, inside): (N, S, C) uint8 pixels and the (N, S) mask of samples on the object
+    """
+    boxes = clip_boxes(boxes, image.shape)
+    if not len(boxes):
+        return np.zeros((0, 0, image.shape[2]), image.dtype), np.zeros((0, 0), bool)
+    ys, xs, valid = sample_grid(boxes, budget)
+    height, width = image.shape[:2]
+    mask_height, mask_width = masks.shape[1:]
+    mask_ys = np.minimum((ys * 2 + 1) * mask_height // (2 * height), mask_height - 1)
+    mask_xs = np.minimum((xs * 2 + 1) * mask_width // (2 * width), mask_width - 1)
+    inside = valid & (masks[np.arange(len(boxes))[:, None], mask_ys, mask_xs] > 0.5)
+    return image[ys, xs], inside
+
+
+def masked_mean_colors(pixels, inside):
+    """(N, C) float64 mean color of the samples inside each object, NaN where there are none"""
+    counts = inside.sum(axis=1)[:, None]
+    sums = np.einsum('nsc,ns->nc', pixels.astype(np.int64), inside.astype(np.int64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def mean_color_distance(image, boxes, target_color, budget=COLOR_SAMPLE_BUDGET):
+    """
+    Mean per-pixel Euclidean distance between each box and a target color, for all boxes at once
+    Args:
+        image: BGR uint8 image
+        boxes: (N, 4) xyxy boxes in pixel coordinates
+        target_color: BGR color
+        budget: Samples per box (None = every pixel, through an integral image of the distance map)
+    Returns:
+        (N,) float32 distances, NaN for empty boxes
+    """
+    if budget is None:
+        return exact_mean_color_distance(image, boxes, target_color)
+    pixels, valid = sample_box_pixels(image, boxes, budget)
+    # Kare farklar int32'de toplanır, karekök sadece örnekler üzerinde float32 ile alınır
+    diff = pixels.astype(np.int32) - np.asarray(target_color, np.int32)
+    distance = np.sqrt(np.einsum('nsc,nsc->ns', diff, diff).astype(np.float32))
+    counts = valid.sum(axis=1)
+    total = np.where(valid, distance, 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, total / counts, np.nan).astype(np.float32)
+
+
+def exact_mean_color_distance(image, boxes, target_color):
+    """Mean per-pixel distance over every pixel of each box: one distance map, one integral, O(1) per box"""
+    diff = image.astype(np.int32) - np.asarray(target_color, np.int32)
+    distance = np.sqrt(np.einsum('hwc,hwc->hw', diff, diff).astype(np.float32))
+    return box_means(distance, boxes)[:, 0].astype(np.float32)
+
+
+def box_means(image, boxes):
+    """
+    Exact per-box channel means from one integral image (O(1) per box after an O(pixels) pass)
+    Returns:
+        (N, C) float64 means, NaN for empty boxes
+    """
+    boxes = clip_boxes(boxes, image.shape)
+    integral = cv2.integral(image, sdepth=cv2.CV_64F)
+    if integral.ndim == 2:
+        integral = integral[:, :, None]
+    x1, y1, x2, y2 = boxes.T
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    areas = ((x2 - x1) * (y2 - y1)).astype(np.float64)[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(areas > 0, sums / areas, np.nan)
+
+
+def match_box_colors(image, boxes, target_color, color_threshold, budget=COLOR_SAMPLE_BUDGET):
+    """
+    Color match decisions for all boxes in one vectorized pass
+    Returns:
+        ((N,) bool matches, (N,) float32 mean distances); empty boxes never match
+    """
+    distances = mean_color_distance(image, boxes, target_color, budget)
+    with np.errstate(invalid='ignore'):
+        return distances < color_threshold, distances
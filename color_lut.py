@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from color_engine import COLOR_SAMPLE_BUDGET, sample_box_pixels, sample_mask_pixels
+
+DEFAULT_LUT_DIR = os.path.join(Path.home(), '.cache', 'vlm_detector', 'color_lut')
+
+# Sınıflandırma kuralı değiştiğinde artırılmalı, böylece eski tablolar kullanılmaz
+COLOR_LUT_VERSION = 1
+
+# Bir nesnenin o renkte sayılması için kutudaki piksellerin en az bu oranı o renk olmalı
+COLOR_MIN_FRACTION = 0.2
+
+# Sınıflandırmada kullanılan örnek tonlar (BGR). Çizim renkleri tek ve doygun olduğundan gerçek
+# nesne renklerini iyi temsil etmez (ör. çizimdeki kahverengi koyu kırmızıya daha yakın)
+COLOR_PROTOTYPES = {
+    'kırmızı': [(0, 0, 255), (30, 30, 200), (20, 20, 150), (60, 60, 220)],
+    'turuncu': [(0, 165, 255), (0, 128, 255), (20, 100, 230), (80, 160, 250)],
+    'sarı': [(0, 255, 255), (0, 220, 240), (100, 230, 250), (30, 200, 245)],
+    'altın': [(0, 215, 255), (55, 175, 212), (30, 160, 190)],
+    'yeşil': [(0, 255, 0), (0, 128, 0), (50, 160, 50), (34, 139, 34), (100, 200, 150), (47, 107, 85)],
+    'cyan': [(255, 255, 0), (200, 200, 0), (210, 230, 150)],
+    'mavi': [(255, 0, 0), (200, 100, 30), (235, 206, 135), (180, 130, 70), (230, 160, 100), (140, 90, 50)],
+    'lacivert': [(128, 0, 0), (80, 30, 20), (112, 25, 25), (90, 50, 30)],
+    'mor': [(255, 0, 255), (128, 0, 128), (211, 0, 148), (160, 50, 120), (200, 120, 160)],
+    'pembe': [(203, 192, 255), (180, 105, 255), (147, 20, 255), (190, 170, 240)],
+    'kahverengi': [(19, 69, 139), (45, 82, 160), (33, 67, 101), (60, 100, 140), (20, 45, 80)],
+    'siyah': [(0, 0, 0)],
+    'gri': [(128, 128, 128), (80, 80, 80)],
+    'gümüş': [(192, 192, 192)],
+    'beyaz': [(255, 255, 255)]
+}
+
+
+class ColorLUT:
+    def __init__(self, palette, prototypes=None, bits=5, achromatic_chroma=12.0, black_lightness=12.0,
+                 lightness_weight=0.5, cache_dir=DEFAULT_LUT_DIR):
+        """
+        Quantized BGR -> Turkish color name table, built once and cached on disk
+
+        Every bin of a 2^bits per channel BGR cube is labeled once: bins with low Lab
+        chroma (or very dark ones) go to the nearest achromatic color by Lab lightness,
+        the others to the nearest chromatic prototype by Lab distance. Classifying a
+        pixel is then a single table lookup.
+        Args:
+            palette: dict of Turkish color name -> BGR; names sharing a value are aliases of the first
+            prototypes: dict of color name -> list of BGR reference shades (None = COLOR_PROTOTYPES);
+                palette colors without prototypes are represented by their own value
+            bits: Bits per channel kept for the lookup (5 = 32x32x32 bins)
+            achromatic_chroma: Lab chroma below which a color counts as black/gray/white
+            black_lightness: Lab lightness (0-100) below which every color is black
+            lightness_weight: Weight of the lightness difference next to the a/b difference
+            cache_dir: Directory of the cached tables (None = always build in memory)
+        """
+        self.names = []
+        colors = []
+        for name, color in palette.items():
+            if name == 'default' or tuple(color) in map(tuple, colors):
+                continue
+            self.names.append(name)
+            colors.append(tuple(color))
+        self.colors = np.array(colors, np.uint8)
+        if prototypes is None:
+            prototypes = COLOR_PROTOTYPES
+        self.prototypes = [[tuple(shade) for shade in prototypes.get(name, [color])]
+                           for name, color in zip(self.names, colors)]
+        self.bits = bits
+        self.achromatic_chroma = achromatic_chroma
+        self.black_lightness = black_lightness
+        self.lightness_weight = lightness_weight
+        self.cache_dir = cache_dir
+        self.table = self.load_or_build()
+
+    def cache_path(self):
+        """Cache file keyed by the palette, the parameters and COLOR_LUT_VERSION"""
+        key = json.dumps([COLOR_LUT_VERSION, self.names, self.prototypes, self.bits, self.achromatic_chroma,
+                          self.black_lightness, self.lightness_weight])
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"color-lut-{self.bits}-{digest}.npy")
+
+    def load_or_build(self):
+        path = self.cache_path() if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                table = np.load(path)
+                size = 1 << self.bits
+                if table.shape == (size, size, size):
+                    return table
+            except (OSError, ValueError):
+                pass
+
+        table = self.build()
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Yarım yazılmış dosya başka süreçlerce okunmasın diye önce geçici dosyaya yazılır
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    np.save(f, table)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"Renk tablosu kaydedilemedi: {e}")
+        return table
+
+    def to_lab(self, bgr):
+        """(N, 3) uint8 BGR -> (N, 3) float32 Lab with lightness 0-100 and signed a/b"""
+        lab = cv2.cvtColor(bgr.reshape(1, -1, 3), cv2.COLOR_BGR2Lab).reshape(-1, 3).astype(np.float32)
+        return np.stack([lab[:, 0] * 100 / 255, lab[:, 1] - 128, lab[:, 2] - 128], axis=1)
+
+    def build(self):
+        """Label every bin center of the quantized BGR cube with a palette index"""
+        size = 1 << self.bits
+        centers = (np.arange(size) << (8 - self.bits)) + (1 << (7 - self.bits))
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1).astype(np.uint8)
+        lab = self.to_lab(grid)
+        chroma = np.hypot(lab[:, 1], lab[:, 2])
+
+        shades = np.array([shade for shades in self.prototypes for shade in shades], np.uint8)
+        owners = np.array([index for index, shades in enumerate(self.prototypes) for _ in shades])
+        shade_lab = self.to_lab(shades)
+        achromatic = np.hypot(shade_lab[:, 1], shade_lab[:, 2]) < self.achromatic_chroma
+
+        # Renkli bölmeler: en yakın renkli örnek ton (parlaklık farkı daha az ağırlıklı)
+        weights = np.array([self.lightness_weight, 1.0, 1.0], np.float32)
+        color_lab = shade_lab[~achromatic] * weights
+        distance = ((lab * weights)[:, None, :] - color_lab[None, :, :]) ** 2
+        labels = owners[~achromatic][np.argmin(distance.sum(axis=2), axis=1)]
+
+        # Renksiz bölmeler (düşük kroma ya da çok karanlık): en yakın Lab parlaklığı
+        if achromatic.any():
+            gray = (chroma < self.achromatic_chroma) | (lab[:, 0] < self.black_lightness)
+            gray_lightness = shade_lab[achromatic, 0]
+            nearest_gray = owners[achromatic][np.argmin(np.abs(lab[:, :1] - gray_lightness[None, :]), axis=1)]
+            labels = np.where(gray, nearest_gray, labels)
+        return labels.astype(np.uint8).reshape(size, size, size)
+
+    def index_of(self, color):
+        """Palette index of a BGR color (aliases share one index), or None"""
+        matches = np.flatnonzero((self.colors == np.asarray(color, np.uint8)).all(axis=1))
+        return int(matches[0]) if len(matches) else None
+
+    def classify(self, pixels):
+        """Palette index of every uint8 BGR pixel (any leading shape)"""
+        shift = 8 - self.bits
+        return self.table[pixels[..., 0] >> shift, pixels[..., 1] >> shift, pixels[..., 2] >> shift]
+
+    def pixel_histograms(self, pixels, valid):
+        """
+        Color name histograms of (N, S) sampled pixels, counting only the valid ones
+        Returns:
+            (N, len(names)) float32 fractions; rows without valid pixels are zero
+        """
+        count = len(self.names)
+        labels = self.classify(pixels).astype(np.int64) + np.arange(len(pixels))[:, None] * count
+        histograms = np.bincount(labels[valid], minlength=len(pixels) * count).reshape(len(pixels), count)
+        totals = valid.sum(axis=1, keepdims=True)
+        return (histograms / np.maximum(totals, 1)).astype(np.float32)
+
+    def box_histograms(self, image, boxes, budget=COLOR_SAMPLE_BUDGET, masks=None):
+        """
+        Color name histogram of every box from its sampled pixels
+        Args:
+            masks: Optional (N, h, w) segmentation masks; only samples on the object are counted
+        Returns:
+            (N, len(names)) float32 fractions; rows of empty boxes (or masks) are zero
+        """
+        if masks is None:
+            pixels, valid = sample_box_pixels(image, boxes, budget)
+        else:
+            pixels, valid = sample_mask_pixels(image, boxes, masks, budget)
+        return self.pixel_histograms(pixels, valid)
+
+    def match(self, image, boxes, color, min_fraction=COLOR_MIN_FRACTION, budget=COLOR_SAMPLE_BUDGET, masks=None):
+        """
+        Boxes (or masks inside them) whose pixels are at least min_fraction of the given palette color
+        Returns:
+            ((N,) bool matches, (N,) float32 fractions of that color)
+        """
+        index = self.index_of(color)
+        if index is None:
+            raise ValueError(f"Color {tuple(color)} is not in the lookup table palette")
+        fractions = self.box_histograms(image, boxes, budget, masks)[:, index]
+        return fractions >= min_fraction, fractions
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class Detections:
+    def __init__(self, xyxy, conf, class_id, names, masks=None, track_id=None):
+        """
+        Struct-of-arrays container for detection results
+        Args:
+            xyxy: (N, 4) float32 boxes in pixel coordinates
+            conf: (N,) float32 confidences
+            class_id: (N,) int32 COCO class ids
+            names: dict of class id -> class name
+            masks: Optional (N, H, W) float32 segmentation masks at model resolution
+            track_id: Optional (N,) int64 tracker ids (-1 = not tracked)
+        """
+        self.xyxy = xyxy
+        self.conf = conf
+        self.class_id = class_id
+        self.names = names
+        self.masks = masks
+        self.track_id = track_id
+
+    @classmethod
+    def empty(cls, names, with_masks=False):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32), names,
+                   np.zeros((0, 1, 1), np.float32) if with_masks else None)
+
+    @classmethod
+    def from_results(cls, results, names, class_ids=None, min_conf=None, with_masks=False):
+        """
+        Copy a YOLO result to NumPy in a single transfer
+        Args:
+            results: ultralytics Results
+            names: dict of class id -> class name
+            class_ids: Optional array of class ids to keep (filtering happens before the mask copy)
+            min_conf: Optional confidence floor
+            with_masks: Also copy segmentation masks
+        """
+        if results is None or results.boxes is None or len(results.boxes) == 0:
+            return cls.empty(names, with_masks)
+
+        # (N, 6): x1, y1, x2, y2, conf, cls - tek seferde CPU'ya taşınır
+        data = results.boxes.data.cpu().numpy()
+        keep = None
+        if class_ids is not None or min_conf is not None:
+            keep = np.ones(len(data), dtype=bool)
+            if class_ids is not None:
+                keep &= np.isin(data[:, 5].astype(np.int32), class_ids)
+            if min_conf is not None:
+                keep &= data[:, 4] >= min_conf
+            data = data[keep]
+
+        masks = None
+        if with_masks:
+            if getattr(results, 'masks', None) is None:
+                masks = np.zeros((len(data), 1, 1), np.float32)
+            else:
+                mask_data = results.masks.data
+                if keep is not None:
+                    # Sadece seçilen maskeler kopyalanır
+                    mask_data = mask_data[np.flatnonzero(keep)]
+                masks = mask_data.cpu().numpy().astype(np.float32, copy=False)
+
+        return cls(data[:, :4].astype(np.float32), data[:, 4].astype(np.float32),
+                   data[:, 5].astype(np.int32), names, masks)
+
+    @classmethod
+    def concatenate(cls, items, names):
+        """Join several Detections (masks and track ids are kept only if every item has them)"""
+        items = [item for item in items if item is not None]
+        if not items:
+            return cls.empty(names)
+        masks = None
+        if all(item.masks is not None for item in items) and len({item.masks.shape[1:] for item in items}) == 1:
+            masks = np.concatenate([item.masks for item in items])
+        track_id = None
+        if all(item.track_id is not None for item in items):
+            track_id = np.concatenate([item.track_id for item in items])
+        return cls(np.concatenate([item.xyxy for item in items]), np.concatenate([item.conf for item in items]),
+                   np.concatenate([item.class_id for item in items]), names, masks, track_id)
+
+    def __len__(self):
+        return len(self.class_id)
+
+    def __getitem__(self, index):
+        """Subset by boolean mask, index array or slice"""
+        return Detections(self.xyxy[index], self.conf[index], self.class_id[index], self.names,
+                          None if self.masks is None else self.masks[index],
+                          None if self.track_id is None else self.track_id[index])
+
+    def filter_classes(self, class_ids):
+        """Keep detections whose class id is in class_ids (array or set)"""
+        if not isinstance(class_ids, np.ndarray):
+            class_ids = np.fromiter(class_ids, dtype=np.int32)
+        return self[np.isin(self.class_id, class_ids)]
+
+    @property
+    def class_names(self):
+        """Class name for every detection"""
+        return [self.names[int(class_id)] for class_id in self.class_id]
+
+    @property
+    def labels(self):
+        """Drawing label for every detection ('#id class: conf' when tracked)"""
+        labels = [f"{name}: {conf:.2f}" for name, conf in zip(self.class_names, self.conf)]
+        if self.track_id is not None:
+            labels = [f"#{track_id} {label}" if track_id >= 0 else label
+                      for track_id, label in zip(self.track_id, labels)]
+        return labels
+
+    def summary(self):
+        """JSON-friendly per-frame summary"""
+        summary = {
+            'objects': self.class_names,
+            'count': len(self)
+        }
+        if self.track_id is not None:
+            summary['track_ids'] = self.track_id.tolist()
+        return summary
@@ -5,13 +5,38 @@ Modern GUI for English-Turkish VLM Detector
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
 import threading
 import os
 import time
-from main import VLMDetector, VideoProcessor
+
+# Heavy modules are imported by the background initializer so the window shows at once
+cv2 = None
+np = None
+Image = None
+ImageTk = None
+VLMDetector = None
+VideoProcessor = None
+Detections = None
+MODEL_WEIGHTS = None
+ObjectTracker = None
+MotionGate = None
+LatestFrameCapture = None
+AdaptiveSkipController = None
+
+def import_heavy_modules():
+    """Import OpenCV, NumPy, PIL and the detector modules into this module's namespace"""
+    global cv2, np, Image, ImageTk, VLMDetector, VideoProcessor, Detections, MODEL_WEIGHTS
+    global ObjectTracker, MotionGate, LatestFrameCapture, AdaptiveSkipController
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageTk
+    from main import VLMDetector, VideoProcessor
+    from detections import Detections
+    from model_registry import MODEL_WEIGHTS
+    from tracker import ObjectTracker
+    from motion_gate import MotionGate
+    from capture import LatestFrameCapture
+    from adaptive_skip import AdaptiveSkipController
 
 class VLMDetectorGUI:
     def __init__(self, root):
@@ -20,10 +45,14 @@ class VLMDetectorGUI:
         self.root.geometry("1400x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize detector
-        self.detector = VLMDetector(mode='detection')
-        self.video_processor = VideoProcessor(self.detector)
+        # Detector is created by the background initializer
+        self.detector = None
+        self.video_processor = None
         self.current_mode = 'detection'
+        self.backend_ready = threading.Event()  # Modules imported, detector created
+        self.models_ready = threading.Event()   # Both YOLO models loaded and warmed up
+        self.startup_start = time.perf_counter()
+        self.startup_times = {}
         
         # Variables
         self.current_image_path = None
@@ -40,8 +69,13 @@ class VLMDetectorGUI:
         self.fps = 30
         self.video_thread = None
         self.detection_enabled = False
-        self.detection_frame_skip = 3  # Process every 3rd frame for smooth flow
+        self.detection_frame_skip = None  # None = adaptive interval, otherwise detect on every Nth frame
+        self.live_skip = None  # Picks the detection interval from the measured inference time
         self.frame_counter = 0
+        self.live_plan = None  # Compiled query for the live path, rebuilt when the prompt changes
+        self.live_tracker = None  # Moves boxes between detection frames, reset with the live plan
+        self.motion_gate_enabled = False  # Off by default, like the CLI --motion-gate flag
+        self.live_gate = None  # Skips inference while the scene is static, reset with the live plan
         
         # Configure style
         self.setup_styles()
@@ -49,6 +83,57 @@ class VLMDetectorGUI:
         # Create GUI
         self.create_widgets()
         
+        # Heavy imports and model loading run after the window is up; actions that need the
+        # detector stay disabled until the init thread reports back through root.after
+        self.browse_button.config(state='disabled')
+        self.detect_button.config(state='disabled')
+        self.status_var.set("Loading detector... Please wait")
+        threading.Thread(target=self.initialize_backend, name='gui-init', daemon=True).start()
+        
+    def initialize_backend(self):
+        """Background initializer: import heavy modules, create the detector, warm up both models"""
+        try:
+            import_heavy_modules()
+            
+            self.detector = VLMDetector(mode=self.current_mode)
+            self.video_processor = VideoProcessor(self.detector)
+            # Mode may have been toggled while the modules were importing
+            self.detector.set_mode(self.current_mode)
+            self.startup_times['backend'] = time.perf_counter() - self.startup_start
+            self.backend_ready.set()
+            self.root.after(0, self.backend_loaded)
+            self.root.after(0, self.update_status, "Loading YOLO models... (you can already load files)")
+            
+            # Warm up the segmentation model too, so switching modes does not wait for a load
+            futures = [self.detector.registry.preload(weights, self.detector.backend)
+                       for weights in MODEL_WEIGHTS.values()]
+            for future in futures:
+                future.result()
+            self.startup_times['models'] = time.perf_counter() - self.startup_start
+            self.models_ready.set()
+            self.root.after(0, self.update_status,
+                            f"Ready ({self.startup_times['models']:.1f}s) - Select an image and enter a prompt")
+            
+        except Exception as e:
+            print(f"Initialization error: {e}")
+            self.root.after(0, self.update_status, f"Initialization failed: {str(e)}")
+        
+        finally:
+            # ensure_backend() reports the failure instead of waiting forever
+            self.backend_ready.set()
+    
+    def backend_loaded(self):
+        """Runs on the Tk thread once the detector exists: enable the actions that need it"""
+        self.browse_button.config(state='normal')
+        self.detect_button.config(state='normal')
+    
+    def ensure_backend(self):
+        """Non-blocking guard for the action handlers: False while the detector is loading or if loading failed"""
+        if not self.backend_ready.is_set():
+            self.status_var.set("Loading detector... Please wait")
+            return False
+        return self.detector is not None
+        
     def setup_styles(self):
         """Configure modern styling"""
         style = ttk.Style()
@@ -229,12 +314,17 @@ class VLMDetectorGUI:
         
         # Detection frame skip
         ttk.Label(controls_frame, text="Detection Skip:").grid(row=0, column=3, padx=(20, 5))
-        self.detection_skip_var = tk.StringVar(value="3")
+        self.detection_skip_var = tk.StringVar(value="Auto")
         detection_skip_combo = ttk.Combobox(controls_frame, textvariable=self.detection_skip_var, 
-                                          values=["1", "2", "3", "5", "10", "15", "30"], width=5)
+                                          values=["Auto", "1", "2", "3", "5", "10", "15", "30"], width=5)
         detection_skip_combo.grid(row=0, column=4, padx=(0, 5))
         detection_skip_combo.bind('<<ComboboxSelected>>', self.on_detection_skip_change)
         
+        # Motion gate toggle (reuses the previous result while the scene is static)
+        self.motion_gate_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls_frame, text="Motion Gate", variable=self.motion_gate_var,
+                        command=self.toggle_motion_gate).grid(row=0, column=5, padx=(20, 0))
+        
         # Progress bar for video
         self.video_progress = ttk.Scale(self.video_player_frame, from_=0, to=100, 
                                       orient=tk.HORIZONTAL, command=self.on_progress_change)
@@ -316,8 +406,10 @@ class VLMDetectorGUI:
         new_mode = self.mode_var.get()
         if new_mode != self.current_mode:
             self.current_mode = new_mode
-            # Reinitialize detector with new mode
-            self.detector = VLMDetector(mode=new_mode)
+            # Same detector (and VideoProcessor), model comes from the shared registry
+            if self.detector is not None:
+                self.detector.set_mode(new_mode)
+            self.live_plan = None
             
             # Update button text
             if new_mode == 'segmentation':
@@ -368,6 +460,9 @@ class VLMDetectorGUI:
             messagebox.showwarning("Warning", "Please enter a detection prompt!")
             return
         
+        if not self.ensure_backend():
+            return
+        
         # Disable button and show progress
         self.browse_button.config(state='disabled')
         self.progress.start()
@@ -388,6 +483,9 @@ class VLMDetectorGUI:
         duration = self.duration_var.get().strip()
         duration = int(duration) if duration.isdigit() else 30
         
+        if not self.ensure_backend():
+            return
+        
         # Disable button and show progress
         self.browse_button.config(state='disabled')
         self.progress.start()
@@ -401,8 +499,8 @@ class VLMDetectorGUI:
     def run_live_webcam(self, prompt):
         """Run live webcam with real-time detection"""
         try:
-            # Open webcam
-            cap = cv2.VideoCapture(0)
+            # Open webcam: a reader thread keeps only the newest frame, stale ones are dropped
+            cap = LatestFrameCapture(0)
             if not cap.isOpened():
                 self.root.after(0, self.update_status, "Webcam açılamadı!")
                 return
@@ -431,6 +529,7 @@ class VLMDetectorGUI:
             self.detection_var.set(True)
             
             frame_count = 0
+            self.get_live_skip().reset()
             
             while self.is_playing and cap.isOpened():
                 ret, frame = cap.read()
@@ -438,17 +537,14 @@ class VLMDetectorGUI:
                     break
                 
                 frame_count += 1
-                self.current_frame = frame_count
-                
-                # Process every 3rd frame for performance
-                if frame_count % 3 == 0:
-                    frame = self.process_frame_for_detection(frame)
+                # Camera frame number, dropped frames included (the tracker predicts through them)
+                self.current_frame = cap.last_frame_id + 1
                 
-                # Update display
-                self.root.after(0, self.update_video_display, frame)
+                # Detect on every Nth frame (adaptive by default), the tracker fills the frames in between
+                frame = self.process_frame_for_detection(frame, infer=self.should_detect(frame_count))
                 
-                # Control frame rate
-                time.sleep(1.0 / 30)  # 30 FPS
+                # Update display (read() blocks until the camera delivers a newer frame, no sleep needed)
+                self.root.after(0, self.show_live_frame, cap, frame, cap.last_capture_time)
             
             cap.release()
             
@@ -459,15 +555,35 @@ class VLMDetectorGUI:
             # Re-enable button and stop progress
             self.root.after(0, self.live_webcam_finished)
     
+    def show_live_frame(self, cap, frame, capture_time):
+        """Display a live frame and record its capture-to-display latency"""
+        self.update_video_display(frame)
+        cap.record_display(capture_time)
+    
     def stop_live_webcam(self):
         """Stop live webcam"""
         self.is_playing = False
+        message = "Live webcam stopped"
         if self.video_cap:
+            # clear_all may get here with a file video (plain cv2.VideoCapture) loaded
+            is_live = LatestFrameCapture is not None and isinstance(self.video_cap, LatestFrameCapture)
+            stats = self.video_cap.stats() if is_live else {}
+            if 'latency_ms_mean' in stats:
+                message += (f" - latency {stats['latency_ms_mean']:.0f} ms (p95 {stats['latency_ms_p95']:.0f} ms), "
+                            f"{stats['dropped']} stale frames dropped")
+            if self.detection_frame_skip is None and self.live_skip is not None and self.live_skip.inferences:
+                stats = self.live_skip.stats()
+                message += (f" - detection every {stats['interval_mean']:.1f} frames "
+                            f"({stats['infer_ms']:.0f} ms per inference)")
             self.video_cap.release()
             self.video_cap = None
         self.detection_enabled = False
         self.detection_var.set(False)
-        self.update_status("Live webcam stopped")
+        if self.live_gate is not None and self.live_gate.checked:
+            stats = self.live_gate.stats()
+            message += (f" - motion gate skipped {stats['skipped']}/{stats['checked']} "
+                        f"inferences ({stats['skip_ratio'] * 100:.0f}%)")
+        self.update_status(message)
     
     def live_webcam_finished(self):
         """Called when live webcam is finished"""
@@ -500,6 +616,9 @@ class VLMDetectorGUI:
     
     def browse_file(self):
         """Open file dialog to select image or video"""
+        if not self.ensure_backend():
+            return
+        
         media_type = self.media_var.get()
         
         if media_type == 'image':
@@ -687,6 +806,12 @@ class VLMDetectorGUI:
         self.current_frame = 0
         if self.video_cap:
             self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if self.live_tracker is not None:
+            self.live_tracker.reset()
+        if self.live_gate is not None:
+            self.live_gate.reset()
+        if self.live_skip is not None:
+            self.live_skip.reset()
         self.update_video_display()
     
     def play_video(self):
@@ -703,8 +828,8 @@ class VLMDetectorGUI:
             self.frame_counter += 1
             
             # Process frame if detection is enabled (every frame for real-time detection)
-            if self.detection_enabled and self.frame_counter % self.detection_frame_skip == 0:
-                frame = self.process_frame_for_detection(frame)
+            if self.detection_enabled:
+                frame = self.process_frame_for_detection(frame, infer=self.should_detect(self.frame_counter))
             
             # Update display
             self.root.after(0, self.update_video_display, frame)
@@ -714,25 +839,46 @@ class VLMDetectorGUI:
             delay = int(1000 / (self.fps * speed))  # Normal speed, no slowing down
             time.sleep(delay / 1000.0)
     
-    def process_frame_for_detection(self, frame):
-        """Process frame for live detection - ultra fast real-time"""
+    def process_frame_for_detection(self, frame, infer=True):
+        """
+        Process frame for live detection - ultra fast real-time
+        Args:
+            frame: BGR frame
+            infer: Run YOLO on this frame; otherwise draw the tracker's predicted boxes
+        """
         try:
             # Get current prompt
             prompt = self.prompt_var.get().strip()
             if not prompt:
                 return frame
             
-            # Direct YOLO detection on frame (ultra fast)
-            results = self.detector.detect_objects_direct(frame)
+            # Query is compiled once per prompt, not once per frame
+            plan = self.get_live_plan(prompt)
+            start = time.perf_counter()
             
-            if results and len(results.boxes) > 0:
-                # Fast class filtering without LLM (much faster)
-                boxes, confidences, classes = self.fast_class_filter(results, prompt)
+            if infer and self.live_gate is not None and not self.live_gate.check(frame)[0]:
+                # Static scene: the previous result is reused
+                infer = False
+            
+            if infer:
+                # Direct YOLO detection on frame (ultra fast)
+                results = self.detector.detect_objects_direct(frame, plan)
                 
-                if boxes:
-                    # Draw detections directly on frame
-                    frame = self.draw_detections_on_frame(frame, boxes, confidences, classes, prompt)
-                    print(f"Frame {self.current_frame}: Found {len(boxes)} objects")
+                # Fast class filtering without LLM (much faster)
+                detections = self.live_tracker.step(self.fast_class_filter(results, plan), self.current_frame)
+            else:
+                # No inference: boxes follow the Kalman prediction of the live tracks
+                detections = self.live_tracker.step(frame_index=self.current_frame)
+            
+            if len(detections):
+                # Draw detections directly on frame
+                frame = self.draw_detections_on_frame(frame, detections, plan)
+                if infer:
+                    print(f"Frame {self.current_frame}: Found {len(detections)} objects")
+            
+            if self.detection_frame_skip is None:
+                # Frame cost feeds the adaptive detection interval
+                self.get_live_skip().record(time.perf_counter() - start, infer)
             
             return frame
             
@@ -740,75 +886,63 @@ class VLMDetectorGUI:
             print(f"Detection error: {e}")
             return frame
     
-    def fast_class_filter(self, results, prompt):
-        """Fast class filtering without LLM for real-time detection"""
+    def get_live_skip(self):
+        """Adaptive detection interval controller for the current source fps"""
+        if self.live_skip is None:
+            self.live_skip = AdaptiveSkipController(fps=self.fps)
+        self.live_skip.fps = self.fps
+        return self.live_skip
+    
+    def should_detect(self, frame_counter):
+        """Whether to run YOLO on this frame: adaptive interval, or every Nth frame when one is set"""
+        if self.detection_frame_skip is None:
+            return self.get_live_skip().should_infer()
+        return frame_counter % self.detection_frame_skip == 0
+    
+    def get_live_plan(self, prompt):
+        """Return the cached live QueryPlan, rebuilding it only when the prompt changes"""
+        if self.live_plan is None or self.live_plan.query != prompt:
+            self.live_plan = self.build_fast_plan(prompt)
+            # Tracks of the previous query are dropped
+            self.live_tracker = ObjectTracker()
+            self.live_gate = MotionGate() if self.motion_gate_enabled else None
+        return self.live_plan
+    
+    def build_fast_plan(self, prompt):
+        """Build a QueryPlan without LLM for real-time detection"""
+        # Offline Turkish lexicon (suffix stripping + whole-token matching)
+        target_classes = self.detector.lexicon.resolve(prompt)
+        
+        # If no specific class found, detect all objects
+        if not target_classes:
+            target_classes = list(self.detector.class_names.values())
+        
+        return self.detector.build_query_plan(prompt, target_classes)
+    
+    def fast_class_filter(self, results, plan):
+        """Fast class filtering against a precompiled QueryPlan"""
         try:
-            # Simple keyword matching for speed
-            prompt_lower = prompt.lower()
-            
-            # Common Turkish to English mappings for speed
-            class_mappings = {
-                'araba': 'car', 'otomobil': 'car', 'taşıt': 'car', 'vasıta': 'car',
-                'kamyon': 'truck', 'tır': 'truck', 'yük aracı': 'truck',
-                'otobüs': 'bus', 'şehir otobüsü': 'bus',
-                'motosiklet': 'motorcycle', 'moto': 'motorcycle', 'motor': 'motorcycle',
-                'bisiklet': 'bicycle', 'velespit': 'bicycle', 'pedal': 'bicycle',
-                'insan': 'person', 'kişi': 'person', 'adam': 'person', 'kadın': 'person',
-                'kedi': 'cat', 'pisi': 'cat', 'miyav': 'cat',
-                'köpek': 'dog', 'it': 'dog', 'hav hav': 'dog',
-                'kuş': 'bird', 'kanatlı': 'bird',
-                'sandalye': 'chair', 'oturak': 'chair', 'koltuk': 'chair',
-                'masa': 'dining table', 'yemek masası': 'dining table',
-                'televizyon': 'tv', 'tv': 'tv', 'ekran': 'tv',
-                'laptop': 'laptop', 'dizüstü': 'laptop', 'bilgisayar': 'laptop',
-                'telefon': 'cell phone', 'cep telefonu': 'cell phone', 'mobil': 'cell phone'
-            }
-            
-            # Find matching classes
-            target_classes = []
-            for turkish, english in class_mappings.items():
-                if turkish in prompt_lower:
-                    target_classes.append(english)
-            
-            # If no specific class found, detect all objects
-            if not target_classes:
-                target_classes = list(self.detector.class_names.values())
-            
-            # Filter results
-            filtered_boxes = []
-            filtered_confidences = []
-            filtered_classes = []
-            
-            for i, box in enumerate(results.boxes):
-                class_id = int(box.cls[0])
-                class_name = self.detector.class_names[class_id]
-                confidence = float(box.conf[0])
-                
-                if class_name.lower() in [cls.lower() for cls in target_classes]:
-                    filtered_boxes.append(box.xyxy[0].cpu().numpy())
-                    filtered_confidences.append(confidence)
-                    filtered_classes.append(class_name)
-            
-            return filtered_boxes, filtered_confidences, filtered_classes
+            # Single tensor transfer + boolean mask over the plan's class ids
+            return Detections.from_results(results, self.detector.class_names, plan.class_id_array,
+                                           plan.conf_threshold)
             
         except Exception as e:
             print(f"Fast filter error: {e}")
-            return [], [], []
+            return Detections.empty(self.detector.class_names)
     
-    def draw_detections_on_frame(self, frame, boxes, confidences, classes, prompt):
+    def draw_detections_on_frame(self, frame, detections, plan):
         """Draw bounding boxes directly on frame"""
         try:
-            # Get color from prompt
-            color = self.detector.extract_color_from_query(prompt)
+            # Get color from the compiled query
+            color = plan.color
             
-            for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-                x1, y1, x2, y2 = map(int, box)
+            for box, label in zip(detections.xyxy.astype(np.int32), detections.labels):
+                x1, y1, x2, y2 = box
                 
                 # Draw bounding box
                 cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
                 
                 # Draw label
-                label = f"{cls}: {conf:.2f}"
                 cv2.putText(frame, label, (x1, y1 - 10), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
@@ -818,20 +952,17 @@ class VLMDetectorGUI:
             print(f"Draw detections error: {e}")
             return frame
     
-    def draw_segmentation_on_frame(self, frame, masks, confidences, classes, prompt):
+    def draw_segmentation_on_frame(self, frame, detections, plan):
         """Draw segmentation masks directly on frame"""
         try:
-            # Get color from prompt
-            color = self.detector.extract_color_from_query(prompt)
+            # Get color from the compiled query
+            color = plan.color
             
             # Create overlay
             overlay = frame.copy()
             
-            for i, (mask, conf, cls) in enumerate(zip(masks, confidences, classes)):
+            for mask, label in zip(detections.masks, detections.labels):
                 # Resize mask to frame size
-                if len(mask.shape) == 3:
-                    mask = mask.squeeze()
-                
                 mask_resized = cv2.resize(mask, (frame.shape[1], frame.shape[0]))
                 mask_uint8 = (mask_resized * 255).astype(np.uint8)
                 
@@ -849,7 +980,6 @@ class VLMDetectorGUI:
                     cv2.rectangle(overlay, (x, y), (x + w, y + h), color, 2)
                     
                     # Draw label
-                    label = f"{cls}: {conf:.2f}"
                     cv2.putText(overlay, label, (x, y - 10), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
@@ -930,13 +1060,27 @@ class VLMDetectorGUI:
         else:
             self.status_var.set("Live detection disabled")
     
+    def toggle_motion_gate(self):
+        """Toggle the motion gate for live detection"""
+        self.motion_gate_enabled = self.motion_gate_var.get()
+        if self.motion_gate_enabled:
+            self.live_gate = MotionGate() if self.live_plan is not None else None
+            self.status_var.set("Motion gate enabled - static scenes reuse the previous detections")
+        else:
+            self.live_gate = None
+            self.status_var.set("Motion gate disabled")
+    
     def on_detection_skip_change(self, event=None):
         """Handle detection frame skip change"""
         try:
             self.detection_frame_skip = int(self.detection_skip_var.get())
             self.status_var.set(f"Detection frame skip set to {self.detection_frame_skip}")
         except ValueError:
-            self.detection_frame_skip = 5
+            # "Auto": the interval follows the measured inference time
+            self.detection_frame_skip = None
+            if self.live_skip is not None:
+                self.live_skip.reset()
+            self.status_var.set("Detection frame skip: adaptive")
     
     def set_prompt(self, prompt):
         """Set prompt from example button"""
@@ -999,8 +1143,8 @@ class VLMDetectorGUI:
                 self.root.after(0, self.display_result, result_image)
                 
                 # Update status
-                if isinstance(results, tuple) and len(results) >= 3:
-                    classes = results[2] if len(results) > 2 else []
+                if isinstance(results, Detections):
+                    classes = results.class_names
                     self.root.after(0, self.update_status, 
                                   f"{mode_name} completed! Found {len(classes)} objects: {', '.join(classes)}")
                 else:
@@ -1118,7 +1262,8 @@ class VLMDetectorGUI:
         self.detection_enabled = False
         self.detection_var.set(False)
         self.frame_counter = 0
-        self.detection_skip_var.set("3")
+        self.detection_skip_var.set("Auto")
+        self.detection_frame_skip = None
         
         # Reset media type to image
         self.media_var.set("image")
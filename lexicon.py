@@ -0,0 +1,214 @@
+import re
+from functools import lru_cache
+
+# Türkçe eş anlamlı kelime tablosu (çevrimdışı çözümleyici için)
+# (kategori, [(türkçe ifadeler, coco sınıfları)])
+SYNONYM_TABLE = [
+    ("İNSANLAR", [
+        (("insan", "kişi", "adam", "kadın", "çocuk", "bebek", "yaşlı", "genç"), "person"),
+    ]),
+    ("HAYVANLAR", [
+        (("kedi", "pisi", "miyav"), "cat"),
+        (("köpek", "it", "hav hav"), "dog"),
+        (("kuş", "kanatlı"), "bird"),
+        (("at", "beygir"), "horse"),
+        (("inek", "sığır"), "cow"),
+        (("koyun", "kuzu"), "sheep"),
+        (("fil", "fildişi"), "elephant"),
+        (("ayı", "boz ayı"), "bear"),
+        (("zebra",), "zebra"),
+        (("zürafa", "uzun boyunlu"), "giraffe"),
+        (("hayvan", "canlı", "evcil hayvan"), "cat, dog, bird, horse, cow, sheep, elephant, bear, zebra, giraffe"),
+    ]),
+    ("ARAÇLAR", [
+        (("araba", "otomobil", "taşıt", "vasıta"), "car"),
+        (("kamyon", "tır", "yük aracı"), "truck"),
+        (("otobüs", "şehir otobüsü"), "bus"),
+        (("motosiklet", "moto", "motor"), "motorcycle"),
+        (("bisiklet", "velespit", "pedal"), "bicycle"),
+        (("uçak", "tayyare", "hava aracı"), "airplane"),
+        (("tren", "demiryolu"), "train"),
+        (("tekne", "gemi", "deniz aracı"), "boat"),
+        (("araç", "taşıt", "vasıta", "ulaşım aracı"), "car, truck, bus, motorcycle, bicycle, airplane, train, boat"),
+    ]),
+    ("YİYECEKLER", [
+        (("elma", "kırmızı elma", "yeşil elma"), "apple"),
+        (("muz", "sarı meyve"), "banana"),
+        (("pizza", "italyan yemeği"), "pizza"),
+        (("pasta", "kek", "tatlı"), "cake"),
+        (("donut", "halka tatlı"), "donut"),
+        (("sandviç", "ekmek arası"), "sandwich"),
+        (("portakal", "turunç"), "orange"),
+        (("brokoli", "yeşil sebze"), "broccoli"),
+        (("havuç", "turuncu sebze"), "carrot"),
+        (("sosisli", "hot dog"), "hot dog"),
+        (("yiyecek", "yemek", "besin", "gıda"), "apple, banana, pizza, cake, donut, sandwich, orange, broccoli, carrot, hot dog"),
+    ]),
+    ("EŞYALAR", [
+        (("sandalye", "oturak", "koltuk"), "chair"),
+        (("masa", "yemek masası", "çalışma masası"), "dining table"),
+        (("televizyon", "tv", "ekran"), "tv"),
+        (("laptop", "dizüstü", "bilgisayar"), "laptop"),
+        (("telefon", "cep telefonu", "mobil"), "cell phone"),
+        (("kitap", "yayın", "eser"), "book"),
+        (("saat", "zaman aleti"), "clock"),
+        (("çanta", "torba", "kese"), "handbag, backpack, suitcase"),
+        (("ayakkabı", "bot", "terlik"), "shoe, boot"),
+        (("giysi", "elbise", "kıyafet"), "clothing"),
+    ]),
+    ("ELEKTRONİK", [
+        (("elektronik", "teknoloji", "cihaz"), "tv, laptop, cell phone, remote, keyboard, mouse, microwave, oven, toaster, refrigerator"),
+    ]),
+    ("EV EŞYALARI", [
+        (("ev eşyası", "mobilya", "ev aleti"), "chair, couch, bed, dining table, toilet, tv, laptop, microwave, oven, toaster, sink, refrigerator"),
+    ]),
+]
+
+# Türkçe karakterleri ASCII karşılıklarına indirger
+FOLD_TABLE = str.maketrans({
+    'ı': 'i', 'İ': 'i', 'I': 'i', 'ş': 's', 'Ş': 's', 'ğ': 'g', 'Ğ': 'g',
+    'ü': 'u', 'Ü': 'u', 'ö': 'o', 'Ö': 'o', 'ç': 'c', 'Ç': 'c', 'â': 'a', 'î': 'i', 'û': 'u'
+})
+
+# Katlanmış (ASCII) biçimde çekim ekleri - uzundan kısaya denenir
+SUFFIXES = sorted([
+    'lar', 'ler',                                   # çoğul
+    'i', 'u', 'yi', 'yu', 'ni', 'nu',               # belirtme
+    'a', 'e', 'ya', 'ye', 'na', 'ne',               # yönelme
+    'da', 'de', 'ta', 'te', 'nda', 'nde',           # bulunma
+    'dan', 'den', 'tan', 'ten', 'ndan', 'nden',     # ayrılma
+    'in', 'un', 'nin', 'nun', 'yin', 'yun',         # tamlayan
+    'la', 'le', 'yla', 'yle',                       # vasıta
+    'si', 'su', 'm', 'im', 'um', 'n',               # iyelik
+    'ki', 'daki', 'deki', 'taki', 'teki',           # ilgi
+], key=len, reverse=True)
+
+# Ünsüz yumuşaması: köpeği -> köpek, kitabı -> kitap, ağacı -> ağaç
+SOFTENED = {'g': 'k', 'b': 'p', 'd': 't'}
+
+MIN_STEM_LENGTH = 2
+MAX_SUFFIX_DEPTH = 4
+
+# Nesne belirtmeyen sorgu kelimeleri (komutlar, bağlaçlar, niceleyiciler); sözlükte bulunmasalar da
+# sorgunun tamamen çözüldüğü kabul edilir
+STOPWORDS = frozenset((
+    'goster', 'bul', 'tespit', 'et', 'ara', 'isaretle', 'sec', 'say', 'bana', 'lutfen',
+    'tum', 'butun', 'hepsi', 'her', 'bir', 'birkac', 'bazi', 'olan', 've', 'ile', 'veya',
+    'ya', 'da', 'de', 'bu', 'su', 'o', 'nerede', 'var', 'mi', 'mu', 'tane',
+    'resim', 'goruntu', 'fotograf', 'video', 'sahne', 'renk', 'renkli'
+))
+
+
+def fold(text):
+    """Küçük harfe çevirir ve Türkçe karakterleri katlar (ı/i, ş/s, ğ/g ...)"""
+    return text.translate(FOLD_TABLE).lower()
+
+
+def tokenize(text):
+    """Metni katlanmış kelimelere ayırır (kesme işaretleri yok sayılır)"""
+    return re.findall(r"[a-z0-9]+", fold(text).replace("'", "").replace("’", ""))
+
+
+@lru_cache(maxsize=4096)
+def candidate_stems(token):
+    """Bir kelimenin ekleri soyulmuş olası köklerini döndürür (en az soyulmuş önce)"""
+    stems = {token}
+    frontier = [token]
+    for _ in range(MAX_SUFFIX_DEPTH):
+        next_frontier = []
+        for word in frontier:
+            for suffix in SUFFIXES:
+                if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                    stem = word[:-len(suffix)]
+                    if stem not in stems:
+                        stems.add(stem)
+                        next_frontier.append(stem)
+        frontier = next_frontier
+
+    for stem in list(stems):
+        if stem[-1] in SOFTENED:
+            stems.add(stem[:-1] + SOFTENED[stem[-1]])
+    return tuple(sorted(stems, key=len, reverse=True))
+
+
+class TurkishLexicon:
+    def __init__(self, class_names, table=SYNONYM_TABLE, ignore_words=()):
+        """
+        Offline Turkish -> COCO class resolver built on the synonym table
+        Args:
+            class_names: Valid COCO class names (unknown targets are dropped)
+            table: Synonym table in SYNONYM_TABLE format
+            ignore_words: Extra words that carry no object (e.g. color names), like STOPWORDS
+        """
+        self.valid_classes = {name.lower() for name in class_names}
+        self.ignored = STOPWORDS | {token for word in ignore_words for token in tokenize(word)}
+        self.root = {}
+
+        for _, entries in table:
+            for phrases, targets in entries:
+                classes = [cls.strip() for cls in targets.split(',') if cls.strip() in self.valid_classes]
+                for phrase in phrases:
+                    self.add(phrase, classes)
+
+        # COCO sınıf isimleri de doğrudan eşleşir ("laptop", "pizza", "hot dog")
+        for name in self.valid_classes:
+            self.add(name, [name])
+
+    def add(self, phrase, classes):
+        """Bir ifadeyi kelime bazlı trie'ye ekler"""
+        if not classes:
+            return
+        node = self.root
+        for token in tokenize(phrase):
+            node = node.setdefault(token, {})
+        targets = node.setdefault(None, [])
+        for cls in classes:
+            if cls not in targets:
+                targets.append(cls)
+
+    def resolve(self, query):
+        """
+        Resolve a Turkish query to COCO class names
+        Returns:
+            list of class names, empty on a miss
+        """
+        return self.match(query)[0]
+
+    def match(self, query):
+        """
+        Resolve a Turkish query and report the content words the lexicon could not cover
+        Returns:
+            (class names, unresolved words); the query is fully resolved when the second list is empty
+        """
+        words = tokenize(query)
+        tokens = [candidate_stems(word) for word in words]
+        matches = []
+        unresolved = []
+
+        i = 0
+        while i < len(tokens):
+            # En uzun ifade eşleşmesini bul ("yemek masası" > "yemek")
+            node = self.root
+            best_end, best_classes = None, None
+            j = i
+            while j < len(tokens):
+                child = next((node[stem] for stem in tokens[j] if stem in node), None)
+                if child is None:
+                    break
+                node = child
+                j += 1
+                if None in node:
+                    best_end, best_classes = j, node[None]
+
+            if best_end is None:
+                if not any(stem in self.ignored for stem in tokens[i]):
+                    unresolved.append(words[i])
+                i += 1
+                continue
+
+            for cls in best_classes:
+                if cls not in matches:
+                    matches.append(cls)
+            i = best_end
+
+        return matches, unresolved
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+
+DEFAULT_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+
+
+class LLMError(Exception):
+    """Raised when the LLM request fails after all retries"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    def __init__(self, host=DEFAULT_HOST, timeout=60.0, connect_timeout=5.0, retries=2,
+                 backoff=0.5, max_connections=8, keep_alive='30m'):
+        """
+        Async Ollama /api/chat client with a pooled connection and single-flight requests
+        Args:
+            host: Ollama server URL
+            timeout: Read timeout in seconds for one request
+            connect_timeout: Connect timeout in seconds
+            retries: Extra attempts on connection errors, timeouts and 5xx responses
+            backoff: Base delay in seconds between attempts (doubles every retry)
+            max_connections: Size of the HTTP connection pool
+            keep_alive: How long Ollama keeps the model loaded after a request
+        """
+        if not host.startswith('http'):
+            host = f"http://{host}"
+        self.host = host.rstrip('/')
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+
+        self.client = None
+        self.loop = None
+        self.loop_thread = None
+        self.loop_lock = threading.Lock()
+        self.inflight = {}
+
+        # Metrikler
+        self.metrics_lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=1000)
+
+    def get_loop(self):
+        """Arka planda çalışan event loop'u başlatır ve döndürür"""
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                                    name='ollama-client', daemon=True)
+                self.loop_thread.start()
+            return self.loop
+
+    def get_client(self):
+        """Kalıcı bağlantı havuzunu döndürür (event loop içinde çağrılmalı)"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(base_url=self.host, timeout=self.timeout, limits=self.limits)
+        return self.client
+
+    def chat(self, model, messages, **options):
+        """Blocking wrapper around achat() for synchronous callers"""
+        future = asyncio.run_coroutine_threadsafe(self.achat(model, messages, **options), self.get_loop())
+        return future.result()
+
+    async def achat(self, model, messages, format=None, options=None):
+        """
+        Send a chat request, sharing the response with identical requests already in flight
+        Returns:
+            Assistant message content
+        """
+        payload = {
+            'model': model,
+            'messages': messages,
+            'stream': False,
+            'keep_alive': self.keep_alive
+        }
+        if format is not None:
+            payload['format'] = format
+        if options:
+            payload['options'] = options
+
+        key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        pending = self.inflight.get(key)
+        if pending is not None:
+            with self.metrics_lock:
+                self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(self.send(payload))
+        self.inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self.inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self.inflight.pop(key, None))
+
+    async def send(self, payload):
+        """POST /api/chat with retries and exponential backoff"""
+        client = self.get_client()
+        start = time.perf_counter()
+        last_error = None
+        status_code = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self.metrics_lock:
+                    self.retried += 1
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+
+            try:
+                response = await client.post('/api/chat', json=payload)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                last_error = e
+                continue
+
+            if response.status_code >= 400:
+                status_code = response.status_code
+                last_error = f"HTTP {response.status_code}: {response.text}"
+                if response.status_code >= 500:
+                    continue
+                break
+
+            try:
+                content = response.json()['message']['content']
+            except (ValueError, KeyError, TypeError):
+                # 200 ama beklenmeyen gövde (proxy hata sayfası, farklı API sürümü): tekrar denemek işe yaramaz
+                status_code = response.status_code
+                last_error = f"Unexpected response body (HTTP {response.status_code}): {response.text[:200]}"
+                break
+            with self.metrics_lock:
+                self.requests += 1
+                self.latencies.append(time.perf_counter() - start)
+            return content
+
+        with self.metrics_lock:
+            self.requests += 1
+            self.failures += 1
+        raise LLMError(str(last_error), status_code)
+
+    def stats(self):
+        """Latency and request counters"""
+        with self.metrics_lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'retries': self.retried,
+                'failures': self.failures
+            }
+        if latencies:
+            stats['latency_mean'] = sum(latencies) / len(latencies)
+            stats['latency_p50'] = latencies[len(latencies) // 2]
+            stats['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return stats
+
+    def close(self):
+        """Close the connection pool and stop the event loop"""
+        with self.loop_lock:
+            if self.loop is None:
+                return
+            if self.client is not None:
+                asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+                self.client = None
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=1.0)
+            self.loop = None
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Process-wide client so every detector shares one connection pool"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
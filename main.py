@@ -1,29 +1,114 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import ollama
-from PIL import Image
-import io
-import base64
 import json
+import multiprocessing
 import os
+import shutil
+import subprocess
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from mapping_cache import get_default_cache
+from llm_client import LLMError, get_default_client
+from lexicon import TurkishLexicon
+from model_registry import MODEL_WEIGHTS, ModelRegistry, get_default_registry
+from detections import Detections
+from adaptive_skip import DEFAULT_SIZES, AdaptiveSkipController
+from capture import LatestFrameCapture
+from color_engine import COLOR_SAMPLE_BUDGET, masked_mean_colors, match_box_colors, sample_mask_pixels
+from color_lut import COLOR_MIN_FRACTION, ColorLUT
+from motion_gate import MotionGate, merge_gate_stats
+from tracker import ObjectTracker
+from video_pipeline import FrameSkipper, VideoPipeline
+
+# Prompt değiştiğinde artırılmalı, böylece eski önbellek kayıtları kullanılmaz
+CLASS_MAPPING_PROMPT_VERSION = 2
+
+class QueryPlan:
+    def __init__(self, query, class_ids, color, color_name, color_filter=False, color_threshold=200,
+                 conf_threshold=0.25, filter_in_model=True, color_min_fraction=COLOR_MIN_FRACTION):
+        """
+        Compiled form of a Turkish query, resolved once and reused for every frame
+        Args:
+            query: Original Turkish query
+            class_ids: COCO class ids that match the query
+            color: BGR color used for filtering and drawing
+            color_name: Turkish name of the color
+            color_filter: Whether detections should be filtered by color
+            color_threshold: Maximum color distance accepted as a match ('distance' color method)
+            conf_threshold: Minimum detection confidence for this query
+            filter_in_model: Pass class ids and conf_threshold to YOLO so NMS and
+                mask upsampling only handle the requested classes
+            color_min_fraction: Share of an object's pixels that must have the query color
+                ('lut' color method)
+        """
+        self.query = query
+        self.class_ids = frozenset(class_ids)
+        # Vektörel filtreleme için sıralı dizi (np.isin)
+        self.class_id_array = np.array(sorted(self.class_ids), dtype=np.int32)
+        self.color = color
+        self.color_name = color_name
+        self.color_filter = color_filter
+        self.color_threshold = color_threshold
+        self.conf_threshold = conf_threshold
+        self.filter_in_model = filter_in_model
+        self.color_min_fraction = color_min_fraction
+    
+    def predict_kwargs(self):
+        """Keyword arguments for the YOLO call (empty when in-model filtering is off)"""
+        if not self.filter_in_model:
+            return {}
+        kwargs = {'conf': self.conf_threshold}
+        # Boş sınıf listesi YOLO'ya verilmez, sonuç zaten Python filtresinde boşalır
+        if self.class_ids:
+            kwargs['classes'] = self.class_id_array.tolist()
+        return kwargs
+    
+    def __repr__(self):
+        return (f"QueryPlan(query={self.query!r}, class_ids={sorted(self.class_ids)}, "
+                f"color={self.color_name!r}, color_filter={self.color_filter}, "
+                f"conf={self.conf_threshold}, filter_in_model={self.filter_in_model})")
 
 class VLMDetector:
-    def __init__(self, mode='detection'):
+    def __init__(self, mode='detection', mapping_cache=None, concurrent=True, llm_client=None,
+                 filter_in_model=True, conf_threshold=0.25, registry=None, preload=True, backend='torch'):
         """
         Initialize VLM Detector
         Args:
             mode (str): 'detection' or 'segmentation'
+            mapping_cache: QueryMappingCache for LLM class mappings (None = shared default)
+            concurrent (bool): Resolve the query while YOLO inference runs
+            llm_client: OllamaClient used by ask_llm (None = shared default)
+            filter_in_model (bool): Default for QueryPlan.filter_in_model
+            conf_threshold (float): Default confidence floor for new query plans
+            registry: ModelRegistry the YOLO model comes from (None = shared default)
+            preload (bool): Start loading and warming up the model in the background
+            backend (str): Inference backend, 'torch' (ultralytics PyTorch), 'onnx' (ONNX Runtime CPU)
+                or 'onnx-int8' (statically quantized ONNX)
         """
         self.mode = mode
-        if mode == 'segmentation':
-            self.model = YOLO('yolov8n-seg.pt')  # Segmentation model
-        else:
-            self.model = YOLO('yolov8n.pt')  # Detection model
-        
-        self.class_names = self.model.names
+        self.filter_in_model = filter_in_model
+        self.conf_threshold = conf_threshold
+        self.concurrent = concurrent
+        self.executor = None
+        self.llm_model = 'llama3.1:latest'
+        self.llm_client = llm_client if llm_client is not None else get_default_client()
+        self.class_mapping_system_prompt = None
+        # Sunucu JSON şemasını reddederse (Ollama < 0.5) sonraki isteklerde format='json' kullanılır
+        self.llm_schema_supported = True
+        self.mapping_cache = mapping_cache if mapping_cache is not None else get_default_cache()
+        
+        # Model ilk kullanımda yüklenir ve aynı ağırlıkları kullanan tüm detector'lar arasında paylaşılır
+        self.registry = registry if registry is not None else get_default_registry()
+        self.weights = MODEL_WEIGHTS[mode]
+        self.backend = backend
+        # Çıkarım giriş boyutu (None = registry.imgsz), canlı akışta AdaptiveSkipController değiştirir
+        self.imgsz = None
+        if preload:
+            self.registry.preload(self.weights, self.backend)
+        
+        # Sınıf isimleri modeli yüklemeden okunur
+        self.class_names = self.registry.get_names(self.weights)
         
         # Renk eşleştirmesi - Türkçe renk isimlerini RGB değerlerine çevirir
         self.color_mapping = {
@@ -51,384 +136,474 @@ class VLMDetector:
             'gumus': (192, 192, 192),
             'default': (0, 255, 0)  # Varsayılan yeşil
         }
+        
+        # Çevrimdışı Türkçe sözlük, LLM sadece sözlüğün tamamen çözemediği sorgular için kullanılır
+        self.lexicon = TurkishLexicon(self.class_names.values(), ignore_words=self.color_mapping)
+        
+        # Renk eşleşme eşiği (0-255 arasında) - daha esnek
+        self.color_threshold = 200
+        
+        # Renk analizinde kutu başına örneklenen piksel sayısı (None = tüm pikseller)
+        self.color_sample_budget = COLOR_SAMPLE_BUDGET
+        
+        # 'lut': renk isimleri tablosu ile piksel oranı, 'distance': hedef renge ortalama mesafe
+        self.color_method = 'lut'
+        self.color_min_fraction = COLOR_MIN_FRACTION
+        self.color_lut = None
+    
+    @property
+    def model(self):
+        """YOLO model for the current mode (loaded lazily through the registry)"""
+        return self.registry.get(self.weights, self.backend)
+    
+    def load_model(self):
+        """Load (and warm up) the model for the current mode now instead of on the first inference"""
+        return self.registry.get(self.weights, self.backend)
+    
+    def set_mode(self, mode):
+        """
+        Switch between 'detection' and 'segmentation' without rebuilding the detector
+        Args:
+            mode (str): 'detection' or 'segmentation'
+        """
+        if mode == self.mode:
+            return
+        self.mode = mode
+        self.weights = MODEL_WEIGHTS[mode]
+        self.registry.preload(self.weights, self.backend)
+        
+        class_names = self.registry.get_names(self.weights)
+        if class_names != self.class_names:
+            self.class_names = class_names
+            self.lexicon = TurkishLexicon(self.class_names.values(), ignore_words=self.color_mapping)
+            self.class_mapping_system_prompt = None
+    
+    def load_image(self, image):
+        """Dosya yolu verilirse görüntüyü okur, ndarray verilirse olduğu gibi döndürür"""
+        if isinstance(image, (str, Path)):
+            return cv2.imread(str(image))
+        return image
+    
+    def get_color_lut(self):
+        """Color name lookup table, loaded from the disk cache or built on first use"""
+        if self.color_lut is None:
+            self.color_lut = ColorLUT(self.color_mapping)
+        return self.color_lut
+    
+    def get_color_name(self, color_value):
+        """BGR değerine karşılık gelen Türkçe renk ismini döndürür"""
+        return [name for name, value in self.color_mapping.items() if value == color_value and name != 'default'][0]
+    
+    def get_predict_kwargs(self, plan):
+        """YOLO call arguments for a plan (None = no in-model filtering)"""
+        # Paylaşılan model önceki çağrının sınıf filtresini ve giriş boyutunu hatırlayabilir (canlı akış
+        # boyutu 320'ye düşürmüş olabilir), bu yüzden ikisi de her zaman açıkça verilir
+        kwargs = {'classes': None, 'imgsz': self.imgsz or self.registry.imgsz}
+        if plan is not None:
+            kwargs.update(plan.predict_kwargs())
+        return kwargs
     
     #TODO detect objects
-    def detect_objects(self, image_path):
-        results = self.model(image_path)
+    def detect_objects(self, image_path, plan=None):
+        """plan: Optional QueryPlan whose classes and confidence floor are applied inside YOLO"""
+        results = self.model(image_path, **self.get_predict_kwargs(plan))
         return results[0]
     
-    def detect_objects_direct(self, frame):
+    def detect_objects_direct(self, frame, plan=None):
         """Direct detection on frame (faster for real-time)"""
-        results = self.model(frame)
+        results = self.model(frame, **self.get_predict_kwargs(plan))
         return results[0]
     
-    #TODO filterin object by classes
-    def filter_objects_by_class(self, results, target_class):
-        filtered_boxes = []
-        filtered_confidences = []
-        filtered_classes = []
-        
-        available_classes = list(self.class_names.values())
-        
-        # Renk bilgisini çıkar
-        detected_color = self.extract_color_from_query(target_class)
-        color_name = [name for name, value in self.color_mapping.items() if value == detected_color and name != 'default'][0]
+    def detect_objects_batch(self, frames, plan=None):
+        """Batched detection on a list of frames, one result per frame in input order"""
+        return self.model(frames, **self.get_predict_kwargs(plan))
+    
+    def resolve_offline(self, target_class):
+        """Sorguyu LLM'e gitmeden çözer: önce sözlük, sonra önbellek (ikisi de tamamen çözemiyorsa None)"""
+        lexicon_classes, unresolved = self.lexicon.match(target_class)
+        if lexicon_classes and not unresolved:
+            print(f"Sözlük sınıf eşleştirmesi: {lexicon_classes}")
+            return lexicon_classes
+        if lexicon_classes:
+            # "masadaki bardak": masa bulundu ama bardak bulunmadı, sorgu LLM'e gitmeli
+            print(f"Sözlük sorguyu kısmen çözdü ({lexicon_classes}), çözülemeyen kelimeler: {unresolved}")
+        
+        cached = self.mapping_cache.get(self.strip_color_words(target_class), self.llm_model,
+                                        CLASS_MAPPING_PROMPT_VERSION)
+        if cached is not None:
+            print(f"Önbellekten sınıf eşleştirmesi: {cached}")
+            return cached
+        return None
+    
+    def map_query_to_classes(self, target_class):
+        """Türkçe sorguyu COCO sınıf isimlerine eşler: önce sözlük, sonra önbellek, en son LLM"""
+        offline_classes = self.resolve_offline(target_class)
+        if offline_classes is not None:
+            return offline_classes
+        return self.map_query_with_llm(target_class)
+    
+    def map_query_with_llm(self, target_class):
+        """
+        Sözlük ve önbelleğin tamamen çözemediği sorguyu LLM ile eşler, sonucu önbelleğe yazar
         
-        # Renk bilgisini target_class'dan çıkar
-        clean_target = target_class.lower()
-        for color in self.color_mapping.keys():
-            if color != 'default' and color in clean_target:
-                clean_target = clean_target.replace(color, '').strip()
-                break
+        LLM başarısız olursa ya da boş cevap verirse sözlüğün kısmi eşleşmesi (varsa) kullanılır.
+        """
+        clean_target = self.strip_color_words(target_class)
         
-        llm_prompt = f"""
-        Kullanıcı "{target_class}" nesnesini arıyor.
-        
-        Mevcut COCO sınıfları: {', '.join(available_classes)}
-        
-        Bu sınıflardan hangileri "{clean_target}" ile eşleşiyor? 
-        
-        Önemli: Türkçe kelimeleri İngilizce COCO sınıflarıyla eşleştir. Aynı anlama gelen farklı kelimeleri de düşün:
-        
-        İNSANLAR:
-        - "insan", "kişi", "adam", "kadın", "çocuk", "bebek", "yaşlı", "genç" → "person"
-        
-        HAYVANLAR:
-        - "kedi", "pisi", "miyav" → "cat"
-        - "köpek", "it", "hav hav" → "dog" 
-        - "kuş", "kanatlı" → "bird"
-        - "at", "beygir" → "horse"
-        - "inek", "sığır" → "cow"
-        - "koyun", "kuzu" → "sheep"
-        - "fil", "fildişi" → "elephant"
-        - "ayı", "boz ayı" → "bear"
-        - "zebra" → "zebra"
-        - "zürafa", "uzun boyunlu" → "giraffe"
-        - "hayvan", "canlı", "evcil hayvan" → "cat, dog, bird, horse, cow, sheep, elephant, bear, zebra, giraffe"
-        
-        ARAÇLAR:
-        - "araba", "otomobil", "taşıt", "vasıta" → "car"
-        - "kamyon", "tır", "yük aracı" → "truck"
-        - "otobüs", "şehir otobüsü" → "bus"
-        - "motosiklet", "moto", "motor" → "motorcycle"
-        - "bisiklet", "velespit", "pedal" → "bicycle"
-        - "uçak", "tayyare", "hava aracı" → "airplane"
-        - "tren", "demiryolu" → "train"
-        - "tekne", "gemi", "deniz aracı" → "boat"
-        - "araç", "taşıt", "vasıta", "ulaşım aracı" → "car, truck, bus, motorcycle, bicycle, airplane, train, boat"
-        
-        YİYECEKLER:
-        - "elma", "kırmızı elma", "yeşil elma" → "apple"
-        - "muz", "sarı meyve" → "banana"
-        - "pizza", "italyan yemeği" → "pizza"
-        - "pasta", "kek", "tatlı" → "cake"
-        - "donut", "halka tatlı" → "donut"
-        - "sandviç", "ekmek arası" → "sandwich"
-        - "portakal", "turunç" → "orange"
-        - "brokoli", "yeşil sebze" → "broccoli"
-        - "havuç", "turuncu sebze" → "carrot"
-        - "sosisli", "hot dog" → "hot dog"
-        - "yiyecek", "yemek", "besin", "gıda" → "apple, banana, pizza, cake, donut, sandwich, orange, broccoli, carrot, hot dog"
-        
-        EŞYALAR:
-        - "sandalye", "oturak", "koltuk" → "chair"
-        - "masa", "yemek masası", "çalışma masası" → "dining table"
-        - "televizyon", "tv", "ekran" → "tv"
-        - "laptop", "dizüstü", "bilgisayar" → "laptop"
-        - "telefon", "cep telefonu", "mobil" → "cell phone"
-        - "kitap", "yayın", "eser" → "book"
-        - "saat", "zaman aleti" → "clock"
-        - "çanta", "torba", "kese" → "handbag, backpack, suitcase"
-        - "ayakkabı", "bot", "terlik" → "shoe, boot"
-        - "giysi", "elbise", "kıyafet" → "clothing"
-        
-        ELEKTRONİK:
-        - "elektronik", "teknoloji", "cihaz" → "tv, laptop, cell phone, remote, keyboard, mouse, microwave, oven, toaster, refrigerator"
-        
-        EV EŞYALARI:
-        - "ev eşyası", "mobilya", "ev aleti" → "chair, couch, bed, dining table, toilet, tv, laptop, microwave, oven, toaster, sink, refrigerator"
-        
-        SADECE eşleşen COCO sınıf isimlerini virgülle ayırarak ver. Başka açıklama yapma.
-        Örnek: person, car, truck
-        """
-        
-        llm_response = self.ask_llm(llm_prompt)
+        try:
+            llm_response = self.request_llm(clean_target, system=self.get_class_mapping_system_prompt(),
+                                            format=self.get_class_mapping_schema())
+        except Exception as e:
+            partial_classes = self.lexicon.resolve(target_class)
+            print(f"Uyarı: LLM sınıf eşleştirmesi başarısız, sözlüğün kısmi eşleşmesi kullanılıyor "
+                  f"({partial_classes}): {e}")
+            return partial_classes
         print(f"LLM sınıf eşleştirmesi: {llm_response}")
         
-        lines = llm_response.strip().split('\n')
-        matching_classes = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('"') and not line.startswith('Ayrıca'):
-                if ',' in line:
-                    classes = [cls.strip().lower() for cls in line.split(',')]
-                    matching_classes.extend(classes)
-                else:
-                    if line.lower() in [name.lower() for name in available_classes]:
-                        matching_classes.append(line.lower())
-        
+        matching_classes = self.parse_class_mapping(llm_response)
+        print(f"Parse edilen sınıflar: {matching_classes}")
         if not matching_classes:
-            matching_classes = [cls.strip().lower() for cls in llm_response.split(',')]
+            return self.lexicon.resolve(target_class)
         
-        print(f"Parse edilen sınıflar: {matching_classes}")
+        # LLM hataları ve boş cevaplar önbelleğe alınmaz
+        # Anahtar LLM'e giden renksiz sorgudur, "kırmızı araba" ve "mavi araba" aynı kaydı kullanır
+        if matching_classes:
+            self.mapping_cache.put(clean_target, self.llm_model, CLASS_MAPPING_PROMPT_VERSION, matching_classes)
+        
+        return matching_classes
+    
+    def resolve_queries(self, queries, batch_size=40):
+        """
+        Resolve many Turkish queries at once, packing lexicon/cache misses into few LLM calls
+        Args:
+            queries: List of Turkish queries (e.g. one per camera rule)
+            batch_size: Maximum number of queries per LLM request
+        Returns:
+            dict mapping each query to its list of COCO class names
+        """
+        resolved = {}
+        pending = {}
         
-        for i, box in enumerate(results.boxes):
-            class_id = int(box.cls[0])
-            class_name = self.class_names[class_id]
-            confidence = float(box.conf[0])
+        for query in queries:
+            if query in resolved or query in pending:
+                continue
+            
+            # Sözlük sorgunun tüm içerik kelimelerini çözemediyse önbelleğe ve LLM'e bakılır
+            classes, unresolved = self.lexicon.match(query)
+            if not classes or unresolved:
+                classes = self.mapping_cache.get(self.strip_color_words(query), self.llm_model,
+                                                 CLASS_MAPPING_PROMPT_VERSION)
             
-            if class_name.lower() in matching_classes:
-                filtered_boxes.append(box.xyxy[0].cpu().numpy())
-                filtered_confidences.append(confidence)
-                filtered_classes.append(class_name)
+            if classes:
+                resolved[query] = classes
+            else:
+                pending[query] = self.strip_color_words(query)
+        
+        pending_queries = list(pending)
+        batches = [pending_queries[i:i + batch_size] for i in range(0, len(pending_queries), batch_size)]
+        if batches:
+            print(f"Toplu sınıf eşleştirmesi: {len(pending_queries)} sorgu, {len(batches)} LLM isteği")
+        
+        # Paketler havuzlu istemci üzerinden paralel gönderilir
+        batch_results = self.get_executor().map(
+            lambda batch: self.ask_llm(json.dumps([pending[query] for query in batch], ensure_ascii=False),
+                                       system=self.get_batch_mapping_system_prompt(),
+                                       format=self.get_batch_mapping_schema()),
+            batches)
+        
+        missing = []
+        new_mappings = {}
+        for batch, llm_response in zip(batches, batch_results):
+            mappings = self.parse_batch_mapping(llm_response, len(batch))
+            if mappings is None:
+                print(f"Toplu eşleştirme başarısız: {llm_response[:200]}")
+                resolved.update({query: self.lexicon.resolve(query) for query in batch})
+                continue
+            
+            for index, query in enumerate(batch):
+                if index in mappings:
+                    resolved[query] = mappings[index] or self.lexicon.resolve(query)
+                    if mappings[index]:
+                        new_mappings[pending[query]] = mappings[index]
+                else:
+                    missing.append(query)
         
-        return filtered_boxes, filtered_confidences, filtered_classes
-    #TODO filter by class but this time for segmentation
-    def filter_objects_by_class_segmentation(self, results, target_class):
-        """Segmentation için sınıf bazında filtreleme"""
-        filtered_masks = []
-        filtered_confidences = []
-        filtered_classes = []
+        # Bütün paketin sonuçları önbellek dosyasına tek seferde yazılır
+        self.mapping_cache.put_many(new_mappings, self.llm_model, CLASS_MAPPING_PROMPT_VERSION)
         
-        available_classes = list(self.class_names.values())
+        # Cevapta eksik kalan sorgular tek tek çözülür
+        for query in missing:
+            resolved[query] = self.map_query_to_classes(query)
         
-        # Renk bilgisini çıkar
-        detected_color = self.extract_color_from_query(target_class)
-        color_name = [name for name, value in self.color_mapping.items() if value == detected_color and name != 'default'][0]
+        return {query: resolved[query] for query in queries}
+    
+    def get_batch_mapping_system_prompt(self):
+        """Stable system prompt for batched class mapping"""
+        return (
+            self.get_class_mapping_system_prompt()
+            + " Kullanıcı mesajı JSON sorgu listesidir. Her sorgu için listedeki sırasını id olarak ver. "
+            "Cevap JSON: {\"results\": [{\"id\": 0, \"classes\": [sınıf isimleri]}]}."
+        )
+    
+    def get_batch_mapping_schema(self):
+        """JSON schema for batched structured output"""
+        return {
+            'type': 'object',
+            'properties': {
+                'results': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer'},
+                            'classes': self.get_class_mapping_schema()['properties']['classes']
+                        },
+                        'required': ['id', 'classes']
+                    }
+                }
+            },
+            'required': ['results']
+        }
+    
+    def parse_batch_mapping(self, llm_response, batch_length):
+        """
+        Parse a batched class mapping response
+        Returns:
+            dict of query index -> validated class list, or None if the response is unusable
+        """
+        try:
+            data = json.loads(llm_response)
+        except ValueError:
+            return None
         
-        # Renk bilgisini target_class'dan çıkar
-        clean_target = target_class.lower()
+        results = data.get('results') if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            return None
+        
+        mappings = {}
+        for item in results:
+            if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+                continue
+            if 0 <= item['id'] < batch_length:
+                mappings[item['id']] = self.validate_classes(item.get('classes', []))
+        return mappings
+    
+    def strip_color_words(self, query):
+        """Sorgudan renk kelimesini çıkarır (sınıf eşleştirmesini renk etkilemesin)"""
+        clean_target = query.lower()
         for color in self.color_mapping.keys():
             if color != 'default' and color in clean_target:
                 clean_target = clean_target.replace(color, '').strip()
                 break
+        return clean_target
+    
+    def get_class_mapping_system_prompt(self):
+        """
+        Shared, stable system prompt for class mapping
         
-        llm_prompt = f"""
-        Kullanıcı "{target_class}" nesnesini arıyor.
-        
-        Mevcut COCO sınıfları: {', '.join(available_classes)}
-        
-        Bu sınıflardan hangileri "{clean_target}" ile eşleşiyor? 
-        
-        Önemli: Türkçe kelimeleri İngilizce COCO sınıflarıyla eşleştir. Aynı anlama gelen farklı kelimeleri de düşün:
-        
-        İNSANLAR:
-        - "insan", "kişi", "adam", "kadın", "çocuk", "bebek", "yaşlı", "genç" → "person"
-        
-        HAYVANLAR:
-        - "kedi", "pisi", "miyav" → "cat"
-        - "köpek", "it", "hav hav" → "dog" 
-        - "kuş", "kanatlı" → "bird"
-        - "at", "beygir" → "horse"
-        - "inek", "sığır" → "cow"
-        - "koyun", "kuzu" → "sheep"
-        - "fil", "fildişi" → "elephant"
-        - "ayı", "boz ayı" → "bear"
-        - "zebra" → "zebra"
-        - "zürafa", "uzun boyunlu" → "giraffe"
-        - "hayvan", "canlı", "evcil hayvan" → "cat, dog, bird, horse, cow, sheep, elephant, bear, zebra, giraffe"
-        
-        ARAÇLAR:
-        - "araba", "otomobil", "taşıt", "vasıta" → "car"
-        - "kamyon", "tır", "yük aracı" → "truck"
-        - "otobüs", "şehir otobüsü" → "bus"
-        - "motosiklet", "moto", "motor" → "motorcycle"
-        - "bisiklet", "velespit", "pedal" → "bicycle"
-        - "uçak", "tayyare", "hava aracı" → "airplane"
-        - "tren", "demiryolu" → "train"
-        - "tekne", "gemi", "deniz aracı" → "boat"
-        - "araç", "taşıt", "vasıta", "ulaşım aracı" → "car, truck, bus, motorcycle, bicycle, airplane, train, boat"
-        
-        YİYECEKLER:
-        - "elma", "kırmızı elma", "yeşil elma" → "apple"
-        - "muz", "sarı meyve" → "banana"
-        - "pizza", "italyan yemeği" → "pizza"
-        - "pasta", "kek", "tatlı" → "cake"
-        - "donut", "halka tatlı" → "donut"
-        - "sandviç", "ekmek arası" → "sandwich"
-        - "portakal", "turunç" → "orange"
-        - "brokoli", "yeşil sebze" → "broccoli"
-        - "havuç", "turuncu sebze" → "carrot"
-        - "sosisli", "hot dog" → "hot dog"
-        - "yiyecek", "yemek", "besin", "gıda" → "apple, banana, pizza, cake, donut, sandwich, orange, broccoli, carrot, hot dog"
-        
-        EŞYALAR:
-        - "sandalye", "oturak", "koltuk" → "chair"
-        - "masa", "yemek masası", "çalışma masası" → "dining table"
-        - "televizyon", "tv", "ekran" → "tv"
-        - "laptop", "dizüstü", "bilgisayar" → "laptop"
-        - "telefon", "cep telefonu", "mobil" → "cell phone"
-        - "kitap", "yayın", "eser" → "book"
-        - "saat", "zaman aleti" → "clock"
-        - "çanta", "torba", "kese" → "handbag, backpack, suitcase"
-        - "ayakkabı", "bot", "terlik" → "shoe, boot"
-        - "giysi", "elbise", "kıyafet" → "clothing"
-        
-        ELEKTRONİK:
-        - "elektronik", "teknoloji", "cihaz" → "tv, laptop, cell phone, remote, keyboard, mouse, microwave, oven, toaster, refrigerator"
-        
-        EV EŞYALARI:
-        - "ev eşyası", "mobilya", "ev aleti" → "chair, couch, bed, dining table, toilet, tv, laptop, microwave, oven, toaster, sink, refrigerator"
-        
-        SADECE eşleşen COCO sınıf isimlerini virgülle ayırarak ver. Başka açıklama yapma.
-        Örnek: person, car, truck
-        """
-        
-        llm_response = self.ask_llm(llm_prompt)
-        print(f"LLM sınıf eşleştirmesi: {llm_response}")
+        The prompt never changes between calls, so with keep_alive Ollama can reuse
+        its evaluated prefix and only the short user message is processed per query.
+        """
+        if self.class_mapping_system_prompt is None:
+            self.class_mapping_system_prompt = (
+                "Türkçe nesne sorgularını COCO sınıflarına eşle. Eş anlamlıları ve üst kategorileri "
+                "de düşün (örn. \"hayvan\" tüm hayvan sınıfları). Sadece şu sınıfları kullan: "
+                f"{', '.join(self.class_names.values())}. "
+                "Cevap JSON: {\"classes\": [sınıf isimleri]}. Eşleşme yoksa boş liste."
+            )
+        return self.class_mapping_system_prompt
+    
+    def get_class_mapping_schema(self):
+        """JSON schema for structured output, restricted to the model's class names"""
+        return {
+            'type': 'object',
+            'properties': {
+                'classes': {
+                    'type': 'array',
+                    'items': {'type': 'string', 'enum': list(self.class_names.values())}
+                }
+            },
+            'required': ['classes']
+        }
+    
+    def parse_class_mapping(self, llm_response):
+        """
+        Parse a structured class mapping response and validate it against self.class_names
+        Returns:
+            list of valid, lowercase class names (empty if nothing valid was found)
+        """
+        try:
+            data = json.loads(llm_response)
+        except ValueError:
+            # JSON bozuksa ilk {...} bloğunu dene, o da yoksa virgülle ayrılmış listeye düş
+            start, end = llm_response.find('{'), llm_response.rfind('}')
+            try:
+                data = json.loads(llm_response[start:end + 1]) if 0 <= start < end else None
+            except ValueError:
+                data = None
+            if data is None:
+                data = {'classes': llm_response.split(',')}
+        
+        candidates = data.get('classes', []) if isinstance(data, dict) else data
+        return self.validate_classes(candidates)
+    
+    def validate_classes(self, candidates):
+        """Keep only names that exist in self.class_names (lowercase, deduplicated)"""
+        if not isinstance(candidates, list):
+            return []
         
-        lines = llm_response.strip().split('\n')
+        valid = {name.lower() for name in self.class_names.values()}
         matching_classes = []
+        for cls in candidates:
+            cls = str(cls).strip().strip('"').lower()
+            if cls in valid and cls not in matching_classes:
+                matching_classes.append(cls)
+        return matching_classes
+    
+    def compile_query(self, user_query, matching_classes=None):
+        """
+        Compile a Turkish query into a QueryPlan once so it can be reused for every frame
+        Args:
+            user_query: Turkish query for detection
+            matching_classes: Already resolved class names (None = resolve the query here)
+        Returns:
+            QueryPlan
+        """
+        detected_color = self.extract_color_from_query(user_query)
+        color_name = self.get_color_name(detected_color)
+        print(f"Tespit edilen renk: {color_name}")
         
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('"') and not line.startswith('Ayrıca'):
-                if ',' in line:
-                    classes = [cls.strip().lower() for cls in line.split(',')]
-                    matching_classes.extend(classes)
-                else:
-                    if line.lower() in [name.lower() for name in available_classes]:
-                        matching_classes.append(line.lower())
-        
-        if not matching_classes:
-            matching_classes = [cls.strip().lower() for cls in llm_response.split(',')]
-        
-        print(f"Parse edilen sınıflar: {matching_classes}")
+        if matching_classes is None:
+            matching_classes = self.map_query_to_classes(user_query)
+        return self.build_query_plan(user_query, matching_classes, detected_color)
+    
+    def build_query_plan(self, user_query, matching_classes, color=None, conf_threshold=None):
+        """Hazır sınıf listesinden QueryPlan oluşturur (LLM çağrısı yapmaz)"""
+        if conf_threshold is None:
+            conf_threshold = self.conf_threshold
+        if color is None:
+            color = self.extract_color_from_query(user_query)
+        wanted = {cls.strip().lower() for cls in matching_classes}
+        class_ids = [class_id for class_id, name in self.class_names.items() if name.lower() in wanted]
+        return QueryPlan(user_query, class_ids, color, self.get_color_name(color),
+                         color_filter=color != self.color_mapping['default'],
+                         color_threshold=self.color_threshold,
+                         conf_threshold=conf_threshold,
+                         filter_in_model=self.filter_in_model,
+                         color_min_fraction=self.color_min_fraction)
+    
+    def get_executor(self):
+        """Sorgu çözümlemesi için arka plan thread havuzunu döndürür"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='vlm-query')
+        return self.executor
+    
+    def get_query_plan(self, query):
+        """Sorgu zaten derlenmişse olduğu gibi döndürür, değilse derler"""
+        if isinstance(query, QueryPlan):
+            return query
+        return self.compile_query(query)
+    
+    #TODO filterin object by classes
+    def filter_objects_by_class(self, results, target_class):
+        """
+        Detection için sınıf bazında filtreleme
+        Args:
+            results: YOLO result
+            target_class: Turkish query or a compiled QueryPlan
+        Returns:
+            Detections holding only the matching classes
+        """
+        plan = self.get_query_plan(target_class)
+        return Detections.from_results(results, self.class_names, plan.class_id_array, plan.conf_threshold)
+    
+    #TODO filter by class but this time for segmentation
+    def filter_objects_by_class_segmentation(self, results, target_class):
+        """Segmentation için sınıf bazında filtreleme (target_class: sorgu veya QueryPlan)"""
+        plan = self.get_query_plan(target_class)
         
-        # Segmentation sonuçlarını filtrele
-        if hasattr(results, 'masks') and results.masks is not None:
-            for i, mask in enumerate(results.masks.data):
-                class_id = int(results.boxes.cls[i])
-                class_name = self.class_names[class_id]
-                confidence = float(results.boxes.conf[i])
-                
-                if class_name.lower() in matching_classes:
-                    # Mask'ı CPU'ya taşı ve numpy'a çevir
-                    mask_np = mask.cpu().numpy()
-                    filtered_masks.append(mask_np)
-                    filtered_confidences.append(confidence)
-                    filtered_classes.append(class_name)
+        # Maskesiz sonuçlarda segmentation çizilemez
+        if getattr(results, 'masks', None) is None:
+            return Detections.empty(self.class_names, with_masks=True)
         
-        return filtered_masks, filtered_confidences, filtered_classes
+        return Detections.from_results(results, self.class_names, plan.class_id_array, plan.conf_threshold,
+                                       with_masks=True)
     
-    def filter_objects_by_color_segmentation(self, image_path, masks, confidences, classes, target_color):
-        """Segmentation için renk bazında filtreleme"""
-        if target_color == self.color_mapping['default']:
-            return masks, confidences, classes
+    def filter_objects_by_color_segmentation(self, image, detections, target_color, color_threshold=None,
+                                             min_fraction=None):
+        """Segmentation için renk bazında filtreleme (image: dosya yolu veya BGR ndarray)"""
+        if color_threshold is None:
+            color_threshold = self.color_threshold
+        if min_fraction is None:
+            min_fraction = self.color_min_fraction
+        
+        if target_color == self.color_mapping['default'] or len(detections) == 0:
+            return detections
         
         try:
             # Görüntüyü yükle
-            image = cv2.imread(image_path)
+            image = self.load_image(image)
             if image is None:
-                return masks, confidences, classes
-            
-            filtered_masks = []
-            filtered_confidences = []
-            filtered_classes = []
+                return detections
             
-            for i, (mask, conf, cls) in enumerate(zip(masks, confidences, classes)):
-                # Mask'ı resim boyutuna uyarla
-                if len(mask.shape) == 3:
-                    mask = mask.squeeze()
-                
-                # Mask'ı 0-255 aralığına çevir
-                mask_uint8 = (mask * 255).astype(np.uint8)
-                
-                # Mask'ı resim boyutuna yeniden boyutlandır
-                mask_resized = cv2.resize(mask_uint8, (image.shape[1], image.shape[0]))
-                
-                # Mask alanındaki renkleri analiz et
-                mask_bool = mask_resized > 0
-                if np.any(mask_bool):
-                    masked_region = image[mask_bool]
-                    # Ortalama renk hesapla
-                    avg_color = np.mean(masked_region, axis=0)
-                    
-                    # Renk mesafesi hesapla
-                    color_diff = np.sqrt(np.sum((avg_color - target_color) ** 2))
-                    
-                    # Eşik kontrolü
-                    if color_diff < 200:  # Aynı eşik değeri
-                        filtered_masks.append(mask)
-                        filtered_confidences.append(conf)
-                        filtered_classes.append(cls)
-                        print(f"Segmentation renk analizi: Hedef={target_color}, Ortalama={avg_color}, Mesafe={color_diff:.1f}, Eşleşme=True")
-                    else:
-                        print(f"Segmentation renk analizi: Hedef={target_color}, Ortalama={avg_color}, Mesafe={color_diff:.1f}, Eşleşme=False")
-                else:
-                    print(f"Segmentation renk analizi: Mask boş, atlanıyor")
+            # Maskeler tam çözünürlüğe büyütülmez: her kutunun içinden örnek pikseller alınır ve
+            # maskenin kendi çözünürlüğünde nesneye düşüp düşmedikleri kontrol edilir
+            budget = self.color_sample_budget or COLOR_SAMPLE_BUDGET
+            if self.color_method == 'lut':
+                keep, fractions = self.get_color_lut().match(image, detections.xyxy, target_color, min_fraction,
+                                                             budget, masks=detections.masks)
+                print(f"Segmentation renk analizi: Hedef={self.get_color_name(target_color)}, "
+                      f"{int(keep.sum())}/{len(keep)} eşleşme, renk oranları={np.round(fractions, 2).tolist()}")
+            else:
+                pixels, inside = sample_mask_pixels(image, detections.xyxy, detections.masks, budget)
+                # Maske alanının ortalama rengi ile hedef renk arasındaki mesafe
+                avg_colors = masked_mean_colors(pixels, inside)
+                distances = np.linalg.norm(avg_colors - np.asarray(target_color, np.float64), axis=1)
+                with np.errstate(invalid='ignore'):
+                    keep = distances < color_threshold
+                print(f"Segmentation renk analizi: Hedef={target_color}, {int(keep.sum())}/{len(keep)} eşleşme, "
+                      f"mesafeler={np.round(distances, 1).tolist()}")
             
-            return filtered_masks, filtered_confidences, filtered_classes
+            return detections[keep]
             
         except Exception as e:
             print(f"Segmentation renk filtreleme hatası: {e}")
-            return masks, confidences, classes
+            return detections
     
-    def filter_objects_by_color(self, image_path, boxes, confidences, classes, target_color):
-        """Renk bazında nesne filtreleme"""
-        if target_color == self.color_mapping['default']:
-            return boxes, confidences, classes
+    def filter_objects_by_color(self, image, detections, target_color, color_threshold=None, min_fraction=None):
+        """Renk bazında nesne filtreleme (image: dosya yolu veya BGR ndarray)"""
+        if color_threshold is None:
+            color_threshold = self.color_threshold
+        if min_fraction is None:
+            min_fraction = self.color_min_fraction
+        
+        if target_color == self.color_mapping['default'] or len(detections) == 0:
+            return detections
         
         try:
             # Görüntüyü yükle
-            image = cv2.imread(image_path)
+            image = self.load_image(image)
             if image is None:
-                return boxes, confidences, classes
+                return detections
             
-            filtered_boxes = []
-            filtered_confidences = []
-            filtered_classes = []
-            
-            for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-                x1, y1, x2, y2 = map(int, box)
-                
-                # Bounding box içindeki alanı al
-                roi = image[y1:y2, x1:x2]
-                if roi.size == 0:
-                    continue
-                
-                # Renk analizi yap
-                if self.is_object_color_match(roi, target_color):
-                    filtered_boxes.append(box)
-                    filtered_confidences.append(conf)
-                    filtered_classes.append(cls)
+            # Tüm kutular tek vektörel geçişte, kutu başına sabit sayıda örnek pikselle analiz edilir
+            if self.color_method == 'lut':
+                # Her örnek piksel tablodan bir renk ismi alır, hedef rengin oranı eşikle karşılaştırılır
+                keep, fractions = self.get_color_lut().match(image, detections.xyxy, target_color, min_fraction,
+                                                             self.color_sample_budget or COLOR_SAMPLE_BUDGET)
+                print(f"Renk analizi: Hedef={self.get_color_name(target_color)}, {int(keep.sum())}/{len(keep)} "
+                      f"eşleşme, renk oranları={np.round(fractions, 2).tolist()}")
+            else:
+                keep, distances = match_box_colors(image, detections.xyxy, target_color, color_threshold,
+                                                   self.color_sample_budget)
+                print(f"Renk analizi: Hedef={target_color[::-1]}, {int(keep.sum())}/{len(keep)} eşleşme, "
+                      f"ortalama mesafeler={np.round(distances, 1).tolist()}")
             
-            return filtered_boxes, filtered_confidences, filtered_classes
+            return detections[keep]
             
         except Exception as e:
             print(f"Renk filtreleme hatası: {e}")
-            return boxes, confidences, classes
-    
-    #TODO if object coolor match ?
-    def is_object_color_match(self, roi, target_color):
-        """Nesnenin renginin hedef renkle eşleşip eşleşmediğini kontrol et"""
-        try:
-            # ROI'yi BGR'den RGB'ye çevir
-            rgb_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
-            
-            # Hedef rengi BGR'den RGB'ye çevir
-            target_rgb = target_color[::-1]  # BGR'den RGB'ye çevir
-            
-            # Renk mesafesi hesapla
-            color_diff = np.sqrt(np.sum((rgb_roi - target_rgb) ** 2, axis=2))
-            
-            # Ortalama renk mesafesi
-            avg_color_diff = np.mean(color_diff)
-            
-            # Renk eşleşme eşiği (0-255 arasında) - daha esnek
-            color_threshold = 200
-            
-            # Eğer ortalama renk mesafesi eşikten küçükse eşleşme kabul et
-            is_match = avg_color_diff < color_threshold
-            
-            print(f"Renk analizi: Hedef={target_rgb}, Ortalama mesafe={avg_color_diff:.1f}, Eşleşme={is_match}")
-            
-            return is_match
-            
-        except Exception as e:
-            print(f"Renk eşleştirme hatası: {e}")
-            return True  # Hata durumunda tüm nesneleri kabul et
+            return detections
     
     #TODO kullanici sorgusundan renk bilgisini cikarir
     def extract_color_from_query(self, user_query):
@@ -443,45 +618,53 @@ class VLMDetector:
         # Eğer hiç renk bulunamazsa varsayılan yeşil döndür
         return self.color_mapping['default']
     
-    def draw_detections(self, image_path, boxes, confidences, classes, output_path, color=None):
-        """Draw bounding boxes for detection mode"""
-        image = cv2.imread(image_path)
+    def draw_detections(self, image, detections, output_path=None, color=None):
+        """
+        Draw bounding boxes for detection mode
+        Args:
+            image: Image path or BGR ndarray (ndarray is annotated in place)
+            detections: Detections to draw
+            output_path: Optional path to save the annotated image
+        """
+        image = self.load_image(image)
         
         # Renk belirlenmemişse varsayılan yeşil kullan
         if color is None:
             color = self.color_mapping['default']
         
-        for i, (box, conf, cls) in enumerate(zip(boxes, confidences, classes)):
-            x1, y1, x2, y2 = map(int, box)
+        for box, label in zip(detections.xyxy.astype(np.int32), detections.labels):
+            x1, y1, x2, y2 = box
             
             # Belirtilen renkte bounding box çiz
             cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
             
-            label = f"{cls}: {conf:.2f}"
             # Label'ı da aynı renkte yaz
             cv2.putText(image, label, (x1, y1 - 10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
-        cv2.imwrite(output_path, image)
+        if output_path:
+            cv2.imwrite(output_path, image)
         return image
     
     #TODO drawing segmentation
-    def draw_segmentation(self, image_path, masks, confidences, classes, output_path, color=None):
-        """Draw segmentation masks for segmentation mode"""
-        image = cv2.imread(image_path)
+    def draw_segmentation(self, image, detections, output_path=None, color=None):
+        """
+        Draw segmentation masks for segmentation mode
+        Args:
+            image: Image path or BGR ndarray (ndarray is annotated in place)
+            detections: Detections with masks
+            output_path: Optional path to save the annotated image
+        """
+        image = self.load_image(image)
         
         # Renk belirlenmemişse varsayılan yeşil kullan
         if color is None:
             color = self.color_mapping['default']
         
-        # Maske için şeffaflık rengi oluştur
-        overlay = image.copy()
+        # Maskeler doğrudan görüntü üzerine karıştırılır
+        overlay = image
         
-        for i, (mask, conf, cls) in enumerate(zip(masks, confidences, classes)):
-            # Mask'ı resim boyutuna uyarla
-            if len(mask.shape) == 3:
-                mask = mask.squeeze()
-            
+        for mask, label in zip(detections.masks, detections.labels):
             # Mask'ı 0-1 aralığında tut ve resim boyutuna uyarla
             if mask.max() > 1.0:
                 mask = mask / 255.0
@@ -495,7 +678,7 @@ class VLMDetector:
             colored_mask[mask_uint8 > 0] = color
             
             # Maske üzerine çiz
-            overlay = cv2.addWeighted(overlay, 0.7, colored_mask, 0.3, 0)
+            cv2.addWeighted(overlay, 0.7, colored_mask, 0.3, 0, dst=overlay)
             
             # Bounding box hesapla
             contours, _ = cv2.findContours(mask_uint8, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -506,77 +689,193 @@ class VLMDetector:
                 cv2.rectangle(overlay, (x, y), (x + w, y + h), color, 2)
                 
                 # Label ekle
-                label = f"{cls}: {conf:.2f}"
                 cv2.putText(overlay, label, (x, y - 10), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
-        cv2.imwrite(output_path, overlay)
+        if output_path:
+            cv2.imwrite(output_path, overlay)
         return overlay
     
     #TODO interact with llm model
-    def ask_llm(self, prompt):
+    def ask_llm(self, prompt, system=None, format=None):
+        """
+        Args:
+            prompt: User message
+            system: Optional system message (kept identical across calls for prefix reuse)
+            format: Optional structured output format ('json' or a JSON schema)
+        Returns:
+            Assistant message, or an "LLM hatası: ..." string if the request failed
+        """
         try:
-            response = ollama.chat(model='llama3.1:latest', messages=[
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ])
-            return response['message']['content']
+            return self.request_llm(prompt, system, format)
         except Exception as e:
             return f"LLM hatası: {str(e)}"
     
+    def request_llm(self, prompt, system=None, format=None):
+        """
+        Same as ask_llm but raises LLMError instead of returning an error string
+        
+        A server that rejects a JSON schema format with HTTP 400 (Ollama older than
+        0.5) is asked once more with format='json', and later requests skip the schema.
+        """
+        messages = []
+        if system:
+            messages.append({'role': 'system', 'content': system})
+        messages.append({'role': 'user', 'content': prompt})
+        
+        if isinstance(format, dict) and not self.llm_schema_supported:
+            format = 'json'
+        try:
+            # Havuzlu istemci: zaman aşımı, tekrar deneme ve aynı anda gelen aynı prompt'ları birleştirme
+            return self.llm_client.chat(self.llm_model, messages, format=format,
+                                        options={'temperature': 0})
+        except LLMError as e:
+            if not isinstance(format, dict) or e.status_code != 400:
+                raise
+            print(f"Uyarı: LLM sunucusu JSON şemasını reddetti, format='json' ile tekrar deneniyor: {e}")
+        
+        content = self.llm_client.chat(self.llm_model, messages, format='json', options={'temperature': 0})
+        self.llm_schema_supported = False
+        return content
+    
     #TODO finalize every part in here
     def process_image(self, image_path, user_query):
+        """user_query: Turkish query or a compiled QueryPlan"""
         print(f"Görüntü işleniyor: {image_path}")
-        print(f"Kullanıcı sorgusu: {user_query}")
+        print(f"Kullanıcı sorgusu: {getattr(user_query, 'query', user_query)}")
         print(f"Mod: {self.mode}")
         
-        # Kullanıcı sorgusundan renk bilgisini çıkar
-        detected_color = self.extract_color_from_query(user_query)
-        color_name = [name for name, value in self.color_mapping.items() if value == detected_color and name != 'default'][0]
-        print(f"Tespit edilen renk: {color_name}")
+        # Görüntü yalnızca bir kez okunur, tüm adımlar aynı diziyi kullanır
+        image = cv2.imread(image_path)
+        if image is None:
+            print("Görüntü okunamadı!")
+            return Detections.empty(self.class_names, with_masks=self.mode == 'segmentation')
+        
+        if self.mode == 'segmentation':
+            output_path = "output_segmentation.jpg"
+            color_label = "Segmentation rengi"
+        else:
+            output_path = "output_detection.jpg"
+            color_label = "Bounding box rengi"
         
-        results = self.detect_objects(image_path)
+        plan, results = self.detect_with_plan(image, user_query)
+        detections = self.filter_and_draw(image, results, plan)
+        
+        if len(detections):
+            cv2.imwrite(output_path, image)
+            print(f"Tespit edilen nesneler: {detections.class_names}")
+            print(f"Sonuç görüntüsü kaydedildi: {output_path}")
+            print(f"{color_label}: {plan.color_name}")
+        else:
+            print("Belirtilen nesneler bulunamadı.")
         
+        return detections
+    
+    def process_frame(self, frame, user_query, tracker=None, frame_index=None):
+        """
+        Process an in-memory BGR frame without touching the disk
+        Args:
+            frame: BGR ndarray, annotated in place
+            user_query: Turkish query or a compiled QueryPlan (compile once for video streams)
+            tracker: Optional ObjectTracker that assigns track ids
+            frame_index: Source frame number for the tracker (frames dropped in between are predicted)
+        Returns:
+            (annotated_frame, Detections)
+        """
+        plan, results = self.detect_with_plan(frame, user_query)
+        detections = self.filter_and_draw(frame, results, plan, tracker, frame_index)
+        return frame, detections
+    
+    def process_region(self, frame, plan, region, previous, tracker=None, frame_index=None):
+        """
+        Re-run YOLO only inside a changed region and keep the previous detections elsewhere
+        Args:
+            frame: BGR ndarray, annotated in place
+            plan: Compiled QueryPlan
+            region: (x1, y1, x2, y2) box in frame pixels (e.g. from MotionGate)
+            previous: Detections of the last full inference
+        Returns:
+            Detections for the whole frame
+        """
+        x1, y1, x2, y2 = region
+        crop = frame[y1:y2, x1:x2]
+        detections = self.filter_objects_by_class(self.detect_objects_direct(crop, plan), plan)
+        if plan.color_filter:
+            detections = self.filter_objects_by_color(crop, detections, plan.color, plan.color_threshold,
+                                                      plan.color_min_fraction)
+        detections.xyxy = detections.xyxy + np.array([x1, y1, x1, y1], dtype=np.float32)
+        detections.track_id = None
+        
+        # Merkezi bölgenin dışında kalan önceki tespitler aynen korunur
+        centers = (previous.xyxy[:, :2] + previous.xyxy[:, 2:]) / 2
+        outside = ((centers[:, 0] < x1) | (centers[:, 0] >= x2) | (centers[:, 1] < y1) | (centers[:, 1] >= y2))
+        kept = previous[outside]
+        kept.track_id = None
+        detections = Detections.concatenate([kept, detections], self.class_names)
+        
+        if tracker is not None:
+            detections = tracker.step(detections, frame_index)
+        self.draw_plan(frame, detections, plan)
+        return detections
+    
+    def detect_with_plan(self, frame, user_query):
+        """
+        Run YOLO and resolve the query, overlapping the two when concurrent mode is on
+        Returns:
+            (QueryPlan, YOLO result)
+        """
+        if self.concurrent and not isinstance(user_query, QueryPlan):
+            # Sözlükte ya da önbellekte bulunan sorgular anında derlenir, YOLO'ya sınıf filtresi verilebilir
+            offline_classes = self.resolve_offline(user_query)
+            if offline_classes is None:
+                # LLM çözümlemesi ve YOLO birbirinden bağımsız, sadece filtrelemede birleşir
+                plan_future = self.get_executor().submit(
+                    lambda: self.compile_query(user_query, self.map_query_with_llm(user_query)))
+                try:
+                    results = self.detect_objects_direct(frame)
+                finally:
+                    plan = plan_future.result()
+                return plan, results
+            plan = self.compile_query(user_query, offline_classes)
+        else:
+            plan = self.get_query_plan(user_query)
+        results = self.detect_objects_direct(frame, plan)
+        
+        return plan, results
+    
+    def filter_and_draw(self, frame, results, plan, tracker=None, frame_index=None):
+        """Filter YOLO results with a QueryPlan, optionally assign track ids, and annotate the frame in place"""
         if self.mode == 'segmentation':
             # Segmentation modu
-            masks, confidences, classes = self.filter_objects_by_class_segmentation(results, user_query)
+            detections = self.filter_objects_by_class_segmentation(results, plan)
             
             # Renk bazında filtrele (eğer renk belirtilmişse)
-            if detected_color != self.color_mapping['default']:
-                print(f"Renk filtreleme uygulanıyor: {color_name}")
-                masks, confidences, classes = self.filter_objects_by_color_segmentation(image_path, masks, confidences, classes, detected_color)
-            
-            output_path = "output_segmentation.jpg"
-            if masks:
-                self.draw_segmentation(image_path, masks, confidences, classes, output_path, detected_color)
-                print(f"Tespit edilen nesneler: {classes}")
-                print(f"Sonuç görüntüsü kaydedildi: {output_path}")
-                print(f"Segmentation rengi: {color_name}")
-            else:
-                print("Belirtilen nesneler bulunamadı.")
-            
-            return masks, confidences, classes
+            if plan.color_filter:
+                detections = self.filter_objects_by_color_segmentation(
+                    frame, detections, plan.color, plan.color_threshold, plan.color_min_fraction)
         else:
             # Detection modu
-            boxes, confidences, classes = self.filter_objects_by_class(results, user_query)
+            detections = self.filter_objects_by_class(results, plan)
             
             # Renk bazında filtrele (eğer renk belirtilmişse)
-            if detected_color != self.color_mapping['default']:
-                print(f"Renk filtreleme uygulanıyor: {color_name}")
-                boxes, confidences, classes = self.filter_objects_by_color(image_path, boxes, confidences, classes, detected_color)
-            
-            output_path = "output_detection.jpg"
-            if boxes:
-                self.draw_detections(image_path, boxes, confidences, classes, output_path, detected_color)
-                print(f"Tespit edilen nesneler: {classes}")
-                print(f"Sonuç görüntüsü kaydedildi: {output_path}")
-                print(f"Bounding box rengi: {color_name}")
-            else:
-                print("Belirtilen nesneler bulunamadı.")
-            
-            return boxes, confidences, classes
+            if plan.color_filter:
+                detections = self.filter_objects_by_color(
+                    frame, detections, plan.color, plan.color_threshold, plan.color_min_fraction)
+        
+        if tracker is not None:
+            detections = tracker.step(detections, frame_index)
+        
+        self.draw_plan(frame, detections, plan)
+        return detections
+    
+    def draw_plan(self, frame, detections, plan):
+        """Draw already filtered detections in the current mode (also used to carry annotations to skipped frames)"""
+        if not len(detections):
+            return
+        if self.mode == 'segmentation':
+            self.draw_segmentation(frame, detections, color=plan.color)
+        else:
+            self.draw_detections(frame, detections, color=plan.color)
 
 class VideoProcessor:
     def __init__(self, detector):
@@ -608,19 +907,54 @@ class VideoProcessor:
         cap.release()
         return info
     
+    def resolve_batch_size(self, batch_size):
+        """'auto' -> batch size for the model's device, otherwise a positive int"""
+        if batch_size == 'auto':
+            # CPU'da 8'den büyük batch'ler hızlandırmıyor, sadece bellek ve gecikme ekliyor
+            device = getattr(self.detector.model, 'device', None)  # ONNX modellerinde None
+            return 16 if device is not None and device.type == 'cuda' else 8
+        return max(1, int(batch_size))
+    
     def process_video_frames(self, video_path, user_query, output_dir="video_output", 
-                           frame_skip=1, max_frames=None):
+                           frame_skip=1, max_frames=None, batch_size=1, workers=1, pipeline=False,
+                           queue_size=8, write_video=True, track=False, motion_gate=None):
         """
         Process video frames for detection
         Args:
             video_path: Path to video file
-            user_query: Turkish query for detection
+            user_query: Turkish query or a compiled QueryPlan
             output_dir: Directory to save results
             frame_skip: Process every Nth frame (1 = all frames)
             max_frames: Maximum number of frames to process
+            batch_size: Frames per YOLO forward pass (int or 'auto')
+            workers: Worker processes, each handling one frame-range segment (int or 'auto' = CPU count)
+            pipeline: Overlap decode, inference, drawing and encoding on separate threads
+            queue_size: Capacity of each inter-stage queue when pipeline=True
+            write_video: Write the annotated video. Skipped frames are then written with the last
+                annotations carried over; without it they are skipped undecoded (summary only)
+            track: Assign track ids (kept in the summary) and move boxes on skipped frames with a tracker
+            motion_gate: Optional MotionGate; frames without significant change reuse the previous result
         """
         print(f"Video işleniyor: {video_path}")
-        print(f"Kullanıcı sorgusu: {user_query}")
+        
+        # Sorgu tüm video için bir kez çözümlenir
+        plan = self.detector.get_query_plan(user_query)
+        print(f"Kullanıcı sorgusu: {plan.query}")
+        print(f"Sorgu planı: {plan}")
+        
+        workers = self.resolve_workers(workers)
+        if track and workers > 1:
+            # İzler frame sırasına bağlı, segmentler arasında sürdürülemez
+            print("Nesne takibi tek süreçte çalışır, işçi sayısı 1'e indirildi")
+            workers = 1
+        if motion_gate is not None:
+            motion_gate.reset()
+        if workers > 1:
+            return self.process_video_sharded(video_path, plan, output_dir, frame_skip, max_frames,
+                                              batch_size, workers, write_video, motion_gate)
+        
+        batch_size = self.resolve_batch_size(batch_size)
+        print(f"Batch boyutu: {batch_size}")
         
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
@@ -641,99 +975,175 @@ class VideoProcessor:
             return None
         
         # Setup video writer for output
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        output_path = os.path.join(output_dir, f"detected_{Path(video_path).stem}.mp4")
-        out = cv2.VideoWriter(output_path, fourcc, video_info['fps'], 
-                            (video_info['width'], video_info['height']))
-        
+        output_path = None
+        out = None
+        if write_video:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            output_path = os.path.join(output_dir, f"detected_{Path(video_path).stem}.mp4")
+            out = cv2.VideoWriter(output_path, fourcc, video_info['fps'], 
+                                (video_info['width'], video_info['height']))
+        
+        tracker = ObjectTracker() if track else None
+        
+        if pipeline:
+            return self.process_video_pipelined(video_path, output_dir, video_info, plan, cap, out,
+                                                output_path, frame_skip, max_frames, batch_size, queue_size,
+                                                tracker, motion_gate)
+        
+        skipper = FrameSkipper(cap)
         frame_count = 0
-        processed_frames = 0
+        queued_frames = 0
         detection_results = []
+        # (frame index, frame, çıkarım yapılacak mı) üçlüleri, okunma sırasıyla
+        batch = []
+        pending = 0
+        last_detections = None
         
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                # Limit max frames
+                infer = frame_count % frame_skip == 0
+                if infer and max_frames and queued_frames >= max_frames:
                     break
                 
-                # Skip frames if needed
-                if frame_count % frame_skip != 0:
-                    frame_count += 1
+                # Çıktı video yoksa atlanan frameler çözülmeden geçilir
+                if not infer and out is None:
+                    if not skipper.skip(frame_skip - 1):
+                        break
+                    frame_count += frame_skip - 1
                     continue
                 
-                # Limit max frames
-                if max_frames and processed_frames >= max_frames:
+                ret, frame = skipper.read()
+                if not ret:
                     break
+                frame_index = frame_count
+                frame_count += 1
                 
-                print(f"Frame {frame_count + 1}/{video_info['frame_count']} işleniyor...")
-                
-                # Save frame temporarily
-                temp_frame_path = os.path.join(output_dir, f"temp_frame_{frame_count}.jpg")
-                cv2.imwrite(temp_frame_path, frame)
+                if infer:
+                    queued_frames += 1
+                    # Sahne değişmediyse önceki sonuç kullanılır, frame atlanmış gibi işlenir
+                    if motion_gate is not None and not motion_gate.check(frame)[0]:
+                        infer = False
                 
-                # Process frame
-                if self.detector.mode == 'segmentation':
-                    masks, confidences, classes = self.detector.process_image(temp_frame_path, user_query)
-                    if masks:
-                        # Draw segmentation on frame
-                        annotated_frame = self.detector.draw_segmentation(
-                            temp_frame_path, masks, confidences, classes, 
-                            temp_frame_path, self.detector.extract_color_from_query(user_query)
-                        )
-                        annotated_frame = cv2.imread(temp_frame_path)
-                    else:
-                        annotated_frame = frame
-                else:
-                    boxes, confidences, classes = self.detector.process_image(temp_frame_path, user_query)
-                    if boxes:
-                        # Draw detections on frame
-                        annotated_frame = self.detector.draw_detections(
-                            temp_frame_path, boxes, confidences, classes, 
-                            temp_frame_path, self.detector.extract_color_from_query(user_query)
-                        )
-                        annotated_frame = cv2.imread(temp_frame_path)
+                # Skip frames if needed
+                if not infer:
+                    if out is None:
+                        continue
+                    if pending:
+                        batch.append((frame_index, frame, False))
                     else:
-                        annotated_frame = frame
-                
-                # Write frame to output video
-                out.write(annotated_frame)
+                        # Önceki tespitler belli, frame bekletilmeden yazılır
+                        self.draw_skipped(frame, frame_index, plan, last_detections, tracker)
+                        out.write(frame)
+                    continue
                 
-                # Store results
-                detection_results.append({
-                    'frame': frame_count,
-                    'objects': classes if 'classes' in locals() else [],
-                    'count': len(classes) if 'classes' in locals() else 0
-                })
+                print(f"Frame {frame_index + 1}/{video_info['frame_count']} işleniyor...")
                 
-                # Clean up temp file
-                if os.path.exists(temp_frame_path):
-                    os.remove(temp_frame_path)
+                batch.append((frame_index, frame, True))
+                pending += 1
                 
-                processed_frames += 1
-                frame_count += 1
+                # Batch dolunca tek forward pass ile işle
+                if pending >= batch_size:
+                    last_detections = self.flush_batch(batch, plan, out, detection_results, last_detections,
+                                                       tracker)
+                    batch = []
+                    pending = 0
+            
+            # Kalan frameleri işle
+            if batch:
+                self.flush_batch(batch, plan, out, detection_results, last_detections, tracker)
         
         except KeyboardInterrupt:
             print("Video işleme durduruldu!")
         
         finally:
             cap.release()
-            out.release()
+            if out is not None:
+                out.release()
+        
+        return self.save_video_summary(video_path, output_dir, video_info, plan, frame_skip,
+                                       detection_results, output_path, **self.run_stats(tracker, motion_gate))
+    
+    def run_stats(self, tracker=None, motion_gate=None, gate_stats=None, skip_controller=None):
+        """Print and return the summary fields of the tracker, motion gate and skip controller (empty when unused)"""
+        stats = {}
+        if tracker is not None:
+            stats['tracking'] = {'tracks': tracker.next_id - 1}
+        if gate_stats is None and motion_gate is not None:
+            gate_stats = motion_gate.stats()
+        if gate_stats is not None:
+            print(f"Hareket kapısı: {gate_stats['skipped']}/{gate_stats['checked']} çıkarım atlandı "
+                  f"(%{gate_stats['skip_ratio'] * 100:.1f}), frame başına {gate_stats['gate_ms']:.2f} ms")
+            stats['motion_gate'] = gate_stats
+        if skip_controller is not None:
+            skip_stats = skip_controller.stats()
+            print(f"Uyarlamalı aralık: ort. her {skip_stats['interval_mean']} framede bir çıkarım "
+                  f"(son {skip_stats['interval']}, boyut {skip_stats['imgsz'] or 'varsayılan'}), "
+                  f"çıkarım {skip_stats['infer_ms']} ms, beklenen {skip_stats['expected_fps']} FPS "
+                  f"(hedef {skip_stats['target_fps']}), {skip_stats['interval_changes']} aralık / "
+                  f"{skip_stats['size_changes']} boyut değişikliği")
+            stats['adaptive_skip'] = skip_stats
+        return stats
+    
+    def draw_skipped(self, frame, frame_index, plan, last_detections, tracker=None):
+        """Annotate a frame without inference: tracker prediction, or the last detections carried over"""
+        detections = tracker.step(frame_index=frame_index) if tracker is not None else last_detections
+        if detections is not None:
+            self.detector.draw_plan(frame, detections, plan)
+    
+    def process_video_pipelined(self, video_path, output_dir, video_info, plan, cap, out, output_path,
+                                frame_skip, max_frames, batch_size, queue_size, tracker=None, motion_gate=None):
+        """Run the threaded decode -> infer -> annotate -> encode pipeline on an opened video"""
+        video_pipeline = VideoPipeline(self.detector, plan, queue_size=queue_size, batch_size=batch_size,
+                                       tracker=tracker, motion_gate=motion_gate)
+        print(f"Boru hattı modu: 4 aşama, kuyruk kapasitesi {queue_size}")
+        
+        try:
+            detection_results = video_pipeline.run(cap, out, frame_skip, max_frames)
+        except KeyboardInterrupt:
+            print("Video işleme durduruldu!")
+            detection_results = video_pipeline.detection_results
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+        
+        pipeline_stats = video_pipeline.report()
+        for name, stats in pipeline_stats.items():
+            print(f"  {name:<9} kullanım %{stats['utilization'] * 100:5.1f}, "
+                  f"giriş kuyruğu ort. {stats['input_queue_mean']:.1f} / en fazla {stats['input_queue_max']}, "
+                  f"bekleme {stats['starved_s']:.2f}s, tıkanma {stats['blocked_s']:.2f}s")
+        print(f"Darboğaz aşaması: {video_pipeline.bottleneck()}")
+        
+        return self.save_video_summary(video_path, output_dir, video_info, plan, frame_skip,
+                                       detection_results, output_path,
+                                       pipeline_stats={'wall_time': round(video_pipeline.wall_time, 3),
+                                                       'queue_size': queue_size,
+                                                       'stages': pipeline_stats},
+                                       **self.run_stats(tracker, motion_gate))
+    
+    def save_video_summary(self, video_path, output_dir, video_info, plan, frame_skip,
+                           detection_results, output_path, **extra):
+        """Write detection_summary_<video>.json and return the result dict"""
+        processed_frames = len(detection_results)
         
         # Save detection summary
         summary_path = os.path.join(output_dir, f"detection_summary_{Path(video_path).stem}.json")
         with open(summary_path, 'w', encoding='utf-8') as f:
             json.dump({
                 'video_info': video_info,
-                'query': user_query,
+                'query': plan.query,
                 'processed_frames': processed_frames,
                 'total_frames': video_info['frame_count'],
                 'frame_skip': frame_skip,
+                **extra,
                 'detection_results': detection_results
             }, f, indent=2, ensure_ascii=False)
         
         print(f"Video işleme tamamlandı!")
         print(f"İşlenen frame sayısı: {processed_frames}")
-        print(f"Çıktı video: {output_path}")
+        if output_path:
+            print(f"Çıktı video: {output_path}")
         print(f"Özet dosyası: {summary_path}")
         
         return {
@@ -743,20 +1153,255 @@ class VideoProcessor:
             'total_frames': video_info['frame_count']
         }
     
-    def process_webcam(self, user_query, duration=30, output_path="webcam_output.mp4"):
+    def resolve_workers(self, workers):
+        """'auto' -> CPU count, otherwise a positive int capped at the CPU count"""
+        cpu_count = os.cpu_count() or 1
+        if workers == 'auto':
+            return cpu_count
+        return max(1, min(int(workers), cpu_count))
+    
+    def process_video_sharded(self, video_path, plan, output_dir, frame_skip, max_frames, batch_size, workers,
+                              write_video=True, motion_gate=None):
+        """
+        Split the video into frame-range segments processed by separate worker processes
+        
+        Every worker loads its own detector, annotates its segment into a temporary
+        video and returns summary entries with global frame indices. The segments
+        are then stitched in order into the usual output video and summary.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        
+        video_info = self.get_video_info(video_path)
+        if not video_info:
+            print("Video dosyası açılamadı!")
+            return None
+        
+        # İşlenecek frame indeksleri, işçilere eşit sayıda frame düşecek şekilde bölünür
+        frame_indices = list(range(0, video_info['frame_count'], frame_skip))
+        if max_frames:
+            frame_indices = frame_indices[:max_frames]
+        if not frame_indices:
+            # Bazı kapsayıcılar ve akışlar frame sayısını 0 ya da -1 bildirir, segmentlere bölünemez:
+            # tek süreçli yol videoyu sonuna kadar okur
+            print("Frame sayısı bilinmiyor, video tek süreçte işleniyor")
+            return self.process_video_frames(video_path, plan, output_dir, frame_skip, max_frames, batch_size,
+                                             workers=1, write_video=write_video, motion_gate=motion_gate)
+        workers = max(1, min(workers, len(frame_indices)))
+        bounds = [len(frame_indices) * i // workers for i in range(workers + 1)]
+        
+        segment_dir = os.path.join(output_dir, f".segments_{Path(video_path).stem}")
+        os.makedirs(segment_dir, exist_ok=True)
+        
+        # Segmentler atlanan frameleri de kapsar: her biri bir sonrakinin başlangıcına kadar sürer
+        starts = [frame_indices[bound] for bound in bounds[:-1]]
+        ends = starts[1:] + [min(video_info['frame_count'], frame_indices[-1] + frame_skip)]
+        
+        tasks = []
+        for i in range(workers):
+            tasks.append({
+                'video_path': video_path,
+                'segment_path': os.path.join(segment_dir, f"segment_{i:03d}.mp4") if write_video else None,
+                'plan': plan,
+                'mode': self.detector.mode,
+                'backend': self.detector.backend,
+                # Renk ayarları planda değil detector'da, işçiler seri yolla aynı renk kararlarını vermeli
+                'color_method': self.detector.color_method,
+                'color_sample_budget': self.detector.color_sample_budget,
+                'start': starts[i],
+                'end': ends[i],
+                'frame_skip': frame_skip,
+                'batch_size': batch_size,
+                # Her işçi kapının kendi kopyasını kullanır (referans frame segment başında sıfırlanır)
+                'motion_gate': motion_gate,
+                # Çekirdekler işçiler arasında paylaştırılır (aşırı thread açılmasın)
+                'threads': max(1, (os.cpu_count() or 1) // workers)
+            })
+        
+        ranges = ', '.join(f"[{task['start']}, {task['end']})" for task in tasks)
+        print(f"{workers} işçi süreci ile işleniyor: {ranges}")
+        
+        # spawn: torch/OpenCV thread'leri olan süreci fork etmek kilitlenmeye yol açabilir
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            segments = list(pool.map(process_video_segment, tasks))
+        
+        # Segmentleri sırayla tek videoda birleştir
+        output_path = None
+        detection_results = []
+        try:
+            if write_video:
+                output_path = os.path.join(output_dir, f"detected_{Path(video_path).stem}.mp4")
+                self.stitch_segments([segment_path for segment_path, _, _ in segments], output_path,
+                                     video_info, segment_dir)
+            for _, segment_results, _ in segments:
+                detection_results.extend(segment_results)
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+        
+        gate_stats = merge_gate_stats([gate_stats for _, _, gate_stats in segments])
+        return self.save_video_summary(video_path, output_dir, video_info, plan, frame_skip,
+                                       detection_results, output_path, workers=workers,
+                                       **self.run_stats(gate_stats=gate_stats))
+    
+    def stitch_segments(self, segment_paths, output_path, video_info, work_dir):
+        """
+        Join segment videos in order into output_path
+        
+        With ffmpeg installed the segments are stream-copied through its concat
+        demuxer (no second lossy encode). Without it, or if the copy fails, they are
+        decoded and re-encoded with OpenCV, which adds one more mp4v generation.
+        """
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg:
+            list_path = os.path.join(work_dir, 'segments.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for segment_path in segment_paths:
+                    escaped = os.path.abspath(segment_path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                                     '-i', list_path, '-c', 'copy', output_path],
+                                    capture_output=True, text=True)
+            if result.returncode == 0:
+                return
+            print(f"ffmpeg ile birleştirme başarısız, segmentler yeniden kodlanıyor: {result.stderr.strip()[:200]}")
+        else:
+            print("ffmpeg bulunamadı, segmentler yeniden kodlanarak birleştiriliyor")
+        
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, video_info['fps'], (video_info['width'], video_info['height']))
+        try:
+            for segment_path in segment_paths:
+                cap = cv2.VideoCapture(segment_path)
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    out.write(frame)
+                cap.release()
+        finally:
+            out.release()
+    
+    def process_segment(self, video_path, segment_path, plan, start, end, frame_skip=1, batch_size=1,
+                        motion_gate=None):
+        """
+        Process frames [start, end) of a video into a segment video (segment_path=None: summary only)
+        Returns:
+            list of summary entries with global frame indices
+        """
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        
+        out = None
+        if segment_path is not None:
+            out = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        skipper = FrameSkipper(cap)
+        batch_size = self.resolve_batch_size(batch_size)
+        detection_results = []
+        batch = []
+        pending = 0
+        last_detections = None
+        
+        try:
+            frame_count = start
+            while frame_count < end:
+                infer = frame_count % frame_skip == 0
+                if not infer and out is None:
+                    count = min(frame_skip - frame_count % frame_skip, end - frame_count)
+                    if not skipper.skip(count):
+                        break
+                    frame_count += count
+                    continue
+                
+                ret, frame = skipper.read()
+                if not ret:
+                    break
+                if infer and motion_gate is not None and not motion_gate.check(frame)[0]:
+                    infer = False
+                    if out is None:
+                        frame_count += 1
+                        continue
+                
+                batch.append((frame_count, frame, infer))
+                pending += infer
+                frame_count += 1
+                if pending >= batch_size:
+                    last_detections = self.flush_batch(batch, plan, out, detection_results, last_detections)
+                    batch = []
+                    pending = 0
+            
+            if batch:
+                self.flush_batch(batch, plan, out, detection_results, last_detections)
+        
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+        
+        return detection_results
+    
+    def flush_batch(self, batch, plan, out, detection_results, last_detections=None, tracker=None):
+        """
+        Run one batched forward pass and write frames and summaries in input order
+        Args:
+            batch: (frame index, frame, infer) tuples; frames with infer=False get the
+                last annotations carried over (or the tracker prediction) and no summary entry
+            last_detections: Detections of the inferred frame before this batch
+            tracker: Optional ObjectTracker, stepped once per frame in order
+        Returns:
+            Detections of the last inferred frame
+        """
+        frames = [frame for _, frame, infer in batch if infer]
+        results = iter(self.detector.detect_objects_batch(frames, plan) if frames else [])
+        
+        for frame_index, frame, infer in batch:
+            if infer:
+                last_detections = self.detector.filter_and_draw(frame, next(results), plan, tracker, frame_index)
+                
+                # Store results
+                detection_results.append({
+                    'frame': frame_index,
+                    **last_detections.summary()
+                })
+            else:
+                self.draw_skipped(frame, frame_index, plan, last_detections, tracker)
+            
+            # Write frame to output video
+            if out is not None:
+                out.write(frame)
+        
+        return last_detections
+    
+    def process_webcam(self, user_query, duration=30, output_path="webcam_output.mp4", detect_interval=None,
+                       track=True, motion_gate=None, source=0, show=True, skip_controller=None):
         """
         Process webcam feed for real-time detection
         Args:
-            user_query: Turkish query for detection
+            user_query: Turkish query or a compiled QueryPlan
             duration: Duration in seconds (0 = infinite)
             output_path: Output video path
+            detect_interval: Run YOLO on every Nth frame (None = adaptive, see skip_controller)
+            track: Move boxes with a tracker on the frames in between (otherwise they show no boxes)
+            motion_gate: Optional MotionGate; unchanged scenes reuse the previous result, and with
+                region_inference only the changed region is re-run (detection mode)
+            source: Camera index, or a video file standing in for a camera (read at its FPS)
+            show: Show the annotated stream in a window
+            skip_controller: AdaptiveSkipController used when detect_interval is None
+                (None = one that holds the camera fps without changing the inference size)
         """
         print(f"Webcam başlatılıyor...")
-        print(f"Kullanıcı sorgusu: {user_query}")
+        
+        # Sorgu tüm yayın için bir kez çözümlenir
+        plan = self.detector.get_query_plan(user_query)
+        print(f"Kullanıcı sorgusu: {plan.query}")
         print(f"Süre: {duration} saniye" if duration > 0 else "Süre: Sınırsız")
         
-        # Open webcam
-        cap = cv2.VideoCapture(0)
+        # Model kamera açılmadan yüklenir, yükleme süresi ilk frame'in gecikmesine eklenmesin
+        self.detector.load_model()
+        
+        # Open webcam: okuyucu thread her zaman en yeni frame'i tutar, eskileri düşürülür
+        cap = LatestFrameCapture(source)
         if not cap.isOpened():
             print("Webcam açılamadı!")
             return None
@@ -772,8 +1417,21 @@ class VideoProcessor:
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
         
+        # Sabit aralık verilmediyse çıkarım sıklığı ölçülen sürelere göre ayarlanır
+        controller = None
+        if detect_interval is None:
+            controller = skip_controller if skip_controller is not None else AdaptiveSkipController(fps=fps)
+            controller.fps = fps
+            controller.reset()
+            self.detector.imgsz = controller.imgsz
+        
         start_time = time.time()
         frame_count = 0
+        written_index = -1
+        tracker = ObjectTracker() if track else None
+        last_detections = None
+        if motion_gate is not None:
+            motion_gate.reset()
         
         try:
             while True:
@@ -785,39 +1443,40 @@ class VideoProcessor:
                 if duration > 0 and (time.time() - start_time) > duration:
                     break
                 
-                # Process every 5th frame for performance
-                if frame_count % 5 == 0:
-                    # Save frame temporarily
-                    temp_frame_path = "temp_webcam_frame.jpg"
-                    cv2.imwrite(temp_frame_path, frame)
-                    
-                    # Process frame
-                    if self.detector.mode == 'segmentation':
-                        masks, confidences, classes = self.detector.process_image(temp_frame_path, user_query)
-                        if masks:
-                            annotated_frame = self.detector.draw_segmentation(
-                                temp_frame_path, masks, confidences, classes, 
-                                temp_frame_path, self.detector.extract_color_from_query(user_query)
-                            )
-                            annotated_frame = cv2.imread(temp_frame_path)
-                        else:
-                            annotated_frame = frame
-                    else:
-                        boxes, confidences, classes = self.detector.process_image(temp_frame_path, user_query)
-                        if boxes:
-                            annotated_frame = self.detector.draw_detections(
-                                temp_frame_path, boxes, confidences, classes, 
-                                temp_frame_path, self.detector.extract_color_from_query(user_query)
-                            )
-                            annotated_frame = cv2.imread(temp_frame_path)
-                        else:
-                            annotated_frame = frame
-                    
-                    # Clean up temp file
-                    if os.path.exists(temp_frame_path):
-                        os.remove(temp_frame_path)
+                frame_index = cap.last_frame_id
+                frame_start = time.perf_counter()
+                
+                # Process every Nth frame for performance
+                if controller is not None:
+                    infer = controller.should_infer()
                 else:
-                    annotated_frame = frame
+                    infer = frame_count % detect_interval == 0
+                gated = False
+                region = None
+                if infer and motion_gate is not None:
+                    infer, region = motion_gate.check(frame)
+                    gated = not infer
+                
+                annotated_frame = frame
+                region_only = (region is not None and last_detections is not None
+                               and self.detector.mode == 'detection')
+                if infer and region_only:
+                    # Sadece değişen bölge yeniden işlenir
+                    last_detections = self.detector.process_region(frame, plan, region, last_detections, tracker,
+                                                                   frame_index)
+                elif infer:
+                    annotated_frame, last_detections = self.detector.process_frame(frame, plan, tracker,
+                                                                                   frame_index)
+                elif tracker is not None:
+                    # Aradaki framelerde kutular takipçi tahminiyle taşınır
+                    self.detector.draw_plan(frame, tracker.step(frame_index=frame_index), plan)
+                elif gated and last_detections is not None:
+                    # Sahne değişmedi: önceki sonuç kullanılır
+                    self.detector.draw_plan(frame, last_detections, plan)
+                
+                if controller is not None:
+                    controller.record(time.perf_counter() - frame_start, infer)
+                    self.detector.imgsz = controller.imgsz
                 
                 # Add frame info
                 cv2.putText(annotated_frame, f"Frame: {frame_count}", (10, 30), 
@@ -825,13 +1484,17 @@ class VideoProcessor:
                 cv2.putText(annotated_frame, f"Time: {int(time.time() - start_time)}s", (10, 70), 
                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
                 
-                # Write frame
-                out.write(annotated_frame)
-                
                 # Show frame (optional)
-                cv2.imshow('Webcam Detection', annotated_frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                if show:
+                    cv2.imshow('Webcam Detection', annotated_frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                cap.record_display()
+                
+                # Write frame: düşürülen frameler yerine bu frame tekrarlanır, kayıt gerçek hızda kalır
+                for _ in range(frame_index - written_index):
+                    out.write(annotated_frame)
+                written_index = frame_index
                 
                 frame_count += 1
         
@@ -841,14 +1504,48 @@ class VideoProcessor:
         finally:
             cap.release()
             out.release()
-            cv2.destroyAllWindows()
+            if show:
+                cv2.destroyAllWindows()
+            if controller is not None:
+                self.detector.imgsz = None
         
+        capture_stats = cap.stats()
         print(f"Webcam işleme tamamlandı!")
-        print(f"Toplam frame: {frame_count}")
+        print(f"Toplam frame: {frame_count} (kameradan {capture_stats['captured']}, "
+              f"düşürülen {capture_stats['dropped']})")
+        if 'latency_ms_mean' in capture_stats:
+            print(f"Yakalama -> gösterim gecikmesi: ort. {capture_stats['latency_ms_mean']} ms, "
+                  f"p95 {capture_stats['latency_ms_p95']} ms, en fazla {capture_stats['latency_ms_max']} ms")
         print(f"Çıktı video: {output_path}")
+        self.run_stats(motion_gate=motion_gate, skip_controller=controller)
         
         return output_path
 
+def process_video_segment(task):
+    """
+    Worker process entry point for VideoProcessor.process_video_sharded
+    Args:
+        task: dict with video_path, segment_path, plan, mode, backend, start, end,
+            frame_skip, batch_size, motion_gate, threads, color_method and color_sample_budget
+    Returns:
+        (segment_path, summary entries with global frame indices, motion gate stats or None)
+    """
+    import torch
+    torch.set_num_threads(task['threads'])
+    
+    # torch.set_num_threads ONNX Runtime'ı etkilemez, ONNX oturumu aynı thread sayısıyla yeniden kurulur
+    registry = ModelRegistry(intra_op_threads=task['threads'])
+    detector = VLMDetector(mode=task['mode'], backend=task['backend'], concurrent=False, preload=False,
+                           registry=registry)
+    detector.color_method = task['color_method']
+    detector.color_sample_budget = task['color_sample_budget']
+    processor = VideoProcessor(detector)
+    detection_results = processor.process_segment(task['video_path'], task['segment_path'], task['plan'],
+                                                  task['start'], task['end'], task['frame_skip'],
+                                                  task['batch_size'], task['motion_gate'])
+    gate_stats = task['motion_gate'].stats() if task['motion_gate'] is not None else None
+    return task['segment_path'], detection_results, gate_stats
+
 #TODO main function
 def main():
     detector = VLMDetector()
@@ -883,7 +1580,27 @@ def main():
         max_frames = input("Maksimum frame sayısı (boş = sınırsız): ").strip()
         max_frames = int(max_frames) if max_frames.isdigit() else None
         
-        video_processor.process_video_frames(video_path, user_query, frame_skip=frame_skip, max_frames=max_frames)
+        batch_size = input("Batch boyutu (1 = tek tek, boş = otomatik): ").strip()
+        batch_size = int(batch_size) if batch_size.isdigit() else 'auto'
+        
+        workers = input("İşçi süreci sayısı (1 = tek süreç, auto = tüm çekirdekler): ").strip()
+        workers = int(workers) if workers.isdigit() else ('auto' if workers == 'auto' else 1)
+        
+        write_video = input("Çıktı video kaydedilsin mi? (e/h, boş = evet): ").strip().lower() != 'h'
+        track = input("Nesne takibi (track id) kullanılsın mı? (e/h): ").strip().lower() == 'e'
+        
+        motion_gate = None
+        if input("Hareketsiz sahnelerde çıkarım atlansın mı? (e/h): ").strip().lower() == 'e':
+            motion_gate = MotionGate()
+        
+        pipeline = False
+        if workers == 1:
+            pipeline = input("İş parçacıklı boru hattı kullanılsın mı? (e/h): ").strip().lower() == 'e'
+        
+        video_processor.process_video_frames(video_path, user_query, frame_skip=frame_skip,
+                                             max_frames=max_frames, batch_size=batch_size,
+                                             workers=workers, pipeline=pipeline, write_video=write_video,
+                                             track=track, motion_gate=motion_gate)
     
     elif choice == "3":
         # Webcam processing
@@ -892,7 +1609,20 @@ def main():
         duration = input("Kayıt süresi (saniye, 0 = sınırsız): ").strip()
         duration = int(duration) if duration.isdigit() else 30
         
-        video_processor.process_webcam(user_query, duration=duration)
+        motion_gate = None
+        if input("Hareketsiz sahnelerde çıkarım atlansın mı? (e/h): ").strip().lower() == 'e':
+            motion_gate = MotionGate(region_inference=True)
+        
+        detect_interval = input("Çıkarım aralığı (her N. frame, boş = otomatik): ").strip()
+        detect_interval = int(detect_interval) if detect_interval.isdigit() and int(detect_interval) > 0 else None
+        skip_controller = None
+        # Boyut uyarlaması dinamik girişli model ister (PyTorch ve dynamic=True ile dışa aktarılan ONNX)
+        if detect_interval is None and detector.registry.has_dynamic_input(detector.weights, detector.backend):
+            if input("Gerekirse çıkarım çözünürlüğü düşürülsün mü? (e/h): ").strip().lower() == 'e':
+                skip_controller = AdaptiveSkipController(sizes=DEFAULT_SIZES)
+        
+        video_processor.process_webcam(user_query, duration=duration, motion_gate=motion_gate,
+                                       detect_interval=detect_interval, skip_controller=skip_controller)
     
     else:
         print("Geçersiz seçim!")
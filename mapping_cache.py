@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = os.path.join(Path.home(), '.cache', 'vlm_detector', 'class_mappings.json')
+
+
+def normalize_query(query):
+    """Sorguyu önbellek anahtarı için normalize eder (küçük harf, tek boşluk)"""
+    # Python'un lower() fonksiyonu 'I' harfini 'i' yapar, Türkçe için 'ı' olmalı
+    query = query.replace('I', 'ı').replace('İ', 'i').lower()
+    return ' '.join(query.split())
+
+
+class QueryMappingCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=256, max_disk_entries=10000,
+                 ttl=7 * 24 * 3600):
+        """
+        Two-tier cache for query -> COCO class mappings
+        Args:
+            path: JSON file for the persistent store (None = memory only)
+            max_entries: Size of the in-process LRU
+            max_disk_entries: Maximum number of entries kept on disk
+            ttl: Entry lifetime in seconds (0 = never expires)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+
+        self.memory = OrderedDict()
+        self.disk = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.load()
+
+    def make_key(self, query, model, prompt_version):
+        """Normalize edilmiş sorgu, model ismi ve prompt sürümünden anahtar üretir"""
+        return f"{model}|{prompt_version}|{normalize_query(query)}"
+
+    def is_expired(self, entry, now=None):
+        if not self.ttl:
+            return False
+        return (now or time.time()) - entry['time'] > self.ttl
+
+    def get(self, query, model, prompt_version):
+        """Return cached class list or None on a miss"""
+        key = self.make_key(query, model, prompt_version)
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and not self.is_expired(entry):
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return list(entry['classes'])
+
+            entry = self.disk.get(key)
+            if entry is not None and not self.is_expired(entry):
+                self.remember(key, entry)
+                self.disk_hits += 1
+                return list(entry['classes'])
+
+            # Süresi dolmuş kayıtları temizle
+            if key in self.memory:
+                del self.memory[key]
+                self.evictions += 1
+            if key in self.disk:
+                del self.disk[key]
+                self.evictions += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, query, model, prompt_version, classes):
+        """Store a class list in both tiers"""
+        self.put_many({query: classes}, model, prompt_version)
+
+    def put_many(self, mappings, model, prompt_version):
+        """
+        Store several class lists with a single merge-and-write of the persistent file
+        Args:
+            mappings: dict of query -> class list
+        """
+        if not mappings:
+            return
+        now = time.time()
+
+        with self.lock:
+            for query, classes in mappings.items():
+                entry = {'classes': list(classes), 'time': now}
+                key = self.make_key(query, model, prompt_version)
+                self.remember(key, entry)
+                self.disk[key] = entry
+            self.save()
+
+    def remember(self, key, entry):
+        """LRU'ya ekler, sınır aşılırsa en eski kaydı atar (lock altında çağrılmalı)"""
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def read_disk(self):
+        """Diskteki geçerli kayıtları döndürür (dosya yoksa ya da okunamazsa boş)"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Önbellek okunamadı: {e}")
+            return {}
+
+        now = time.time()
+        return {key: entry for key, entry in data.items()
+                if isinstance(entry, dict) and 'time' in entry and not self.is_expired(entry, now)}
+
+    def load(self):
+        """Kalıcı önbelleği diskten okur, süresi dolmuş kayıtları atlar"""
+        self.disk = self.read_disk()
+
+    def save(self, merge=True):
+        """
+        Kalıcı önbelleği atomik olarak diske yazar (lock altında çağrılmalı)
+
+        Diğer süreçlerin (shard worker'ları, aynı anda açık GUI ve CLI) yazdığı kayıtlar
+        kaybolmasın diye önce diskteki dosyayla birleştirilir, aynı anahtarda yeni kayıt kazanır.
+        """
+        if not self.path:
+            return
+
+        if merge:
+            for key, entry in self.read_disk().items():
+                current = self.disk.get(key)
+                if current is None or entry['time'] > current['time']:
+                    self.disk[key] = entry
+
+        # Disk sınırı aşılırsa en eski kayıtları at
+        if len(self.disk) > self.max_disk_entries:
+            oldest = sorted(self.disk, key=lambda k: self.disk[k]['time'])
+            for key in oldest[:len(self.disk) - self.max_disk_entries]:
+                del self.disk[key]
+                self.evictions += 1
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Geçici dosya süreç ve thread başına ayrı, yarım yazılmış dosya hiç okunmaz
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.disk, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Önbellek kaydedilemedi: {e}")
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self.lock:
+            self.memory.clear()
+            self.disk.clear()
+            self.save(merge=False)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': len(self.disk)
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache shared by every VLMDetector"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QueryMappingCache()
+        return _default_cache
@@ -0,0 +1,337 @@
+import hashlib
+import importlib.util
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+# Mod -> ağırlık dosyası
+MODEL_WEIGHTS = {
+    'detection': 'yolov8n.pt',
+    'segmentation': 'yolov8n-seg.pt'
+}
+
+# COCO ile eğitilmiş ağırlıklar, sınıf isimleri model yüklenmeden okunabilir
+COCO_WEIGHTS = set(MODEL_WEIGHTS.values())
+
+# Çıkarım arka uçları: ultralytics PyTorch yolu, dışa aktarılmış ONNX modeli (ONNX Runtime CPU)
+# veya statik INT8 kuantize edilmiş ONNX modeli
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+DEFAULT_EXPORT_DIR = os.path.join(Path.home(), '.cache', 'vlm_detector', 'onnx')
+
+
+def find_coco_dataset():
+    """ultralytics'in coco.yaml dosyasını paketi import etmeden bulur (torch yüklemesi saniyeler sürer)"""
+    spec = importlib.util.find_spec('ultralytics')
+    if spec is None or spec.origin is None:
+        return None
+    return Path(spec.origin).parent / 'cfg' / 'datasets' / 'coco.yaml'
+
+
+class ModelRegistry:
+    def __init__(self, max_models=2, warmup=True, warmup_size=640, export_dir=DEFAULT_EXPORT_DIR, imgsz=640,
+                 calibration_sources=None, intra_op_threads=None):
+        """
+        Process-wide store of loaded YOLO models
+        Args:
+            max_models: Maximum number of models kept in memory (least recently used is unloaded)
+            warmup: Run a dummy inference right after loading
+            warmup_size: Side length of the dummy warm-up image
+            export_dir: Cache directory for exported ONNX models
+            imgsz: Input size the ONNX models are exported with
+            calibration_sources: Image/video paths for INT8 calibration (None = the sample images bundled with
+                the repo; quantization.find_calibration_media(directory) lists a dedicated calibration directory)
+            intra_op_threads: ONNX Runtime intra-op thread count (None = ONNX Runtime default, one per core)
+        """
+        self.max_models = max_models
+        self.warmup = warmup
+        self.warmup_size = warmup_size
+        self.export_dir = export_dir
+        self.imgsz = imgsz
+        self.calibration_sources = calibration_sources
+        self.intra_op_threads = intra_op_threads
+
+        self.models = OrderedDict()
+        self.loading = {}
+        self.names = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def make_key(self, weights, backend):
+        """Registry key: plain weights name for PyTorch, 'weights:backend' otherwise"""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend} (expected one of {BACKENDS})")
+        return weights if backend == 'torch' else f"{weights}:{backend}"
+
+    def get(self, weights, backend='torch'):
+        """
+        Return the model for a weights file and backend, loading it on first use
+
+        Concurrent callers asking for a model that is still loading wait for
+        the same load instead of reading the weights twice.
+        """
+        key = self.make_key(weights, backend)
+        with self.lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                self.hits += 1
+                return model
+
+            future = self.loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.loading[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            model = self.load(weights, backend)
+        except Exception as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[key]
+            self.models[key] = model
+            self.names[weights] = model.names
+            self.loads += 1
+            self.evict()
+        future.set_result(model)
+        return model
+
+    def load(self, weights, backend='torch'):
+        """Ağırlıkları okur ve isteğe bağlı olarak ısınma çıkarımı yapar"""
+        # ultralytics (ve torch) ilk model yüklemesine kadar import edilmez
+        from ultralytics import YOLO
+
+        if backend in ('onnx', 'onnx-int8'):
+            onnx_path = self.export_onnx(weights) if backend == 'onnx' else self.quantize_onnx(weights)
+            print(f"ONNX modeli yükleniyor: {onnx_path}")
+            model = YOLO(onnx_path, task=self.get_task(weights))
+        else:
+            print(f"Model yükleniyor: {weights}")
+            model = YOLO(weights)
+        if self.warmup:
+            # İlk çağrıdaki tahminci kurulumu ve bellek ayırma burada ödenir
+            model(np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8), verbose=False)
+        if backend in ('onnx', 'onnx-int8') and self.intra_op_threads:
+            self.limit_onnx_threads(model, onnx_path)
+        return model
+
+    def limit_onnx_threads(self, model, onnx_path):
+        """
+        Rebuild the ONNX Runtime session of a loaded model with intra_op_threads threads
+
+        ultralytics creates the session without session options, so ONNX Runtime
+        starts one thread per core and torch.set_num_threads has no effect on it.
+        """
+        import onnxruntime
+
+        owner, session = self.find_onnx_session(model)
+        if session is None:
+            print("ONNX oturumu bulunamadı, thread sınırı uygulanmadı")
+            return
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        owner.session = onnxruntime.InferenceSession(onnx_path, options, providers=session.get_providers())
+
+    def find_onnx_session(self, model):
+        """(owner, session): the ONNX Runtime session of a loaded ONNX model and the object holding it"""
+        if model.predictor is None:
+            # Oturum tahminci ile birlikte ilk çağrıda oluşturulur
+            model(np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8), verbose=False)
+        autobackend = model.predictor.model
+        # ultralytics 8.0 oturumu AutoBackend'de, yeni sürümler ayrı bir arka uç nesnesinde tutar
+        owner = getattr(autobackend, 'backend', None)
+        if getattr(owner, 'session', None) is None:
+            owner = autobackend
+        return owner, getattr(owner, 'session', None)
+
+    def has_dynamic_input(self, weights, backend='torch'):
+        """Whether the model runs at any inference size: always for PyTorch, for ONNX only with a dynamic export"""
+        if backend == 'torch':
+            return True
+        _, session = self.find_onnx_session(self.get(weights, backend))
+        if session is None:
+            return False
+        # Dinamik eksenler sayı yerine isimle gelir ('height', 'width')
+        return all(not isinstance(dim, int) for dim in session.get_inputs()[0].shape[2:])
+
+    def get_task(self, weights):
+        """ultralytics task name of a weights file"""
+        return 'segment' if '-seg' in Path(weights).stem else 'detect'
+
+    def export_onnx(self, weights):
+        """
+        Export a .pt file to ONNX once and reuse the artifact on later starts
+        Returns:
+            Path of the cached .onnx file, keyed by weights content hash and input size
+        """
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            raise RuntimeError("ONNX backend needs onnxruntime: pip install onnx onnxruntime")
+        from ultralytics import YOLO
+
+        # Ağırlık dosyası yoksa ultralytics indirir, hash indirilen dosyadan hesaplanır
+        weights_path = weights
+        if not os.path.exists(weights_path):
+            weights_path = YOLO(weights).ckpt_path or weights
+
+        sha256 = hashlib.sha256()
+        with open(weights_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+        onnx_path = os.path.join(self.export_dir,
+                                 f"{Path(weights).stem}-{sha256.hexdigest()[:16]}-{self.imgsz}.onnx")
+        if os.path.exists(onnx_path):
+            return onnx_path
+
+        print(f"ONNX dışa aktarılıyor: {weights} (imgsz={self.imgsz})")
+        # Dinamik giriş boyutu: PyTorch yolu gibi dikdörtgen letterbox kullanılabilir (aynı tespitler)
+        exported = YOLO(weights_path).export(format='onnx', imgsz=self.imgsz, dynamic=True)
+        os.makedirs(self.export_dir, exist_ok=True)
+        # ultralytics .pt dosyasının yanına yazar, o da başka bir dosya sisteminde olabilir (EXDEV):
+        # önce önbellek dizinine kopyalanır, sonra aynı dizin içinde atomik olarak yerine konur
+        temp_path = f"{onnx_path}.{os.getpid()}.tmp"
+        shutil.copyfile(exported, temp_path)
+        os.replace(temp_path, onnx_path)
+        os.remove(exported)
+        return onnx_path
+
+    def quantize_onnx(self, weights):
+        """
+        Statically quantize the exported ONNX model to INT8 once and cache it
+        Returns:
+            Path of the cached INT8 .onnx file
+        """
+        from quantization import bundled_calibration_media, calibration_fingerprint, load_calibration_frames, quantize_model
+
+        sources = self.calibration_sources if self.calibration_sources is not None else bundled_calibration_media()
+        if not sources:
+            raise RuntimeError("INT8 calibration needs sample images or videos (calibration_sources)")
+
+        fp32_path = self.export_onnx(weights)
+        int8_path = f"{fp32_path[:-len('.onnx')]}-int8-{calibration_fingerprint(sources)}.onnx"
+        if os.path.exists(int8_path):
+            return int8_path
+
+        frames = load_calibration_frames(sources)
+        if not frames:
+            raise RuntimeError("INT8 calibration sources could not be read")
+        print(f"INT8 kuantizasyonu: {weights} ({len(frames)} kalibrasyon karesi)")
+        quantize_model(fp32_path, int8_path, frames, self.imgsz)
+        return int8_path
+
+    def preload(self, weights, backend='torch'):
+        """
+        Load and warm up a model in the background
+        Returns:
+            concurrent.futures.Future resolving to the model
+        """
+        key = self.make_key(weights, backend)
+        with self.lock:
+            if key in self.models:
+                future = Future()
+                future.set_result(self.models[key])
+                return future
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-registry')
+        return self.executor.submit(self.get, weights, backend)
+
+    def get_names(self, weights):
+        """Class names of a model, without loading COCO weights that are not in memory yet"""
+        with self.lock:
+            names = self.names.get(weights)
+        if names is not None:
+            return names
+
+        coco_dataset = find_coco_dataset() if weights in COCO_WEIGHTS else None
+        if coco_dataset is not None and coco_dataset.exists():
+            with open(coco_dataset, 'r', encoding='utf-8') as f:
+                names = {int(k): v for k, v in yaml.safe_load(f)['names'].items()}
+            with self.lock:
+                self.names.setdefault(weights, names)
+            return names
+
+        return self.get(weights).names
+
+    def is_loaded(self, weights, backend='torch'):
+        with self.lock:
+            return self.make_key(weights, backend) in self.models
+
+    def evict(self):
+        """En uzun süredir kullanılmayan modelleri sınır aşıldıkça bellekten atar (lock altında çağrılmalı)"""
+        if len(self.models) <= self.max_models:
+            return
+        while len(self.models) > self.max_models:
+            weights, _ = self.models.popitem(last=False)
+            self.evictions += 1
+            print(f"Model bellekten atıldı: {weights}")
+        self.release_memory()
+
+    def unload(self, weights, backend='torch'):
+        """Drop a model from memory; it is reloaded on next use"""
+        with self.lock:
+            if self.models.pop(self.make_key(weights, backend), None) is None:
+                return False
+            self.evictions += 1
+            self.release_memory()
+        return True
+
+    def clear(self):
+        """Unload every model"""
+        with self.lock:
+            self.evictions += len(self.models)
+            self.models.clear()
+            self.release_memory()
+
+    def release_memory(self):
+        """GPU önbelleğini boşaltır (CUDA yoksa bir şey yapmaz)"""
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def stats(self):
+        """Load/hit/eviction counters and loaded model list"""
+        with self.lock:
+            return {
+                'loaded': list(self.models),
+                'loading': list(self.loading),
+                'loads': self.loads,
+                'hits': self.hits,
+                'evictions': self.evictions
+            }
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry():
+    """Process-wide registry shared by every VLMDetector and VideoProcessor"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
@@ -0,0 +1,140 @@
+import time
+
+import cv2
+import numpy as np
+
+# Kapı kararları küçültülmüş gri görüntü üzerinde verilir (ucuz olması için)
+GATE_WIDTH = 160
+
+
+class MotionGate:
+    def __init__(self, method='diff', pixel_threshold=25, min_changed=0.005, max_skip=30,
+                 region_inference=False, max_region=0.5, region_padding=16):
+        """
+        Cheap change detector in front of YOLO for mostly static camera scenes
+        Args:
+            method: 'diff' (difference to the last inferred frame) or 'mog2' (background subtraction)
+            pixel_threshold: Gray level difference that counts a pixel as changed ('diff' only)
+            min_changed: Fraction of changed pixels needed to run inference
+            max_skip: Force an inference after this many gated frames in a row (0 = never)
+            region_inference: Report the bounding box of the change so only that region is inferred
+            max_region: Largest region, as a fraction of the frame, still inferred as a crop
+            region_padding: Pixels added around the changed region
+        """
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion gate method: {method} (expected 'diff' or 'mog2')")
+        self.method = method
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_skip = max_skip
+        self.region_inference = region_inference
+        self.max_region = max_region
+        self.region_padding = region_padding
+        self.reset()
+
+    def reset(self):
+        """Forget the reference frame and the counters"""
+        self.reference = None
+        self.subtractor = None
+        self.skipped_in_row = 0
+        self.checked = 0
+        self.skipped = 0
+        self.forced = 0
+        self.regions = 0
+        self.gate_time = 0.0
+
+    def prepare(self, frame):
+        """Downscaled, blurred grayscale copy used for the comparison"""
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(1, round(height * GATE_WIDTH / width))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_mask(self, small):
+        if self.method == 'mog2':
+            if self.subtractor is None:
+                # Gölge tespiti kapalı: koyu nesneleri gölge sayıp değişimi kaçırabiliyor
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+            return (self.subtractor.apply(small) > 0).astype(np.uint8)
+        if self.reference is None:
+            return None
+        return (cv2.absdiff(small, self.reference) > self.pixel_threshold).astype(np.uint8)
+
+    def check(self, frame):
+        """
+        Decide whether a frame needs inference
+        Returns:
+            (changed, region): region is an (x1, y1, x2, y2) box in frame pixels covering the
+            change when region_inference is on and the change is small enough, otherwise None
+        """
+        start = time.perf_counter()
+        self.checked += 1
+        small = self.prepare(frame)
+        mask = self.changed_mask(small)
+
+        region = None
+        if mask is None or self.checked == 1:
+            # İlk frame: karşılaştırılacak referans (ya da önceki sonuç) yok
+            changed = True
+        else:
+            # Tek piksellik gürültü değişim sayılmaz
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+            changed = mask.mean() >= self.min_changed
+            if changed and self.region_inference:
+                region = self.changed_region(mask, frame.shape)
+            elif not changed and self.max_skip and self.skipped_in_row >= self.max_skip:
+                # Yavaş değişimler (ışık, yavaş giren nesneler) için periyodik tam çıkarım
+                changed = True
+                self.forced += 1
+
+        if changed:
+            self.reference = small
+            self.skipped_in_row = 0
+            self.regions += region is not None
+        else:
+            self.skipped += 1
+            self.skipped_in_row += 1
+        self.gate_time += time.perf_counter() - start
+        return changed, region
+
+    def changed_region(self, mask, frame_shape):
+        """Padded bounding box of the changed pixels in frame coordinates, or None if it is too large"""
+        x, y, w, h = cv2.boundingRect(mask)
+        height, width = frame_shape[:2]
+        scale_x = width / mask.shape[1]
+        scale_y = height / mask.shape[0]
+        x1 = max(0, int(x * scale_x) - self.region_padding)
+        y1 = max(0, int(y * scale_y) - self.region_padding)
+        x2 = min(width, int(np.ceil((x + w) * scale_x)) + self.region_padding)
+        y2 = min(height, int(np.ceil((y + h) * scale_y)) + self.region_padding)
+        if (x2 - x1) * (y2 - y1) > self.max_region * width * height:
+            return None
+        return x1, y1, x2, y2
+
+    def stats(self):
+        """Gate counters: skip_ratio is the share of checked frames that skipped inference"""
+        return {
+            'method': self.method,
+            'checked': self.checked,
+            'inferred': self.checked - self.skipped,
+            'skipped': self.skipped,
+            'forced': self.forced,
+            'regions': self.regions,
+            'skip_ratio': round(self.skipped / self.checked, 3) if self.checked else 0.0,
+            'gate_ms': round(self.gate_time / self.checked * 1000, 3) if self.checked else 0.0
+        }
+
+
+def merge_gate_stats(stats_list):
+    """Combine the stats of several gates (one per worker process)"""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    merged = {key: sum(stats[key] for stats in stats_list)
+              for key in ('checked', 'inferred', 'skipped', 'forced', 'regions')}
+    merged['method'] = stats_list[0]['method']
+    merged['skip_ratio'] = round(merged['skipped'] / merged['checked'], 3) if merged['checked'] else 0.0
+    merged['gate_ms'] = round(sum(stats['gate_ms'] * stats['checked'] for stats in stats_list) /
+                              max(merged['checked'], 1), 3)
+    return merged
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv')
+
+# Varsayılan kalibrasyon seti: depoyla gelen örnek görüntüler. Çalışma dizini taranmaz, aksi halde
+# INT8 modeli (ve önbellek anahtarı) o an dizinde hangi çıktı dosyaları olduğuna bağlı olurdu
+BUNDLED_CALIBRATION_MEDIA = ('car1.webp', 'chairs.jpg', 'traffic.webp')
+
+# Kalibrasyon seti üst sınırları (statik kuantizasyon için birkaç düzine kare yeterli)
+MAX_CALIBRATION_FRAMES = 64
+FRAMES_PER_VIDEO = 16
+
+
+def bundled_calibration_media():
+    """Depoyla gelen örnek görüntülerin yolları (modülün dizininden, çalışma dizininden bağımsız)"""
+    directory = Path(__file__).resolve().parent
+    return [str(directory / name) for name in BUNDLED_CALIBRATION_MEDIA if (directory / name).exists()]
+
+
+def find_calibration_media(directory):
+    """Ayrılmış bir kalibrasyon dizinindeki görüntü ve videoları bulur (çıktı dosyaları hariç)"""
+    media = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.name.startswith(('output_', 'detected_')):
+            continue
+        if path.suffix.lower() in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS:
+            media.append(str(path))
+    return media
+
+
+def calibration_fingerprint(sources):
+    """Kalibrasyon seti değiştiğinde yeni bir INT8 modeli üretilmesi için kısa özet"""
+    digest = hashlib.sha256()
+    for source in sorted(sources):
+        stat = os.stat(source)
+        digest.update(f"{os.path.basename(source)}|{stat.st_size}|{int(stat.st_mtime)}".encode('utf-8'))
+    return digest.hexdigest()[:8]
+
+
+def load_calibration_frames(sources, max_frames=MAX_CALIBRATION_FRAMES, frames_per_video=FRAMES_PER_VIDEO):
+    """
+    Read calibration frames from images and evenly spaced video frames
+    Args:
+        sources: Image and video paths
+        max_frames: Maximum number of frames in total
+        frames_per_video: Frames sampled from each video
+    Returns:
+        list of BGR ndarrays
+    """
+    frames = []
+    for source in sources:
+        if Path(source).suffix.lower() in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(source)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            for index in np.linspace(0, max(frame_count - 1, 0), min(frames_per_video, max(frame_count, 1))).astype(int):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+                ret, frame = cap.read()
+                if ret:
+                    frames.append(frame)
+            cap.release()
+        else:
+            image = cv2.imread(source)
+            if image is not None:
+                frames.append(image)
+    return frames[:max_frames]
+
+
+def letterbox_input(frame, imgsz):
+    """BGR frame -> (1, 3, imgsz, imgsz) float32 model input, letterboxed like ultralytics"""
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized_w, resized_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - resized_h) // 2, (imgsz - resized_w) // 2
+    canvas[top:top + resized_h, left:left + resized_w] = resized
+
+    # BGR -> RGB, HWC -> CHW, 0-1 aralığı
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1))[None].astype(np.float32) / 255.0
+
+
+def find_head_nodes(model):
+    """
+    Node names of the last '/model.N/' block (the Detect/Segment head)
+
+    Box decoding (DFL, sigmoid, concat) loses most accuracy when quantized,
+    so the head stays in fp32.
+    """
+    blocks = {}
+    for node in model.graph.node:
+        match = re.match(r'/model\.(\d+)/', node.name)
+        if match:
+            blocks.setdefault(int(match.group(1)), []).append(node.name)
+    return blocks[max(blocks)] if blocks else []
+
+
+def quantize_model(fp32_path, int8_path, frames, imgsz):
+    """
+    Static INT8 quantization (QDQ, per-channel weights) of an exported YOLO ONNX model
+    Args:
+        fp32_path: Exported fp32 .onnx file
+        int8_path: Output path of the quantized model
+        frames: Calibration frames (BGR ndarrays)
+        imgsz: Model input size
+    """
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.inputs = iter({input_name: letterbox_input(frame, imgsz)} for frame in frames)
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+    nodes_to_exclude = find_head_nodes(model)
+
+    os.makedirs(os.path.dirname(int8_path) or '.', exist_ok=True)
+    temp_path = f"{int8_path}.tmp.onnx"
+    quantize_static(fp32_path, temp_path, FrameReader(input_name),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=nodes_to_exclude)
+
+    # ultralytics sınıf isimlerini ve görev bilgisini ONNX metadata'sından okur
+    quantized = onnx.load(temp_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, temp_path)
+    os.replace(temp_path, int8_path)
@@ -0,0 +1,247 @@
+import numpy as np
+
+from detections import Detections
+
+# Sabit hızlı Kalman modeli: durum (cx, cy, w, h, vx, vy, vw, vh), ölçüm (cx, cy, w, h)
+MOTION = np.eye(8, dtype=np.float64)
+MOTION[:4, 4:] = np.eye(4)
+PROJECTION = np.eye(4, 8, dtype=np.float64)
+
+# Gürültü kutu yüksekliğiyle ölçeklenir (ByteTrack/DeepSORT değerleri)
+STD_WEIGHT_POSITION = 1.0 / 20
+STD_WEIGHT_VELOCITY = 1.0 / 160
+
+
+def box_iou(a, b):
+    """IoU matrix between two (N, 4) and (M, 4) xyxy arrays"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def xyxy_to_cxcywh(xyxy):
+    xyxy = xyxy.astype(np.float64)
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+
+def cxcywh_to_xyxy(boxes):
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1).astype(np.float32)
+
+
+def greedy_match(iou, threshold):
+    """
+    Highest-IoU-first one-to-one assignment
+    Returns:
+        (row indices, column indices) of the matched pairs
+    """
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind='stable')
+    used_rows, used_cols = set(), set()
+    matched_rows, matched_cols = [], []
+    for row, col in zip(rows[order], cols[order]):
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matched_rows.append(row)
+        matched_cols.append(col)
+    return np.array(matched_rows, dtype=np.intp), np.array(matched_cols, dtype=np.intp)
+
+
+class ObjectTracker:
+    def __init__(self, high_conf=0.5, match_iou=0.2, low_match_iou=0.5, max_age=30, center_gate=1.0):
+        """
+        ByteTrack-style IoU + Kalman multi-object tracker on the CPU
+
+        Call step() once per video frame: with the frame's Detections on inference
+        frames, without them on the frames in between, where the Kalman prediction
+        moves the boxes instead.
+        Args:
+            high_conf: Detections at or above this confidence are matched first and may start tracks
+            match_iou: Minimum IoU for matching high-confidence detections
+            low_match_iou: Minimum IoU for matching low-confidence detections to active tracks
+            max_age: Frames a lost track is kept for re-identification
+            center_gate: Last-chance match radius in box sizes, for objects that moved
+                past any overlap between two inference frames (0 disables it)
+        """
+        self.high_conf = high_conf
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.max_age = max_age
+        self.center_gate = center_gate
+        self.reset()
+
+    def reset(self):
+        """Drop every track; track ids start again from 1"""
+        self.track_id = np.zeros(0, np.int64)
+        self.class_id = np.zeros(0, np.int32)
+        self.conf = np.zeros(0, np.float32)
+        self.mean = np.zeros((0, 8), np.float64)
+        self.covariance = np.zeros((0, 8, 8), np.float64)
+        self.misses = np.zeros(0, np.int32)   # Son eşleşmeden beri geçen frame sayısı
+        self.active = np.zeros(0, bool)       # Son çıkarım framesinde eşleşti mi
+        self.masks = None
+        self.names = {}
+        self.next_id = 1
+        self.frame_index = None
+
+    def __len__(self):
+        return len(self.track_id)
+
+    def predict(self):
+        """Advance every track by one frame"""
+        if not len(self):
+            return
+        self.mean = self.mean @ MOTION.T
+        heights = self.mean[:, 3]
+        std = np.concatenate([np.repeat((STD_WEIGHT_POSITION * heights)[:, None], 4, axis=1),
+                              np.repeat((STD_WEIGHT_VELOCITY * heights)[:, None], 4, axis=1)], axis=1)
+        noise = np.zeros_like(self.covariance)
+        noise[:, np.arange(8), np.arange(8)] = std ** 2
+        self.covariance = MOTION @ self.covariance @ MOTION.T + noise
+        # Kutu boyutu sıfırın altına düşmesin
+        self.mean[:, 2:4] = np.maximum(self.mean[:, 2:4], 1.0)
+        self.misses += 1
+
+    def correct(self, index, measurements):
+        """Kalman measurement update of the tracks at index with (K, 4) cxcywh boxes"""
+        mean = self.mean[index]
+        covariance = self.covariance[index]
+        std = STD_WEIGHT_POSITION * mean[:, 3]
+        noise = np.zeros((len(index), 4, 4))
+        noise[:, np.arange(4), np.arange(4)] = (std ** 2)[:, None]
+
+        projected_cov = PROJECTION @ covariance @ PROJECTION.T + noise
+        # K = P H^T S^-1, S simetrik olduğundan solve ile hesaplanır
+        gain = np.linalg.solve(projected_cov, (covariance @ PROJECTION.T).transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - mean @ PROJECTION.T
+        self.mean[index] = mean + (gain @ innovation[:, :, None])[:, :, 0]
+        self.covariance[index] = covariance - gain @ projected_cov @ gain.transpose(0, 2, 1)
+
+    def start_tracks(self, detections, index):
+        """Open new tracks for detections[index]"""
+        boxes = xyxy_to_cxcywh(detections.xyxy[index])
+        count = len(index)
+        heights = boxes[:, 3]
+        std = np.concatenate([np.repeat((2 * STD_WEIGHT_POSITION * heights)[:, None], 4, axis=1),
+                              np.repeat((10 * STD_WEIGHT_VELOCITY * heights)[:, None], 4, axis=1)], axis=1)
+        covariance = np.zeros((count, 8, 8))
+        covariance[:, np.arange(8), np.arange(8)] = std ** 2
+
+        new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+        self.next_id += count
+        self.track_id = np.concatenate([self.track_id, new_ids])
+        self.class_id = np.concatenate([self.class_id, detections.class_id[index]])
+        self.conf = np.concatenate([self.conf, detections.conf[index]])
+        self.mean = np.concatenate([self.mean, np.concatenate([boxes, np.zeros((count, 4))], axis=1)])
+        self.covariance = np.concatenate([self.covariance, covariance])
+        self.misses = np.concatenate([self.misses, np.zeros(count, np.int32)])
+        self.active = np.concatenate([self.active, np.ones(count, bool)])
+        if self.masks is not None:
+            self.masks = np.concatenate([self.masks, detections.masks[index]])
+        return new_ids
+
+    def associate(self, detections, track_index, detection_index, threshold, by_center=False):
+        """
+        Match a subset of tracks to a subset of detections of the same class
+        Args:
+            threshold: Minimum IoU, or with by_center the center_gate radius in box sizes
+            by_center: Score by center distance relative to the track's box size instead of IoU
+        """
+        if not len(track_index) or not len(detection_index):
+            return np.zeros(0, np.intp), np.zeros(0, np.intp)
+        if by_center:
+            predicted = self.mean[track_index, :4]
+            centers = xyxy_to_cxcywh(detections.xyxy[detection_index])[:, :2]
+            distance = np.linalg.norm(predicted[:, None, :2] - centers[None, :, :], axis=2)
+            scale = np.sqrt(predicted[:, 2] * predicted[:, 3])[:, None]
+            score = 1.0 - distance / (threshold * scale)
+            threshold = 1e-9
+        else:
+            score = box_iou(cxcywh_to_xyxy(self.mean[track_index, :4]), detections.xyxy[detection_index])
+        score[self.class_id[track_index][:, None] != detections.class_id[detection_index][None, :]] = 0
+        rows, cols = greedy_match(score, threshold)
+        return track_index[rows], detection_index[cols]
+
+    def step(self, detections=None, frame_index=None):
+        """
+        Process one video frame
+        Args:
+            detections: Filtered Detections of an inference frame, or None on frames without inference
+            frame_index: Optional frame number; frames skipped since the last step are predicted through
+        Returns:
+            Detections with track_id set. On inference frames these are the input detections
+            in their original order (track_id -1 for unmatched low-confidence ones); otherwise
+            the predicted boxes of the tracks matched on the last inference frame.
+        """
+        steps = 1
+        if frame_index is not None:
+            if self.frame_index is not None:
+                steps = max(1, frame_index - self.frame_index)
+            self.frame_index = frame_index
+        for _ in range(steps):
+            self.predict()
+        if detections is None:
+            return self.predicted()
+
+        self.names = detections.names
+        if detections.masks is None:
+            self.masks = None
+        elif self.masks is None or self.masks.shape[1:] != detections.masks.shape[1:]:
+            self.masks = np.zeros((len(self),) + detections.masks.shape[1:], np.float32)
+
+        assigned = np.full(len(detections), -1, np.int64)
+        high = np.flatnonzero(detections.conf >= self.high_conf)
+        low = np.flatnonzero(detections.conf < self.high_conf)
+
+        # 1. aşama: yüksek güvenli tespitler tüm izlerle (kayıp olanlar dahil) eşleşir
+        tracks, matched = self.associate(detections, np.arange(len(self)), high, self.match_iou)
+        # 2. aşama: düşük güvenli tespitler yalnızca kalan aktif izlerle eşleşir (örtülme vb.)
+        remaining = np.setdiff1d(np.flatnonzero(self.active), tracks)
+        low_tracks, low_matched = self.associate(detections, remaining, low, self.low_match_iou)
+        tracks = np.concatenate([tracks, low_tracks])
+        matched = np.concatenate([matched, low_matched])
+        if self.center_gate > 0:
+            # 3. aşama: örtüşmesi kalmayacak kadar hareket etmiş nesneler merkez uzaklığıyla eşleşir
+            center_tracks, center_matched = self.associate(detections, np.setdiff1d(np.arange(len(self)), tracks),
+                                                           np.setdiff1d(high, matched), self.center_gate,
+                                                           by_center=True)
+            tracks = np.concatenate([tracks, center_tracks])
+            matched = np.concatenate([matched, center_matched])
+
+        if len(tracks):
+            self.correct(tracks, xyxy_to_cxcywh(detections.xyxy[matched]))
+            self.conf[tracks] = detections.conf[matched]
+            if self.masks is not None:
+                self.masks[tracks] = detections.masks[matched]
+            assigned[matched] = self.track_id[tracks]
+        self.misses[tracks] = 0
+        self.active[:] = False
+        self.active[tracks] = True
+
+        # Eşleşmeyen yüksek güvenli tespitler yeni iz açar
+        unmatched_high = np.setdiff1d(high, matched)
+        if len(unmatched_high):
+            assigned[unmatched_high] = self.start_tracks(detections, unmatched_high)
+
+        # Uzun süredir görülmeyen izler silinir
+        keep = self.misses <= self.max_age
+        if not keep.all():
+            for name in ('track_id', 'class_id', 'conf', 'mean', 'covariance', 'misses', 'active'):
+                setattr(self, name, getattr(self, name)[keep])
+            if self.masks is not None:
+                self.masks = self.masks[keep]
+
+        return Detections(detections.xyxy, detections.conf, detections.class_id, detections.names,
+                          detections.masks, assigned)
+
+    def predicted(self):
+        """Predicted boxes of the active tracks (masks are the last observed ones)"""
+        active = np.flatnonzero(self.active)
+        return Detections(cxcywh_to_xyxy(self.mean[active, :4]), self.conf[active], self.class_id[active],
+                          self.names, None if self.masks is None else self.masks[active],
+                          self.track_id[active])
@@ -0,0 +1,340 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Kuyruk sonu işareti
+END = object()
+
+# Kuyruk bekleme aralığı (durdurma isteği bu sıklıkla kontrol edilir)
+POLL_INTERVAL = 0.1
+
+
+class FrameSkipper:
+    def __init__(self, cap, strategy='auto'):
+        """
+        Advance a capture past frames that are never looked at, without decoding them to BGR
+        Args:
+            cap: Opened cv2.VideoCapture
+            strategy: 'grab' (demux/decode only, no color conversion or copy),
+                'seek' (jump to the nearest keyframe and decode forward) or
+                'auto' (time both on the first two gaps and keep the faster one)
+        """
+        self.cap = cap
+        self.strategy = strategy
+        self.position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.timings = {}
+
+    def read(self):
+        """cap.read() that keeps the frame position in sync"""
+        ret, frame = self.cap.read()
+        if ret:
+            self.position += 1
+        return ret, frame
+
+    def skip(self, count):
+        """
+        Skip the next count frames
+        Returns:
+            False when the end of the video was reached
+        """
+        if count <= 0:
+            return True
+
+        strategy = self.strategy
+        if strategy == 'auto':
+            # Kare başına maliyeti ölçülmemiş strateji önce denenir
+            strategy = next((name for name in ('grab', 'seek') if name not in self.timings), None)
+            if strategy is None:
+                strategy = self.strategy = min(self.timings, key=self.timings.get)
+
+        start = time.perf_counter()
+        if strategy == 'seek' and self.frame_count > 0:
+            target = self.position + count
+            if target >= self.frame_count:
+                return False
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                self.position = target
+                self.timings.setdefault('seek', (time.perf_counter() - start) / count)
+                return True
+            # Akışlarda konum atlama desteklenmez
+            self.strategy = strategy = 'grab'
+
+        for _ in range(count):
+            if not self.cap.grab():
+                return False
+            self.position += 1
+        self.timings.setdefault('grab', (time.perf_counter() - start) / count)
+        return True
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage failed or the pipeline was stopped"""
+
+
+class StageStats:
+    def __init__(self, name):
+        """
+        Timing and queue depth counters for one pipeline stage
+        Args:
+            name: Stage name used in reports
+        """
+        self.name = name
+        self.items = 0
+        self.busy = 0.0      # İş yaparken geçen süre
+        self.starved = 0.0   # Giriş kuyruğunu beklerken geçen süre
+        self.blocked = 0.0   # Dolu çıkış kuyruğunu beklerken geçen süre (backpressure)
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.depth_max = 0
+
+    def sample_depth(self, depth):
+        self.depth_total += depth
+        self.depth_samples += 1
+        self.depth_max = max(self.depth_max, depth)
+
+    def report(self, wall_time):
+        """Per-stage summary: utilization is busy time over pipeline wall time"""
+        return {
+            'items': self.items,
+            'busy_s': round(self.busy, 3),
+            'starved_s': round(self.starved, 3),
+            'blocked_s': round(self.blocked, 3),
+            'utilization': round(self.busy / wall_time, 3) if wall_time else 0.0,
+            'input_queue_mean': round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            'input_queue_max': self.depth_max
+        }
+
+
+class VideoPipeline:
+    def __init__(self, detector, plan, queue_size=8, batch_size=1, tracker=None, motion_gate=None):
+        """
+        Threaded decode -> infer -> annotate -> encode pipeline
+
+        Each stage runs on its own thread and hands frames to the next one through
+        a bounded FIFO queue, so a slow stage applies backpressure upstream and
+        frames leave the pipeline in the order they were decoded.
+        Args:
+            detector: VLMDetector used for inference and drawing
+            plan: Compiled QueryPlan
+            queue_size: Capacity of every inter-stage queue
+            batch_size: Frames per YOLO forward pass in the inference stage
+            tracker: Optional ObjectTracker, stepped in frame order by the annotate stage
+            motion_gate: Optional MotionGate checked by the decode stage; unchanged frames skip inference
+        """
+        self.detector = detector
+        self.plan = plan
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.tracker = tracker
+        self.motion_gate = motion_gate
+
+        self.stats = {name: StageStats(name) for name in ('decode', 'infer', 'annotate', 'encode')}
+        self.stop_event = threading.Event()
+        self.error = None
+        self.wall_time = 0.0
+        self.detection_results = []
+
+    def put(self, q, item, stats):
+        """Blocking put that gives up when the pipeline is stopped"""
+        start = time.perf_counter()
+        while True:
+            if self.stop_event.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        stats.blocked += time.perf_counter() - start
+
+    def get(self, q, stats):
+        """Blocking get that samples queue depth and gives up when the pipeline is stopped"""
+        stats.sample_depth(q.qsize())
+        start = time.perf_counter()
+        while True:
+            if self.stop_event.is_set():
+                raise PipelineStopped()
+            try:
+                item = q.get(timeout=POLL_INTERVAL)
+                break
+            except queue.Empty:
+                continue
+        stats.starved += time.perf_counter() - start
+        return item
+
+    def run_stage(self, target, *args):
+        """Thread wrapper: the first failing stage stops the whole pipeline"""
+        try:
+            target(*args)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            self.stop_event.set()
+
+    def decode(self, cap, decoded, frame_skip, max_frames, write_skipped):
+        stats = self.stats['decode']
+        skipper = FrameSkipper(cap)
+        frame_count = 0
+        queued_frames = 0
+        while True:
+            start = time.perf_counter()
+            infer = frame_count % frame_skip == 0
+            if infer and max_frames and queued_frames >= max_frames:
+                break
+            if infer or write_skipped:
+                ret, frame = skipper.read()
+            else:
+                # Çıktı video yoksa atlanan frameler BGR'ye çözülmeden geçilir
+                ret, frame = skipper.skip(frame_skip - 1), None
+            stats.busy += time.perf_counter() - start
+            if not ret:
+                break
+
+            if frame is None:
+                frame_count += frame_skip - 1
+                continue
+            if infer:
+                queued_frames += 1
+                if self.motion_gate is not None and not self.motion_gate.check(frame)[0]:
+                    infer = False
+                    if not write_skipped:
+                        frame_count += 1
+                        continue
+            stats.items += 1
+            self.put(decoded, (frame_count, frame, infer), stats)
+            frame_count += 1
+        self.put(decoded, END, stats)
+
+    def infer(self, decoded, inferred):
+        stats = self.stats['infer']
+        finished = False
+        while not finished:
+            # Kuyrukta bekleyen kadar frame alınır, batch_size kadar çıkarım framei toplu çalıştırılır
+            batch = [self.get(decoded, stats)]
+            pending = batch[0] is not END and batch[0][2]
+            while pending < self.batch_size and batch[-1] is not END:
+                try:
+                    batch.append(decoded.get_nowait())
+                except queue.Empty:
+                    break
+                pending += batch[-1] is not END and batch[-1][2]
+            if batch[-1] is END:
+                batch.pop()
+                finished = True
+
+            frames = [frame for _, frame, infer in batch if infer]
+            results = iter([])
+            if frames:
+                start = time.perf_counter()
+                results = iter(self.detector.detect_objects_batch(frames, self.plan))
+                stats.busy += time.perf_counter() - start
+                stats.items += len(frames)
+
+            for frame_index, frame, infer in batch:
+                self.put(inferred, (frame_index, frame, next(results) if infer else None), stats)
+        self.put(inferred, END, stats)
+
+    def annotate(self, inferred, annotated):
+        stats = self.stats['annotate']
+        last_detections = None
+        while True:
+            item = self.get(inferred, stats)
+            if item is END:
+                break
+            frame_index, frame, result = item
+
+            start = time.perf_counter()
+            if result is not None:
+                detections = last_detections = self.detector.filter_and_draw(frame, result, self.plan,
+                                                                             self.tracker, frame_index)
+            else:
+                # Atlanan frame: takipçi tahmini ya da son tespitler çizilir, özete girmez
+                detections = None
+                carried = last_detections
+                if self.tracker is not None:
+                    carried = self.tracker.step(frame_index=frame_index)
+                if carried is not None:
+                    self.detector.draw_plan(frame, carried, self.plan)
+            stats.busy += time.perf_counter() - start
+            stats.items += 1
+            self.put(annotated, (frame_index, frame, detections), stats)
+        self.put(annotated, END, stats)
+
+    def encode(self, annotated, out, detection_results):
+        stats = self.stats['encode']
+        while True:
+            item = self.get(annotated, stats)
+            if item is END:
+                break
+            frame_index, frame, detections = item
+
+            start = time.perf_counter()
+            if out is not None:
+                out.write(frame)
+            stats.busy += time.perf_counter() - start
+            stats.items += 1
+            if detections is not None:
+                detection_results.append({
+                    'frame': frame_index,
+                    **detections.summary()
+                })
+
+    def run(self, cap, out, frame_skip=1, max_frames=None):
+        """
+        Process an opened capture into an opened writer (out=None: summary only)
+
+        With an output video, skipped frames are decoded and written with the last
+        annotations carried over; without one they are never decoded.
+
+        On KeyboardInterrupt the stages are stopped and the exception is re-raised;
+        frames encoded so far stay in self.detection_results.
+        Returns:
+            list of summary entries in frame order
+        """
+        decoded = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size)
+        annotated = queue.Queue(maxsize=self.queue_size)
+        detection_results = self.detection_results = []
+
+        threads = [
+            threading.Thread(target=self.run_stage,
+                             args=(self.decode, cap, decoded, frame_skip, max_frames, out is not None),
+                             name='pipeline-decode', daemon=True),
+            threading.Thread(target=self.run_stage, args=(self.infer, decoded, inferred),
+                             name='pipeline-infer', daemon=True),
+            threading.Thread(target=self.run_stage, args=(self.annotate, inferred, annotated),
+                             name='pipeline-annotate', daemon=True),
+            threading.Thread(target=self.run_stage, args=(self.encode, annotated, out, detection_results),
+                             name='pipeline-encode', daemon=True)
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=POLL_INTERVAL)
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            self.wall_time = time.perf_counter() - start
+
+        if self.error is not None:
+            raise self.error
+        return detection_results
+
+    def report(self):
+        """Per-stage stats dict; the busiest stage is the bottleneck"""
+        return {name: stats.report(self.wall_time) for name, stats in self.stats.items()}
+
+    def bottleneck(self):
+        return max(self.stats.values(), key=lambda stats: stats.busy).name